@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the web scraper.
+Replays the raw markdown stored in output/web_crawler/session_* against a
+local fake LLM endpoint, so extraction and pagination can be measured
+without network access or API keys.
+"""
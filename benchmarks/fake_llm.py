@@ -0,0 +1,104 @@
+# fake_llm.py
+"""
+A local OpenAI-compatible chat completions endpoint with configurable latency
+and canned responses, for running the scraper offline.
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_LISTINGS_RESPONSE = {"listings": []}
+DEFAULT_PAGINATION_RESPONSE = {"page_urls": []}
+
+
+class FakeLLMServer:
+    """
+    Serves POST /v1/chat/completions on 127.0.0.1.
+
+    Requests whose system prompt is the pagination prompt get
+    `pagination_response`; all others get `listings_response`. Each response
+    is delayed by `latency` seconds plus up to `jitter` seconds.
+    """
+
+    def __init__(self, listings_response=None, pagination_response=None, latency=0.0, jitter=0.0, port=0):
+        self.listings_response = listings_response or DEFAULT_LISTINGS_RESPONSE
+        self.pagination_response = pagination_response or DEFAULT_PAGINATION_RESPONSE
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._thread = None
+
+    @property
+    def api_base(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                payload = server.respond(body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, body: dict) -> dict:
+        """Build a chat completion for a request body"""
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        messages = body.get("messages", [])
+        system_prompt = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        canned = self.pagination_response if "pagination" in system_prompt.lower() else self.listings_response
+        content = json.dumps(canned)
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_chars // 4 + len(content) // 4,
+            },
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
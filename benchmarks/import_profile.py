@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Import-time profile of the app and the batch entry points.
+
+Each target is started in fresh interpreters with `python -X importtime`; the
+report shows the median wall time against the budget in
+STARTUP_SETTINGS["targets"] and the top-level imports that cost the most.
+
+Usage:
+    python -m benchmarks.import_profile [--targets app scheduler] [--repeat 3] [--top 10] [--json out.json] [--check]
+
+With --check the exit status is 1 when a target is over its budget, so the
+cold-start target can be enforced in CI or before building the image.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from web_scraper.assets import STARTUP_SETTINGS  # noqa: E402
+
+# Command-line arguments for the interpreter, per target
+TARGETS = {
+    # Runs the Streamlit script once in bare mode, i.e. up to the idle screen
+    "app": [os.path.join("web_scraper", "app.py")],
+    "scheduler": ["-c", "import run_scheduler, web_scraper.scheduler"],
+    "pipeline": ["-c", "import web_scraper.pipeline"],
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+
+def parse_importtime(stderr: str):
+    """Cumulative microseconds of each top-level import (nested imports are folded into their parent)"""
+    top_level = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, module = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:
+            root = module.split(".")[0]
+            top_level[root] = top_level.get(root, 0) + cumulative
+    return top_level
+
+
+def profile_target(name: str, repeat: int) -> dict:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    walls, imports = [], {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime"] + TARGETS[name], cwd=ROOT_DIR, env=env,
+                              capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{name} exited with {proc.returncode}:\n{proc.stderr[-2000:]}")
+        for module, us in parse_importtime(proc.stderr).items():
+            imports.setdefault(module, []).append(us)
+    target_s = STARTUP_SETTINGS["targets"].get(name)
+    wall_s = statistics.median(walls)
+    return {
+        "target": name,
+        "wall_s": wall_s,
+        "budget_s": target_s,
+        "within_budget": target_s is None or wall_s <= target_s,
+        "imports_s": {m: statistics.median(us) / 1e6 for m, us in imports.items()},
+    }
+
+
+def print_report(results, top: int):
+    for result in results:
+        budget = f"{result['budget_s']:.2f}s" if result["budget_s"] is not None else "-"
+        status = "ok" if result["within_budget"] else "OVER BUDGET"
+        print(f"\n{result['target']}: {result['wall_s']:.2f}s (budget {budget}) {status}")
+        heaviest = sorted(result["imports_s"].items(), key=lambda kv: kv[1], reverse=True)[:top]
+        for module, seconds in heaviest:
+            print(f"  {seconds:8.3f}s  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the app and batch entry points")
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument("--repeat", type=int, default=STARTUP_SETTINGS["repeat"],
+                        help="Fresh interpreters per target; the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest top-level imports to list per target")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if a target is over budget")
+    args = parser.parse_args()
+
+    results = [profile_target(name, args.repeat) for name in args.targets]
+    print_report(results, args.top)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.check and not all(r["within_budget"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Coverage of the local relevance selection against full-page results.
+
+For every raw markdown file under output/web_crawler/session_*/ that has a
+formatted result stored after it (the listings extracted from the full page),
+runs select_relevant and reports how many tokens it keeps and what share of
+those full-page listings could still be extracted from the selected blocks,
+next to the same share for the whole page (listings the model reworded beyond
+recognition can't be found in either). No LLM is called.
+
+Usage:
+    python -m benchmarks.relevance_coverage [--recall 0.9] [--token-budget 12000] [--json report.json]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.run_benchmarks import load_fixtures  # noqa: E402
+from web_scraper.assets import RELEVANCE_SETTINGS  # noqa: E402
+from web_scraper.relevance import select_relevant, listing_coverage  # noqa: E402
+
+
+def full_page_result(raw_path):
+    """Listings of the formatted file written after this raw file (and before the next one)"""
+    session_dir = os.path.dirname(raw_path)
+    stamp = os.path.basename(raw_path).split("_")[0]
+    later_raw = [os.path.basename(p).split("_")[0] for p in glob.glob(os.path.join(session_dir, "*_raw_data.md"))
+                 if os.path.basename(p).split("_")[0] > stamp]
+    limit = min(later_raw, default="99999999999999")
+    for path in sorted(glob.glob(os.path.join(session_dir, "*_formatted_data.json"))):
+        if stamp <= os.path.basename(path).split("_")[0] < limit:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data.get("listings") if isinstance(data, dict) else None
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relevance selection coverage against full-page results")
+    parser.add_argument("--fixtures", default=os.path.join(ROOT_DIR, "output", "web_crawler", "session_*",
+                                                           "*_raw_data.md"))
+    parser.add_argument("--recall", type=float, default=RELEVANCE_SETTINGS["recall"])
+    parser.add_argument("--token-budget", type=int, default=RELEVANCE_SETTINGS["token_budget"])
+    parser.add_argument("--min-page-tokens", type=int, default=RELEVANCE_SETTINGS["min_page_tokens"])
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    RELEVANCE_SETTINGS.update(recall=args.recall, token_budget=args.token_budget,
+                              min_page_tokens=args.min_page_tokens)
+
+    rows = []
+    for fixture in load_fixtures(args.fixtures):
+        listings = full_page_result(fixture["path"])
+        if not listings:
+            continue
+        selected, report = select_relevant(fixture["raw_data"], fixture["fields"])
+        rows.append({
+            "page": os.path.relpath(fixture["path"], ROOT_DIR),
+            "listings": len(listings),
+            "coverage": listing_coverage(selected, listings, fixture["fields"]),
+            "full_page_coverage": listing_coverage(fixture["raw_data"], listings, fixture["fields"]),
+            **report,
+        })
+
+    print(f"\n{'page':60} {'tokens':>15} {'blocks':>9} {'score':>6} {'listings':>9} {'coverage':>9} {'full page':>10}")
+    print("-" * 124)
+    for row in rows:
+        print(f"{row['page'][-60:]:60} {row['tokens_kept']:>7}/{row['page_tokens']:<7} "
+              f"{row['blocks_kept']:>4}/{row['blocks_total']:<4} {row['score_recall']:>6.0%} "
+              f"{row['listings']:>9} {row['coverage']:>9.0%} {row['full_page_coverage']:>10.0%}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+"""
+Offline benchmark for extraction and pagination.
+
+Replays every raw markdown file under output/web_crawler/session_*/ through
+scrape_urls, paginate_urls, extract_weedmaps_data and
+extract_weedmaps_pagination, with LLM calls answered by a local fake endpoint.
+Reports pages/sec, p50/p95 latency per page, tokens sent and peak memory per stage.
+
+Usage:
+    python -m benchmarks.run_benchmarks [--iterations 3] [--latency-ms 200] [--jitter-ms 50] [--json report.json]
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+DEFAULT_FIELDS = ["Product Name", "Price"]
+STAGES = ["extract_weedmaps_data", "extract_weedmaps_pagination", "scrape_urls", "paginate_urls"]
+
+
+def load_fixtures(pattern):
+    """Raw markdown files with the URL and fields of the session they came from"""
+    fixtures = []
+    for path in sorted(glob.glob(pattern)):
+        session_dir = os.path.dirname(path)
+        config_path = os.path.join(session_dir, "scrape_config.json")
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        with open(path, 'r', encoding='utf-8') as f:
+            raw_data = f.read()
+        if not raw_data:
+            continue
+        fixtures.append({
+            "path": path,
+            "url": (config.get("urls") or ["unknown_url"])[0],
+            "fields": config.get("fields") or DEFAULT_FIELDS,
+            "raw_data": raw_data,
+        })
+    return fixtures
+
+
+def load_canned_responses(pattern):
+    """First non-empty formatted and pagination outputs stored next to the fixtures"""
+    listings, pagination = None, None
+    for session_dir in sorted({os.path.dirname(p) for p in glob.glob(pattern)}):
+        for path in sorted(glob.glob(os.path.join(session_dir, "*_formatted_data.json"))):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if listings is None and isinstance(data, dict) and data.get("listings"):
+                listings = data
+        for path in sorted(glob.glob(os.path.join(session_dir, "*_pagination.json"))):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if pagination is None and isinstance(data, dict) and data.get("page_urls"):
+                pagination = data
+    return listings, pagination
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_stage(name, fn, fixtures, iterations, quiet):
+    """Time fn over every fixture `iterations` times, then measure peak memory over one pass"""
+    latencies = []
+    tokens_sent = 0
+    output = open(os.devnull, 'w') if quiet else sys.stdout
+
+    with contextlib.redirect_stdout(output):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for fixture in fixtures:
+                t0 = time.perf_counter()
+                tokens_sent += fn(fixture)
+                latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        for fixture in fixtures:
+            fn(fixture)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    if quiet:
+        output.close()
+
+    pages = len(latencies)
+    return {
+        "stage": name,
+        "pages": pages,
+        "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+        "tokens_sent": tokens_sent,
+        "peak_memory_mb": peak / (1024 * 1024),
+    }
+
+
+def build_stages(session_path, model):
+    from web_scraper.scraper import (scrape_urls, extract_weedmaps_data, create_dynamic_listing_model,
+                                     create_listings_container_model)
+    from web_scraper.pagination import paginate_urls, extract_weedmaps_pagination
+
+    def weedmaps_data(fixture):
+        container = create_listings_container_model(create_dynamic_listing_model(fixture["fields"]))
+        extract_weedmaps_data(fixture["raw_data"], fixture["fields"], container)
+        return 0
+
+    def weedmaps_pagination(fixture):
+        extract_weedmaps_pagination(fixture["raw_data"], fixture["url"])
+        return 0
+
+    def scrape(fixture):
+        in_tokens, _, _, _ = scrape_urls(session_path, [fixture["path"]], [fixture["url"]], fixture["fields"], model,
+                                         deduplicator=None)
+        return in_tokens
+
+    def paginate(fixture):
+        in_tokens, _, _, _ = paginate_urls(session_path, [fixture["path"]], [fixture["url"]], model, "")
+        return in_tokens
+
+    return {
+        "extract_weedmaps_data": weedmaps_data,
+        "extract_weedmaps_pagination": weedmaps_pagination,
+        "scrape_urls": scrape,
+        "paginate_urls": paginate,
+    }
+
+
+def print_report(results):
+    header = f"{'stage':<30}{'pages':>7}{'pages/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'tokens':>10}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['stage']:<30}{r['pages']:>7}{r['pages_per_sec']:>10.2f}{r['p50_ms']:>10.1f}"
+              f"{r['p95_ms']:>10.1f}{r['tokens_sent']:>10}{r['peak_memory_mb']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline extraction/pagination benchmark")
+    parser.add_argument("--fixtures", default=os.path.join(ROOT_DIR, "output", "web_crawler", "session_*", "*_raw_data.md"),
+                        help="Glob of raw markdown files to replay")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Fake LLM base latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="Fake LLM random extra latency")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--json", default=None, help="Also write the report to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the scraper's own output")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        print(f"No fixtures match {args.fixtures}")
+        return 1
+    listings, pagination = load_canned_responses(args.fixtures)
+
+    from benchmarks.fake_llm import FakeLLMServer
+    server = FakeLLMServer(listings_response=listings, pagination_response=pagination,
+                           latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000).start()
+
+    # Everything below talks to the fake endpoint only
+    os.environ["LLM_API_BASE"] = server.api_base
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    from web_scraper.assets import OPENAI_MODEL_FULLNAME, MODEL_FALLBACKS
+    MODEL_FALLBACKS.clear()
+
+    print(f"Replaying {len(fixtures)} pages x {args.iterations} iterations against {server.api_base}")
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as session_path:
+            # Keep benchmark calls out of the real cost ledger
+            os.environ["COST_LEDGER_PATH"] = os.path.join(session_path, "ledger.sqlite")
+            stages = build_stages(session_path, OPENAI_MODEL_FULLNAME)
+            for name in args.stages:
+                results.append(run_stage(name, stages[name], fixtures, args.iterations, quiet=not args.verbose))
+    finally:
+        server.stop()
+
+    print_report(results)
+    print(f"Fake LLM requests served: {server.requests}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"fixtures": len(fixtures), "iterations": args.iterations,
+                       "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "stages": results}, f, indent=2)
+        print(f"Report written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
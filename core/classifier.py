@@ -0,0 +1,160 @@
+"""
+Product category classification.
+Compiles a keyword taxonomy into a single regular expression so a product name
+is scanned once, no matter how many categories or keywords the taxonomy holds.
+"""
+
+import json
+import re
+from typing import Dict, List, Optional
+
+
+class CategoryClassifier:
+    """
+    Keyword-based product category classifier.
+
+    The taxonomy is a list of categories, each with a name, a priority and a
+    list of keywords. When several keywords match a product name, the category
+    with the highest priority wins; ties go to the category listed first.
+
+    Keywords are plain strings, or objects of the form
+    {"keyword": "cart", "word_boundary": true} to only match whole words.
+    A category-level "word_boundary" sets the default for its keywords.
+    """
+
+    def __init__(self, categories: List[Dict]):
+        self.categories = categories
+        self._entries = []
+
+        for order, category in enumerate(categories):
+            priority = category.get("priority", 0)
+            default_boundary = category.get("word_boundary", False)
+            for keyword in category.get("keywords", []):
+                if isinstance(keyword, dict):
+                    word_boundary = keyword.get("word_boundary", default_boundary)
+                    keyword = keyword["keyword"]
+                else:
+                    word_boundary = default_boundary
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                self._entries.append({
+                    "category": category["name"],
+                    "keyword": keyword,
+                    "priority": priority,
+                    "order": order,
+                    "word_boundary": word_boundary,
+                })
+
+        # Best entry first: highest priority, then taxonomy order, then longest keyword
+        self._entries.sort(key=lambda e: (-e["priority"], e["order"], -len(e["keyword"])))
+        for rank, entry in enumerate(self._entries):
+            entry["rank"] = rank
+        self._candidates = self._index(self._entries)
+        self._pattern = self._compile(self._candidates)
+
+    @staticmethod
+    def _index(entries: List[Dict]) -> Dict[str, List[Dict]]:
+        """
+        Map each keyword to the entries it can stand for when the matcher finds it:
+        its own entries plus those of every shorter keyword it starts with, which
+        the longest-first alternation would otherwise hide at the same position.
+        """
+        by_keyword = {}
+        for entry in entries:
+            by_keyword.setdefault(entry["keyword"], []).append(entry)
+        candidates = {}
+        for keyword in by_keyword:
+            found = [e for i in range(1, len(keyword) + 1) for e in by_keyword.get(keyword[:i], [])]
+            candidates[keyword] = sorted(found, key=lambda e: e["rank"])
+        return candidates
+
+    @staticmethod
+    def _compile(candidates: Dict[str, List[Dict]]):
+        if not candidates:
+            return None
+        # One group around a single alternation, longest keyword first. Wrapping it in
+        # a lookahead lets matches overlap, so a low-priority keyword can't hide a
+        # higher-priority one starting inside it.
+        keywords = sorted(candidates, key=lambda k: (-len(k), k))
+        return re.compile("(?=(" + "|".join(re.escape(k) for k in keywords) + "))")
+
+    @staticmethod
+    def _is_word_char(text: str, index: int) -> bool:
+        return 0 <= index < len(text) and (text[index].isalnum() or text[index] == "_")
+
+    @classmethod
+    def from_file(cls, filepath: str) -> "CategoryClassifier":
+        """
+        Build a classifier from a JSON taxonomy file.
+
+        Args:
+            filepath (str): Path to a file with a top-level "categories" list
+
+        Returns:
+            CategoryClassifier: Compiled classifier (empty if the file can't be read)
+        """
+        # Read here rather than with core.utils.load_json_file: core.utils imports this module
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                taxonomy = json.load(f)
+        except Exception as e:
+            print(f"Error loading category taxonomy: {e}")
+            taxonomy = None
+        return cls((taxonomy or {}).get("categories", []))
+
+    def match(self, product_name: str) -> Optional[Dict]:
+        """
+        Find the best matching taxonomy entry for a product name.
+
+        Args:
+            product_name (str): Product name
+
+        Returns:
+            dict: The winning entry (category, keyword, priority), or None
+        """
+        if not product_name or self._pattern is None:
+            return None
+
+        text = product_name.lower()
+        best = None
+        for m in self._pattern.finditer(text):
+            start = m.start()
+            for entry in self._candidates[m.group(1)]:
+                if best is not None and entry["rank"] >= best["rank"]:
+                    break
+                end = start + len(entry["keyword"])
+                if entry["word_boundary"] and (self._is_word_char(text, start - 1) or self._is_word_char(text, end)):
+                    continue
+                best = entry
+                break
+            if best is not None and best["rank"] == 0:
+                break
+        return best
+
+    def classify(self, product_name: str) -> Optional[str]:
+        """
+        Classify a single product name.
+
+        Args:
+            product_name (str): Product name
+
+        Returns:
+            str: Category name, or None if no keyword matches
+        """
+        entry = self.match(product_name)
+        return entry["category"] if entry else None
+
+
+_default_classifier = None
+
+
+def get_default_classifier() -> CategoryClassifier:
+    """
+    Return the classifier for the configured taxonomy file, compiling it on first use.
+    """
+    global _default_classifier
+    if _default_classifier is None:
+        from core.config import Config
+        _default_classifier = CategoryClassifier.from_file(Config.CATEGORY_TAXONOMY_PATH)
+    return _default_classifier
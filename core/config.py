@@ -19,6 +19,12 @@ class Config:
     # File paths
     OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'output')
     
+    # Product category taxonomy used by core.classifier
+    CATEGORY_TAXONOMY_PATH = os.getenv(
+        'CATEGORY_TAXONOMY_PATH',
+        os.path.join(os.path.dirname(__file__), 'taxonomy.json')
+    )
+    
     # Supabase configuration (legacy)
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
@@ -7,6 +7,10 @@ from datetime import datetime
 import re
 import json
 
+from core.classifier import get_default_classifier
+
+WEIGHT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(g|mg|oz)')
+
 def generate_unique_name(url: str) -> str:
     """
     Generate a unique name based on URL and timestamp.
@@ -39,23 +43,13 @@ def extract_product_metadata(product_name: str) -> dict:
     }
     
     # Extract weight and unit (e.g., ".5g", "1g", "3.5g", "100mg")
-    weight_pattern = r'(\d+(?:\.\d+)?)\s*(g|mg|oz)'
-    weight_match = re.search(weight_pattern, product_name)
+    weight_match = WEIGHT_PATTERN.search(product_name)
     if weight_match:
         metadata["weight"] = weight_match.group(1)
         metadata["unit"] = weight_match.group(2)
     
-    # Extract category based on common keywords
-    if any(kw in product_name.lower() for kw in ["flower", "deli"]):
-        metadata["category"] = "flower"
-    elif any(kw in product_name.lower() for kw in ["preroll", "pre-roll", "pre roll"]):
-        metadata["category"] = "preroll"
-    elif any(kw in product_name.lower() for kw in ["cartridge", "cart", "vape"]):
-        metadata["category"] = "cartridge"
-    elif any(kw in product_name.lower() for kw in ["edible", "gummies", "cookies"]):
-        metadata["category"] = "edible"
-    elif any(kw in product_name.lower() for kw in ["concentrate", "sugar", "sauce", "wax", "hash"]):
-        metadata["category"] = "concentrate"
+    # Extract category using the configured keyword taxonomy
+    metadata["category"] = get_default_classifier().classify(product_name)
     
     return metadata
 
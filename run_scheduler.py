@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Entry point script to run the recurring scrape scheduler.
+Jobs are stored in output/web_crawler/scheduler/state.json and reuse the
+scrape_config.json shape of a session.
+
+Usage:
+    python run_scheduler.py add --config path/to/scrape_config.json --interval-minutes 1440 [--priority 5] [--vendor name]
+    python run_scheduler.py list
+    python run_scheduler.py remove <job_id>
+    python run_scheduler.py run
+    python run_scheduler.py batches [--poll]
+
+Jobs added with --batch extract through the provider's batch API; the running
+scheduler collects their results (see BATCH_SETTINGS in web_scraper/assets.py).
+"""
+import sys
+import os
+import json
+import argparse
+
+# Add project root to Python path
+root_dir = os.path.dirname(os.path.abspath(__file__))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+
+def main():
+    from web_scraper.scheduler import JobStore, Scheduler
+
+    parser = argparse.ArgumentParser(description="Recurring scrape scheduler")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Add a recurring job")
+    add_parser.add_argument("--config", required=True, help="Path to a scrape_config.json-style file")
+    add_parser.add_argument("--interval-minutes", type=float, required=True)
+    add_parser.add_argument("--priority", type=int, default=0)
+    add_parser.add_argument("--vendor", default=None)
+    add_parser.add_argument("--job-id", default=None)
+    add_parser.add_argument("--batch", action="store_true",
+                            help="Extract through the provider's batch API (cheaper, results within hours)")
+
+    subparsers.add_parser("list", help="List jobs and their recent runs")
+
+    remove_parser = subparsers.add_parser("remove", help="Remove a job")
+    remove_parser.add_argument("job_id")
+
+    run_parser = subparsers.add_parser("run", help="Run the scheduler until interrupted")
+    run_parser.add_argument("--poll-interval", type=float, default=None)
+
+    batches_parser = subparsers.add_parser("batches", help="List batch extractions")
+    batches_parser.add_argument("--poll", action="store_true", help="Check submitted batches and collect finished ones")
+
+    args = parser.parse_args()
+    store = JobStore()
+
+    if args.command == "add":
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        if args.batch:
+            config["batch_mode"] = True
+        job = store.add_job(config, args.interval_minutes, priority=args.priority,
+                            vendor=args.vendor, job_id=args.job_id)
+        print(f"Added job {job['job_id']} (every {job['interval_minutes']} minutes, next run {job['next_run_at']})")
+    elif args.command == "list":
+        for job in store.list_jobs():
+            print(f"{job['job_id']}  priority={job['priority']}  every={job['interval_minutes']}m  "
+                  f"next={job['next_run_at']}  enabled={job['enabled']}  urls={len(job['config'].get('urls', []))}")
+            for run in store.list_runs(job['job_id'])[-3:]:
+                print(f"    {run['scheduled_for']}  {run['status']}  attempts={run['attempts']}  session={run['session_id']}")
+    elif args.command == "remove":
+        print("Removed" if store.remove_job(args.job_id) else f"No job {args.job_id}")
+    elif args.command == "batches":
+        from web_scraper.batch import BatchManager
+        manager = BatchManager()
+        if args.poll:
+            manager.poll_all()
+        for manifest in manager.list_batches():
+            print(f"{manifest['batch_key']}  {manifest['status']}  provider={manifest['provider_status'] or '-'}  "
+                  f"pages={len(manifest['pages'])}  model={manifest['model']}  session={manifest['session_id']}")
+    elif args.command == "run":
+        scheduler = Scheduler(store)
+        try:
+            scheduler.run_forever(poll_interval=args.poll_interval)
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
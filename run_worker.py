@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Entry point script for distributed queue workers.
+Runs with "distributed" in their config (and runs queued here) put one task per
+URL in the shared task queue, output/web_crawler/queue/tasks.sqlite by default;
+every worker process mounting the same output/ volume takes tasks from it.
+
+Usage:
+    python run_worker.py run [--concurrency 2] [--poll-interval 2]
+    python run_worker.py enqueue --config path/to/scrape_config.json [--vendor name] [--priority 0]
+    python run_worker.py status [--group <group_id>]
+
+See QUEUE_SETTINGS in web_scraper/assets.py for leases, heartbeats and retries.
+"""
+import sys
+import os
+import json
+import argparse
+import threading
+
+# Add project root to Python path
+root_dir = os.path.dirname(os.path.abspath(__file__))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+
+def main():
+    from web_scraper.assets import QUEUE_SETTINGS
+    from web_scraper.task_queue import get_task_queue
+
+    parser = argparse.ArgumentParser(description="Distributed scrape workers")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Take tasks from the queue until interrupted")
+    run_parser.add_argument("--concurrency", type=int, default=QUEUE_SETTINGS["concurrency"])
+    run_parser.add_argument("--poll-interval", type=float, default=None)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Create a session and queue its URLs")
+    enqueue_parser.add_argument("--config", required=True, help="Path to a scrape_config.json-style file")
+    enqueue_parser.add_argument("--vendor", default=None)
+    enqueue_parser.add_argument("--priority", type=int, default=0)
+
+    status_parser = subparsers.add_parser("status", help="Task counts, overall or for one run")
+    status_parser.add_argument("--group", default=None, help="Group id printed by enqueue")
+
+    args = parser.parse_args()
+    queue = get_task_queue()
+
+    if args.command == "run":
+        from web_scraper.distributed import QueueWorker
+        workers = [QueueWorker(queue) for _ in range(max(args.concurrency, 1))]
+        threads = [threading.Thread(target=w.run_forever, args=(args.poll_interval,), name=w.worker_id)
+                   for w in workers]
+        print(f"Starting {len(workers)} queue workers")
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1.0)
+        except KeyboardInterrupt:
+            # Running tasks finish; their leases would otherwise expire and pass them on
+            for worker in workers:
+                worker.stop()
+            for thread in threads:
+                thread.join()
+    elif args.command == "enqueue":
+        from web_scraper.distributed import enqueue_run
+        from web_scraper.session_manager import SessionManager
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        urls = config.get("urls", [])
+        if not urls:
+            sys.exit("Scrape config has no URLs")
+        config["distributed"] = True
+        session_manager = SessionManager()
+        vendor = args.vendor or session_manager.storage._extract_brand_from_url(urls[0])
+        session = session_manager.create_session(vendor, config)
+        queued = enqueue_run(session, urls, config, queue, priority=args.priority)
+        print(f"Session {session['session_id']}: {queued['tasks']} tasks in group {queued['group_id']}")
+    elif args.command == "status":
+        counts = queue.counts(args.group)
+        print("  ".join(f"{status}={n}" for status, n in sorted(counts.items())) or "No tasks")
+        if args.group:
+            for task in queue.group_tasks(args.group):
+                url = task["payload"].get("url", "")
+                print(f"    {task['id']}  {task['kind']}  {task['status']}  attempts={task['attempts']}  "
+                      f"{url}  {task['error'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
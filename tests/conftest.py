@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cost_ledger_path(tmp_path, monkeypatch):
+    """Every test records its LLM calls in its own ledger, never in the output directory's"""
+    path = tmp_path / "ledger.sqlite"
+    monkeypatch.setenv("COST_LEDGER_PATH", str(path))
+    return path
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from web_scraper import batch, pipeline
+from web_scraper.batch import BatchClient, BatchManager, StubBatchClient
+from web_scraper.file_storage import FileStorage
+from web_scraper.session_manager import SessionManager
+
+CONFIG = {"fields": ["name", "price"], "model": "gpt-4o-mini", "incremental": True}
+
+
+def _write_pages(session_path, urls):
+    paths = []
+    for i, url in enumerate(urls):
+        path = f"{session_path}/page{i}_raw_data.md"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# Page {i}\n\nShared Item $5.00\n\nItem {i} $1.00\n")
+        paths.append(path)
+    return paths
+
+
+def _responder(requests):
+    def respond(body):
+        requests.append(body)
+        return json.dumps({"listings": [{"name": "Shared Item", "price": "$5.00"},
+                                        {"name": f"Item {len(requests)}", "price": "$1.00"}]})
+    return respond
+
+
+def _run(storage, vendor, client, urls):
+    session_id, session_path = storage.create_session_dir(vendor)
+    paths = _write_pages(session_path, urls)
+    session = {"session_id": session_id, "session_path": session_path, "vendor": vendor}
+    manager = BatchManager(SessionManager(storage), client)
+    return manager.poll(manager.submit(session, urls, paths, CONFIG))
+
+
+def test_batch_client_is_abstract():
+    with pytest.raises(TypeError):
+        BatchClient()
+
+
+def test_collect_dedupes_and_reuses_unchanged_pages(tmp_path, monkeypatch):
+    requests = []
+    storage = FileStorage(str(tmp_path / "out"))
+    client = StubBatchClient(str(tmp_path / "stub"), 0, _responder(requests))
+    urls = ["https://example.com/p0", "https://example.com/p1"]
+
+    first = _run(storage, "first", client, urls)
+    assert first["status"] == "collected"
+    assert first["dedup_stats"]["duplicates"] == 1
+    assert len(requests) == 2
+
+    # Same pages again: unchanged since their snapshots, so nothing goes to the provider
+    second = _run(storage, "second", client, urls)
+    assert second["status"] == "collected"
+    assert second["provider_batch_id"] is None
+    assert [page["mode"] for page in second["pages"].values()] == ["local", "local"]
+    assert len(requests) == 2
+
+
+def test_batch_session_completes_when_collected(tmp_path, monkeypatch):
+    client = StubBatchClient(str(tmp_path / "stub"), 3600, _responder([]))
+    monkeypatch.setattr(batch, "get_batch_client", lambda: client)
+    monkeypatch.setattr(pipeline, "fetch_and_store_markdowns",
+                        lambda session_path, urls, progress=None: _write_pages(session_path, urls))
+    session_manager = SessionManager(FileStorage(str(tmp_path / "out")))
+    urls = ["https://example.com/p0", "https://example.com/p1"]
+    session = session_manager.create_session("acme", dict(CONFIG, urls=urls, batch_mode=True))
+    progress = session_manager.get_progress(session["session_id"])
+
+    summary = pipeline.run_session(session, urls, session_manager, progress)
+    assert summary["status"] == "queued" and not summary["scrape_completed"]
+    assert session_manager.get_progress(session["session_id"]).status == "queued"
+
+    # Usage of the rest of the run (pagination) is kept when the batch's is added
+    session_manager.update_session_config(session["session_id"], {"total_cost": 1.0, "total_input_tokens": 100})
+    client.delay = 0
+    manifest = BatchManager(session_manager, client).poll_all()[0]
+    stored = session_manager.get_session(session["session_id"])["config"]
+    assert stored["scrape_completed"]
+    assert stored["total_cost"] == pytest.approx(1.0 + manifest["usage"]["cost"])
+    assert stored["total_input_tokens"] == 100 + manifest["usage"]["input_tokens"]
+    assert session_manager.get_progress(session["session_id"]).status == "completed"
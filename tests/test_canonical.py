@@ -0,0 +1,18 @@
+from web_scraper.canonical import canonicalize_url, unique_urls
+from web_scraper.session_manager import SessionProgress
+from web_scraper.file_storage import FileStorage
+
+
+def test_unique_urls_keeps_the_urls_as_given():
+    urls = ["https://www.walmart.com/search/?q=blue%20dream&sid=abc&from=home",
+            "https://www.walmart.com/search?q=blue+dream",
+            "https://example.com/catalog/?utm_source=mail"]
+    assert canonicalize_url(urls[0]) == canonicalize_url(urls[1])
+    assert unique_urls(urls) == [urls[0], urls[2]]
+
+
+def test_checkpoints_are_found_under_any_equivalent_url(tmp_path):
+    storage = FileStorage(str(tmp_path))
+    progress = SessionProgress(storage, str(tmp_path))
+    progress.record("https://example.com/catalog/?utm_source=mail", "fetched", raw_path="page.md")
+    assert progress.get("https://EXAMPLE.com/catalog", "fetched")["raw_path"] == "page.md"
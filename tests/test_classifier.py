@@ -0,0 +1,43 @@
+from core import classifier as classifier_module
+from core.classifier import CategoryClassifier
+from core.utils import extract_product_metadata
+
+
+def test_higher_priority_keyword_inside_longer_match_wins():
+    classifier = CategoryClassifier([
+        {"name": "Accessories", "priority": 0, "keywords": ["cartridge holder"]},
+        {"name": "Vapes", "priority": 5, "keywords": ["cartridge"]},
+    ])
+    assert classifier.classify("510 Cartridge Holder") == "Vapes"
+
+
+def test_word_boundary_keywords_match_whole_words_only():
+    classifier = CategoryClassifier([
+        {"name": "Vapes", "keywords": [{"keyword": "cart", "word_boundary": True}]},
+    ])
+    assert classifier.classify("Live Resin Cart 1g") == "Vapes"
+    assert classifier.classify("Cartoon Sticker") is None
+
+
+def test_large_taxonomy_keeps_priority_order():
+    categories = [{"name": f"category {i}", "priority": i % 5,
+                   "keywords": [f"kw{i}x{j}" for j in range(10)]} for i in range(100)]
+    classifier = CategoryClassifier(categories)
+    assert classifier.classify("pack of kw42x7") == "category 42"
+    # kw4x1 (priority 4) beats kw10x1 (priority 0) though it starts later in the name
+    assert classifier.classify("kw10x1 and kw4x1") == "category 4"
+    assert classifier.classify("some product name with no keyword kw") is None
+
+
+def test_taxonomy_is_compiled_once_for_many_products(monkeypatch):
+    built = []
+
+    def from_file(path):
+        built.append(path)
+        return CategoryClassifier([{"name": "Vapes", "keywords": ["cart"]}])
+
+    monkeypatch.setattr(classifier_module, "_default_classifier", None)
+    monkeypatch.setattr(CategoryClassifier, "from_file", staticmethod(from_file))
+    categories = [extract_product_metadata(f"Live Resin Cart {i}g")["category"] for i in range(50)]
+    assert categories == ["Vapes"] * 50
+    assert len(built) == 1
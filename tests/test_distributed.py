@@ -0,0 +1,52 @@
+import pytest
+
+from web_scraper import markdown, pagination, scraper
+from web_scraper.distributed import run_page_task
+from web_scraper.file_storage import FileStorage
+from web_scraper.session_manager import EXTRACTED, FETCHED, PAGINATED, SessionManager
+
+URL = "https://example.com/catalog"
+
+
+def test_retry_skips_finished_stages(tmp_path, monkeypatch):
+    session_manager = SessionManager(FileStorage(str(tmp_path)))
+    config = {"urls": [URL], "fields": ["name"], "model": "gpt-4o-mini", "use_pagination": True}
+    session = session_manager.create_session("acme", config)
+    calls = {"fetch": 0, "extract": 0, "paginate": 0}
+
+    def fetch(session_path, urls, progress=None):
+        calls["fetch"] += 1
+        path = tmp_path / "page_raw_data.md"
+        path.write_text("Item $1.00", encoding="utf-8")
+        return [str(path)]
+
+    def extract(session_path, file_paths, urls, fields, model, **kwargs):
+        calls["extract"] += 1
+        path = tmp_path / "page_formatted_data.json"
+        path.write_text('{"listings": []}', encoding="utf-8")
+        return 10, 5, 0.01, [{"url": URL, "output_path": str(path)}]
+
+    def paginate(session_path, file_paths, urls, model, details):
+        calls["paginate"] += 1
+        if calls["paginate"] == 1:
+            raise RuntimeError("provider down")
+        path = tmp_path / "page_pagination.json"
+        path.write_text('{"page_urls": []}', encoding="utf-8")
+        return 3, 2, 0.001, [{"url": URL, "output_path": str(path)}]
+
+    monkeypatch.setattr(markdown, "fetch_and_store_markdowns", fetch)
+    monkeypatch.setattr(scraper, "scrape_urls", extract)
+    monkeypatch.setattr(pagination, "paginate_urls", paginate)
+    payload = {"session_id": session["session_id"], "url": URL, "config": config, "paginate": True}
+
+    with pytest.raises(RuntimeError):
+        run_page_task(payload, session_manager, f"{session['session_id']}@run1")
+    result = run_page_task(payload, session_manager, f"{session['session_id']}@run1")
+
+    assert calls == {"fetch": 1, "extract": 1, "paginate": 2}
+    assert result[EXTRACTED]["cost"] == 0.01
+    assert {FETCHED, EXTRACTED, PAGINATED} <= set(result)
+
+    # Another run of the same session starts from scratch
+    run_page_task(payload, session_manager, f"{session['session_id']}@run2")
+    assert calls["fetch"] == 2
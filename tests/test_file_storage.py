@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+from web_scraper import file_storage
+from web_scraper.file_storage import FileStorage
+
+NOW = datetime(2025, 3, 22, 15, 30, 45)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    # Every save in the test happens within the same second, so they all want the same name
+    monkeypatch.setattr(file_storage, "datetime", FrozenDatetime)
+    return FileStorage(str(tmp_path))
+
+
+def _formatted_files(path):
+    return sorted(f for f in os.listdir(path) if f.endswith("_formatted_data.json"))
+
+
+def test_existing_file_is_not_overwritten(storage, tmp_path):
+    taken = tmp_path / "20250322153045_unknown_formatted_data.json"
+    taken.write_text('{"listings": ["earlier"]}', encoding="utf-8")
+
+    path = storage.save_formatted_data(str(tmp_path), "https://example.com/", {"listings": ["new"]})
+
+    assert os.path.basename(path) == "20250322153045-1_unknown_formatted_data.json"
+    assert json.loads(taken.read_text(encoding="utf-8")) == {"listings": ["earlier"]}
+
+
+def test_concurrent_saves_keep_every_file(storage, tmp_path, monkeypatch):
+    # Both writers have picked their file name before either of them writes
+    both_named = threading.Barrier(2, timeout=5)
+
+    @contextmanager
+    def span(name, **labels):
+        both_named.wait()
+        yield
+
+    monkeypatch.setattr(file_storage, "span", span)
+
+    def save(i):
+        return storage.save_formatted_data(str(tmp_path), "https://example.com/", {"listings": [i]})
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        paths = list(pool.map(save, range(2)))
+
+    assert len(set(paths)) == 2
+    assert len(_formatted_files(tmp_path)) == 2
+    for i, path in enumerate(paths):
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f) == {"listings": [i]}
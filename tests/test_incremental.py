@@ -0,0 +1,24 @@
+from web_scraper import scraper
+from web_scraper.file_storage import FileStorage
+from web_scraper.incremental import PageSnapshotStore
+
+URL = "https://example.com/catalog"
+FIELDS = ["name", "price"]
+
+
+def test_snapshots_are_kept_in_the_given_storage(tmp_path, monkeypatch):
+    storage = FileStorage(str(tmp_path / "out"))
+    session_path = tmp_path / "out" / "session_acme_202503221530"
+    session_path.mkdir()
+    raw_path = session_path / "page_raw_data.md"
+    raw_path.write_text("# Catalog\n\nBlue Dream $21.00\n", encoding="utf-8")
+
+    def extract(raw_data, url, fields, container_model, selected_model, router=None, html=""):
+        return {"listings": [{"name": "Blue Dream", "price": "$21.00"}]}, {"input_tokens": 50, "output_tokens": 10}, 0.01
+
+    monkeypatch.setattr(scraper, "extract_listings", extract)
+    scraper.scrape_urls(str(session_path), [str(raw_path)], [URL], FIELDS, "gpt-4o-mini", incremental=True,
+                        storage=storage)
+
+    snapshot = PageSnapshotStore(storage).get(URL, FIELDS, "gpt-4o-mini")
+    assert snapshot is not None and snapshot["input_tokens"] == 50
@@ -0,0 +1,32 @@
+from web_scraper.json_repair import repair_json
+
+
+def test_truncation_inside_a_nested_array_drops_the_partial_listing():
+    text = ('{"listings": [{"name": "Blue Dream", "tags": ["sativa", "hybrid"]}, '
+            '{"name": "OG Kush", "tags": ["indica", "ku')
+    parsed, info = repair_json(text)
+    assert info["truncated"]
+    assert parsed == {"listings": [{"name": "Blue Dream", "tags": ["sativa", "hybrid"]}]}
+
+
+def test_truncation_after_a_nested_array_element_drops_the_partial_listing():
+    text = '{"listings": [{"name": "Blue Dream", "tags": ["sativa"]}, {"name": "OG Kush", "tags": ["indica",'
+    parsed, _ = repair_json(text)
+    assert parsed == {"listings": [{"name": "Blue Dream", "tags": ["sativa"]}]}
+
+
+def test_truncation_inside_the_first_listing_keeps_no_listings():
+    parsed, info = repair_json('```json\n{"listings": [{"name": "Blue Dream", "tags": ["sat')
+    assert info["truncated"]
+    assert parsed == {"listings": []}
+
+
+def test_truncation_between_listings_keeps_complete_ones():
+    parsed, _ = repair_json('[{"name": "A", "price": "$1"}, {"name": "B", "pri')
+    assert parsed == [{"name": "A", "price": "$1"}]
+
+
+def test_trailing_commas_are_repaired():
+    parsed, info = repair_json('{"listings": [{"name": "A",},],}')
+    assert info["repaired"] and not info["truncated"]
+    assert parsed == {"listings": [{"name": "A"}]}
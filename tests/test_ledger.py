@@ -0,0 +1,17 @@
+from web_scraper.ledger import get_ledger, record_llm_call
+
+
+def test_ledger_follows_the_configured_path(tmp_path, monkeypatch, cost_ledger_path):
+    record_llm_call(url="https://example.com/p1", model="gpt-4o-mini", input_tokens=10, output_tokens=5,
+                    cost=0.01, latency_s=0.1, vendor="acme")
+    assert get_ledger().db_path == str(cost_ledger_path)
+
+    other = tmp_path / "other.sqlite"
+    monkeypatch.setenv("COST_LEDGER_PATH", str(other))
+    record_llm_call(url="https://example.com/p2", model="gpt-4o-mini", input_tokens=20, output_tokens=5,
+                    cost=0.02, latency_s=0.1, vendor="acme")
+
+    assert get_ledger().db_path == str(other)
+    assert get_ledger().totals()["input_tokens"] == 20
+    monkeypatch.setenv("COST_LEDGER_PATH", str(cost_ledger_path))
+    assert get_ledger().totals()["input_tokens"] == 10
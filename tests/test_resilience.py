@@ -0,0 +1,54 @@
+import pytest
+
+from web_scraper.resilience import call_with_resilience, get_circuit_breaker
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+def _half_open_breaker(provider):
+    breaker = get_circuit_breaker(provider)
+    breaker.state = "open"
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = -breaker.reset_timeout  # reset timeout long past: next call is the probe
+    return breaker
+
+
+def test_half_open_probe_with_client_error_closes_the_circuit():
+    breaker = _half_open_breaker("probe-client-error")
+
+    def call(model):
+        raise BadRequestError("invalid request")
+
+    with pytest.raises(BadRequestError):
+        call_with_resilience(call, ["probe-client-error/model"])
+    assert breaker.state == "closed"
+
+    result, model, attempts = call_with_resilience(lambda model: "ok", ["probe-client-error/model"])
+    assert result == "ok"
+
+
+def test_half_open_probe_with_validation_error_closes_the_circuit():
+    breaker = _half_open_breaker("probe-validation-error")
+
+    def call(model):
+        raise ValueError("output failed validation")
+
+    with pytest.raises(ValueError):
+        call_with_resilience(call, ["probe-validation-error/model"])
+    assert breaker.state == "closed"
+
+
+def test_half_open_probe_with_provider_failure_reopens_the_circuit():
+    breaker = _half_open_breaker("probe-provider-failure")
+
+    class ServiceUnavailableError(Exception):
+        status_code = 503
+
+    def call(model):
+        raise ServiceUnavailableError("overloaded")
+
+    with pytest.raises(ServiceUnavailableError):
+        call_with_resilience(call, ["probe-provider-failure/model"])
+    assert breaker.state == "open"
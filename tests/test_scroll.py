@@ -0,0 +1,25 @@
+from web_scraper.scroll import DELTA_HEADING, ScrollHarvester
+
+
+def _harvester(*deltas):
+    harvester = ScrollHarvester("https://example.com/catalog")
+    harvester.deltas = [list(step) for step in deltas]
+    return harvester
+
+
+def test_text_before_scrolling_is_not_appended():
+    harvester = _harvester(["Menu", "Cookie banner text"], [])
+    assert harvester.merge("# Catalog\n") == "# Catalog\n"
+
+
+def test_captured_lines_match_despite_markup():
+    markdown = "## Blue Dream\n\n| **Blue Dream** | $21.00 |\n\n* [Sour Diesel](https://example.com/p/2)\n"
+    harvester = _harvester([], ["Blue Dream", "$21.00", "Sour  Diesel", "OG Kush"])
+    merged = harvester.merge(markdown)
+    assert merged.endswith(f"{DELTA_HEADING}\n\nOG Kush\n")
+    assert merged.count("Sour") == 1
+
+
+def test_short_lines_are_not_matched_as_substrings():
+    harvester = _harvester([], ["$5.00"])
+    assert "$5.00" in harvester.merge("Gift card $5.00 off your first order\n").split(DELTA_HEADING)[1]
@@ -0,0 +1,16 @@
+import pytest
+
+from web_scraper.task_queue import SQLiteTaskQueue, TaskQueue
+
+
+def test_task_queue_is_abstract():
+    with pytest.raises(TypeError):
+        TaskQueue()
+
+
+def test_enqueue_is_deduplicated(tmp_path):
+    queue = SQLiteTaskQueue(str(tmp_path / "tasks.sqlite"))
+    first = queue.enqueue("page", {"url": "https://example.com/"}, "group", dedupe_key="group:https://example.com/")
+    again = queue.enqueue("page", {"url": "https://example.com/"}, "group", dedupe_key="group:https://example.com/")
+    assert first is not None and again is None
+    assert queue.counts("group") == {"pending": 1}
@@ -0,0 +1,36 @@
+import time
+
+from web_scraper import workers
+from web_scraper.file_storage import FileStorage
+from web_scraper.session_manager import SessionManager, SessionProgress
+from web_scraper.workers import COMPLETED, HANDED_OFF, WorkerPool
+
+
+def _wait(run, timeout=10):
+    deadline = time.time() + timeout
+    while run.status in (workers.QUEUED, workers.RUNNING) and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def test_distributed_run_is_queued_until_finalized(tmp_path, monkeypatch):
+    monkeypatch.setitem(workers.WORKER_SETTINGS, "preload_imports", False)
+    monkeypatch.setenv("TASK_QUEUE_PATH", str(tmp_path / "tasks.sqlite"))
+    session_manager = SessionManager(FileStorage(str(tmp_path / "out")))
+    config = {"urls": ["https://example.com/p1"], "fields": ["name"], "model": "gpt-4o-mini", "distributed": True}
+    session = session_manager.create_session("acme", config)
+    pool = WorkerPool(max_workers=1, session_manager=session_manager)
+
+    run = pool.submit(session["session_id"])
+    _wait(run)
+    assert pool.get(run.run_id).status == HANDED_OFF
+    assert not run.done
+
+    # What finalize_run leaves behind once the queue workers are done
+    session_manager.update_session_config(session["session_id"], {"scrape_completed": True, "total_cost": 0.5,
+                                                                   "listings_table": "listings.sqlite"})
+    SessionProgress(session_manager.storage, session["session_path"]).set_status("completed")
+
+    run = pool.get(run.run_id)
+    assert run.status == COMPLETED
+    assert run.summary["total_cost"] == 0.5 and run.summary["listings_table"] == "listings.sqlite"
+    pool.shutdown()
@@ -1,19 +1,57 @@
-import streamlit as st
+import contextvars
 import os
+import sys
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from .assets import MODELS_USED
 
 load_dotenv()
+
+# API keys handed to a background run (worker threads can't read st.session_state)
+_run_api_keys = contextvars.ContextVar("run_api_keys", default=None)
+
+
+def _session_state():
+    """
+    The Streamlit session state, or an empty dict outside the app.
+    Streamlit is only looked up if the app already imported it, so batch entry
+    points (scheduler, benchmarks) don't pay for importing it.
+    """
+    st = sys.modules.get("streamlit")
+    return st.session_state if st is not None else {}
+
+
+def session_api_keys():
+    """The API keys entered in the current Streamlit session, by env var name"""
+    names = {name for keys in MODELS_USED.values() for name in keys}
+    state = _session_state()
+    return {name: state.get(name) for name in names if state.get(name)}
+
+
+@contextmanager
+def use_api_keys(api_keys):
+    """Make `api_keys` (as returned by session_api_keys) visible to get_api_key in this block"""
+    token = _run_api_keys.set(api_keys or {})
+    try:
+        yield
+    finally:
+        _run_api_keys.reset(token)
+
+
 def get_api_key(model):
     """
     Returns an API key for a given model by:
       1) Looking up the environment var name in MODELS_USED[model].
          (We assume there's exactly one item in that set.)
-      2) Returning the key from st.session_state if present;
+      2) Returning the key handed to the current background run, if any;
+         otherwise from st.session_state if present;
          otherwise from os.environ.
     """
     env_var_name = list(MODELS_USED[model])[0]  # e.g., "GEMINI_API_KEY"
-    return st.session_state.get(env_var_name) or os.getenv(env_var_name)
+    run_keys = _run_api_keys.get()
+    if run_keys is not None:
+        return run_keys.get(env_var_name) or os.getenv(env_var_name)
+    return _session_state().get(env_var_name) or os.getenv(env_var_name)
 
 # The following functions are no longer needed since we migrated to file-based storage
 # They're replaced with empty implementations to prevent import errors
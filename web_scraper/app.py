@@ -31,39 +31,157 @@ import pandas as pd
 import json
 import re
 import threading
+import time
+import math
 
 # Use absolute imports to avoid relative import errors in Docker
 # Check if running as script or imported as module
 if __name__ == "__main__" or os.environ.get("DOCKER_ENVIRONMENT", "false") == "true":
     # When running directly or in Docker, use absolute imports
     from web_scraper.asyncio_helper import ensure_event_loop
-    from web_scraper.scraper import scrape_urls
-    from web_scraper.pagination import paginate_urls
-    from web_scraper.markdown import fetch_and_store_markdowns
-    from web_scraper.assets import MODELS_USED
+    from web_scraper.assets import MODELS_USED, AUTO_MODEL, WORKER_SETTINGS
     from web_scraper.file_storage import FileStorage
     from web_scraper.session_manager import SessionManager
+    from web_scraper.metrics import stage_breakdown
+    from web_scraper.workers import WorkerPool, COMPLETED, CANCELLED, HANDED_OFF
+    from web_scraper.api_management import session_api_keys
+    from web_scraper.ledger import get_ledger
+    from web_scraper.results_table import ListingsTable, export_table
+    from web_scraper.offload import run_cpu
+    from web_scraper.canonical import unique_urls
 else:
     # When imported as part of a package, use relative imports
     from .asyncio_helper import ensure_event_loop
-    from .scraper import scrape_urls
-    from .pagination import paginate_urls
-    from .markdown import fetch_and_store_markdowns
-    from .assets import MODELS_USED
+    from .assets import MODELS_USED, AUTO_MODEL, WORKER_SETTINGS
     from .file_storage import FileStorage
     from .session_manager import SessionManager
+    from .metrics import stage_breakdown
+    from .workers import WorkerPool, COMPLETED, CANCELLED, HANDED_OFF
+    from .api_management import session_api_keys
+    from .ledger import get_ledger
+    from .results_table import ListingsTable, export_table
+    from .offload import run_cpu
+    from .canonical import unique_urls
 
 # Apply the helper function to ensure we have an event loop
 ensure_event_loop()
 
+
+@st.cache_resource
+def get_worker_pool():
+    """Background scrape workers shared by every browser session; survives reruns"""
+    return WorkerPool(max_workers=WORKER_SETTINGS["max_workers"], session_manager=get_session_manager())
+
+
+def submit_run(urls=None, config=None, fresh=True):
+    """Queue a scrape of the active session on the worker pool and start polling it"""
+    run = get_worker_pool().submit(st.session_state['session_id'], urls=urls, config=config,
+                                   api_keys=session_api_keys(), fresh=fresh)
+    st.session_state['run_id'] = run.run_id
+    st.session_state['scraping_state'] = 'running'
+    return run
+
+
+@st.cache_resource
+def get_storage():
+    """One FileStorage per app process instead of one per rerun"""
+    return FileStorage()
+
+
+@st.cache_resource
+def get_session_manager():
+    return SessionManager(get_storage())
+
+
+@st.cache_data(show_spinner=False)
+def cached_session_list(base_dir, version):
+    """Session names; `version` (the base directory's mtime) changes whenever a session is created"""
+    return sorted(get_storage().list_sessions())
+
+
+def list_sessions():
+    base_dir = get_storage().base_dir
+    return cached_session_list(base_dir, os.stat(base_dir).st_mtime_ns)
+
+
+@st.cache_data(show_spinner=False, ttl=30)
+def cached_ledger_summary():
+    """Ledger aggregates, refreshed at most every 30s and whenever a run finishes"""
+    ledger = get_ledger()
+    return ledger.totals(), ledger.tokens_per_page_by_domain(), ledger.cost_per_vendor_per_day()
+
+
+@st.cache_data(show_spinner=False, max_entries=10)
+def build_pagination_tables(results_key, _pagination_info):
+    """Page URL rows and download payloads for a run's pagination results, built once per results_key"""
+    all_page_rows = []
+    for item in _pagination_info:
+        if not isinstance(item, dict):
+            continue
+        pag_obj = item.get("pagination_data")
+        if hasattr(pag_obj, "model_dump"):
+            pag_obj = pag_obj.model_dump()
+        elif isinstance(pag_obj, str):
+            try:
+                pag_obj = json.loads(pag_obj)
+            except json.JSONDecodeError:
+                pass
+
+        # One row per page URL; otherwise the whole item as a single row
+        if isinstance(pag_obj, dict) and isinstance(pag_obj.get("page_urls"), list):
+            for page_url in pag_obj["page_urls"]:
+                all_page_rows.append({"page_url": page_url, "file_path": item.get("file_path", ""),
+                                      "output_path": item.get("output_path", "")})
+        else:
+            all_page_rows.append(dict(item))
+
+    pagination_df = pd.DataFrame(all_page_rows) if all_page_rows else pd.DataFrame(columns=["page_url"])
+    return {
+        "rows": all_page_rows,
+        "table": pagination_df,
+        "csv": pagination_df.to_csv(index=False),
+        "json": json.dumps(all_page_rows, indent=4),
+    }
+
+
+def apply_run_summary(summary):
+    """Store a finished run's results the way the results view expects them"""
+    st.session_state['results'] = {
+        'key': f"{summary['session_id']}@{summary['scrape_timestamp']}",
+        # Listings stay on disk; the results view pages through this table
+        'listings_table': summary.get('listings_table'),
+        'input_tokens': summary['total_input_tokens'],
+        'output_tokens': summary['total_output_tokens'],
+        'total_cost': summary['total_cost'],
+        'pagination_info': summary['pagination_info']
+    }
+    if summary.get('scrape_usage'):
+        st.session_state['in_tokens_s'] = summary['scrape_usage']['input_tokens']
+        st.session_state['out_tokens_s'] = summary['scrape_usage']['output_tokens']
+        st.session_state['cost_s'] = summary['scrape_usage']['cost']
+    if summary.get('pagination_usage'):
+        st.session_state['in_tokens_p'] = summary['pagination_usage']['input_tokens']
+        st.session_state['out_tokens_p'] = summary['pagination_usage']['output_tokens']
+        st.session_state['cost_p'] = summary['pagination_usage']['cost']
+    for key in ('routing_report', 'dedup_stats', 'incremental_stats'):
+        if summary.get(key):
+            st.session_state[key] = summary[key]
+        else:
+            st.session_state.pop(key, None)
+    # The run added calls to the ledger
+    cached_ledger_summary.clear()
+
 # Initialize Streamlit app
 st.set_page_config(page_title="Universal Web Scraper", page_icon="🦑")
 
 st.title("Universal Web Scraper 🦑")
 
+# Create the pool on first render; it preloads the scrape pipeline in the background
+get_worker_pool()
+
 # Initialize session state variables
 if 'scraping_state' not in st.session_state:
-    st.session_state['scraping_state'] = 'idle'  # Possible states: 'idle', 'waiting', 'scraping', 'completed'
+    st.session_state['scraping_state'] = 'idle'  # Possible states: 'idle', 'running', 'completed', 'failed'
 if 'results' not in st.session_state:
     st.session_state['results'] = None
 if 'driver' not in st.session_state:
@@ -88,7 +206,8 @@ with st.sidebar.expander("API Keys", expanded=False):
             st.text_input(key_name,type="password",key=key_name)
 
 # Model selection
-model_selection = st.sidebar.selectbox("Select Model", options=list(MODELS_USED.keys()), index=0)
+model_selection = st.sidebar.selectbox("Select Model", options=list(MODELS_USED.keys()) + [AUTO_MODEL], index=0,
+                                       help=f"'{AUTO_MODEL}' sends each page to the cheapest model that fits it and escalates to a stronger model when the output looks incomplete")
 st.sidebar.markdown("---")
 st.sidebar.write("## URL Input Section")
 # Ensure the session state for our URL list exists
@@ -109,8 +228,8 @@ with st.sidebar.container():
         if st.button("Add URLs"):
             if url_text.strip():
                 new_urls = re.split(r"\s+", url_text.strip())
-                new_urls = [u for u in new_urls if u]
-                st.session_state["urls_splitted"].extend(new_urls)
+                # Canonical forms, so the same page pasted with other tracking parameters is added once
+                st.session_state["urls_splitted"] = unique_urls(st.session_state["urls_splitted"] + new_urls)
                 st.session_state["text_temp"] = ""
                 st.rerun()
         if st.button("Clear URLs"):
@@ -149,6 +268,18 @@ fields = []
 if show_tags:
     fields = st_tags_sidebar(label='Enter Fields to Extract:',text='Press enter to add a field',value=[],suggestions=[],maxtags=-1,key='fields_input')
 
+# Listing deduplication across pages (and optionally previous sessions)
+deduplicate = st.sidebar.toggle("Deduplicate Listings", value=True)
+dedupe_near = False
+dedupe_across_sessions = False
+if deduplicate:
+    dedupe_near = st.sidebar.checkbox("Also drop near-duplicate titles", value=False)
+    dedupe_across_sessions = st.sidebar.checkbox("Skip listings seen in previous sessions for this vendor", value=False)
+
+# Incremental mode reuses earlier extractions for pages that haven't changed
+incremental = st.sidebar.toggle("Incremental Re-scrape", value=False,
+                                help="Skip extraction for pages unchanged since they were last scraped and only re-extract changed sections")
+
 st.sidebar.markdown("---")
 
 # Pagination toggle and details
@@ -178,7 +309,7 @@ with st.sidebar.expander("Session Management"):
         # Extract vendor from URL if not specified
         if not vendor_name and st.session_state.get("urls_splitted"):
             url = st.session_state["urls_splitted"][0]
-            vendor_name = FileStorage()._extract_brand_from_url(url)
+            vendor_name = get_storage()._extract_brand_from_url(url)
         
         # Create initial config
         initial_config = {
@@ -186,10 +317,14 @@ with st.sidebar.expander("Session Management"):
             "fields": fields,
             "model": model_selection,
             "use_pagination": use_pagination,
-            "pagination_details": pagination_details
+            "pagination_details": pagination_details,
+            "deduplicate": deduplicate,
+            "dedupe_near": dedupe_near,
+            "dedupe_across_sessions": dedupe_across_sessions,
+            "incremental": incremental
         }
         
-        session_manager = SessionManager()
+        session_manager = get_session_manager()
         session = session_manager.create_session(vendor_name, initial_config)
         
         st.session_state['session_id'] = session["session_id"]
@@ -197,8 +332,8 @@ with st.sidebar.expander("Session Management"):
         st.success(f"Started new session: {session['session_id']}")
     
     # Option to load existing session
-    session_manager = SessionManager()
-    available_sessions = session_manager.storage.list_sessions()
+    session_manager = get_session_manager()
+    available_sessions = list_sessions()
     
     selected_session = st.selectbox("Load Existing Session", 
                                   ["None"] + available_sessions)
@@ -215,6 +350,27 @@ with st.sidebar.expander("Session Management"):
             st.session_state['session_path'] = session["session_path"]
             st.success(f"Loaded session: {session['session_id']}")
 
+            # Offer to resume sessions whose last run never completed
+            progress = session_manager.get_progress(session["session_id"])
+            if progress.data["pages"] and progress.status != "completed":
+                st.session_state['scraping_state'] = 'failed'
+
+# LLM spend across all sessions, from the persistent call ledger
+with st.sidebar.expander("Cost Ledger"):
+    ledger_totals, ledger_by_domain, ledger_by_vendor_day = cached_ledger_summary()
+    st.markdown(f"*LLM Calls:* {ledger_totals['calls']}  \n"
+                f"*Total Cost:* ${ledger_totals['cost']:.4f}")
+    if ledger_totals['calls']:
+        st.markdown("**Cost per page by domain**")
+        st.dataframe(pd.DataFrame(ledger_by_domain)[
+            ["domain", "pages", "input_tokens_per_page", "cost_per_page", "cost"]
+        ].round(4), hide_index=True, use_container_width=True)
+        st.markdown("**Cost per vendor per day**")
+        st.dataframe(pd.DataFrame(ledger_by_vendor_day)[
+            ["day", "vendor", "calls", "input_tokens", "cost"]
+        ].round(4), hide_index=True, use_container_width=True)
+
+
 # Main action button
 if st.sidebar.button("LAUNCH", type="primary"):
     if st.session_state["urls_splitted"] == []:
@@ -228,120 +384,113 @@ if st.sidebar.button("LAUNCH", type="primary"):
         st.session_state['model_selection'] = model_selection
         st.session_state['use_pagination'] = use_pagination
         st.session_state['pagination_details'] = pagination_details
+        st.session_state['deduplicate'] = deduplicate
+        st.session_state['dedupe_near'] = dedupe_near
+        st.session_state['dedupe_across_sessions'] = dedupe_across_sessions
+        st.session_state['incremental'] = incremental
         
+        run_config = {
+            "urls": st.session_state["urls_splitted"],
+            "fields": fields,
+            "model": model_selection,
+            "use_pagination": use_pagination,
+            "pagination_details": pagination_details,
+            "deduplicate": deduplicate,
+            "dedupe_near": dedupe_near,
+            "dedupe_across_sessions": dedupe_across_sessions,
+            "incremental": incremental
+        }
+
         # Create a session if one doesn't exist
         if not st.session_state.get('session_id'):
             # Extract vendor from URL
             url = st.session_state["urls_splitted"][0]
-            vendor_name = FileStorage()._extract_brand_from_url(url)
-            
-            # Create initial config
-            initial_config = {
-                "urls": st.session_state["urls_splitted"],
-                "fields": fields,
-                "model": model_selection,
-                "use_pagination": use_pagination,
-                "pagination_details": pagination_details
-            }
+            vendor_name = get_storage()._extract_brand_from_url(url)
             
-            session_manager = SessionManager()
-            session = session_manager.create_session(vendor_name, initial_config)
+            session_manager = get_session_manager()
+            session = session_manager.create_session(vendor_name, run_config)
             
             st.session_state['session_id'] = session["session_id"]
             st.session_state['session_path'] = session["session_path"]
         
-        # fetch or reuse the markdown for each URL
-        file_paths = fetch_and_store_markdowns(st.session_state['session_path'], st.session_state["urls_splitted"])
-        st.session_state["file_paths"] = file_paths
-
-        # Move on to "scraping" step
-        st.session_state['scraping_state'] = 'scraping'
-
-
+        # Run in the background: fetch, extract and paginate with the choices above.
+        # Checkpoints of these URLs from earlier runs in this session are dropped first.
+        try:
+            submit_run(urls=st.session_state["urls_splitted"], config=run_config)
+        except ValueError as e:
+            st.error(str(e))
+
+
+# Poll the background run: per-URL progress, partial results and cancellation
+if st.session_state['scraping_state'] == 'running':
+    run = get_worker_pool().get(st.session_state.get('run_id'))
+    if run is None:
+        # The app process restarted: whatever finished is checkpointed
+        st.session_state['scraping_state'] = 'failed'
+        st.rerun()
+    elif run.status == COMPLETED:
+        apply_run_summary(run.summary)
+        st.session_state['scraping_state'] = 'completed'
+        st.success(f"Scraping completed. Results saved to {run.session_path}")
+    elif run.status == HANDED_OFF:
+        # Fetched and extracted elsewhere; the run completes with its session
+        if run.summary.get("distributed"):
+            st.info(f"Queued: {run.summary['distributed']['tasks']} pages are waiting for the queue workers "
+                    f"(group {run.summary['distributed']['group_id']}).")
+        else:
+            st.info(f"Queued: extraction was sent as batch {run.summary['batch']['batch_key']} "
+                    f"and is collected once the provider has finished it.")
+        st.dataframe(pd.DataFrame(run.page_status()), hide_index=True, use_container_width=True)
+        time.sleep(WORKER_SETTINGS["poll_interval"])
+        st.rerun()
+    elif run.done:
+        if run.status == CANCELLED:
+            st.info("Run cancelled.")
+        else:
+            st.error(f"An error occurred during scraping: {run.error}")
+        st.session_state['scraping_state'] = 'failed'
+    else:
+        page_rows = run.page_status()
+        pages_done = sum(all(row[stage] for stage in run.stages) for row in page_rows)
+        st.progress(run.fraction_done(), text=f"{run.status.capitalize()}: {pages_done}/{len(page_rows)} pages done")
+        st.dataframe(pd.DataFrame(page_rows), hide_index=True, use_container_width=True)
+
+        partial_listings = run.partial_listings()
+        if partial_listings:
+            st.markdown(f"**Listings extracted so far:** {len(partial_listings)}")
+            st.dataframe(pd.DataFrame(partial_listings), use_container_width=True)
+
+        if run.cancel_event.is_set():
+            st.caption("Cancelling after the current page...")
+        elif st.button("Cancel Run"):
+            get_worker_pool().cancel(run.run_id)
+            st.rerun()
 
-if st.session_state['scraping_state'] == 'scraping':
-    try:
-        with st.spinner("Processing..."):
-            file_paths = st.session_state["file_paths"]
-            session_path = st.session_state['session_path']
-            urls = st.session_state['urls']
+        time.sleep(WORKER_SETTINGS["poll_interval"])
+        st.rerun()
 
-            total_input_tokens = 0
-            total_output_tokens = 0
-            total_cost = 0
-            
-            # 1) Scraping logic - modified to work with files
-            all_data = []
-            if show_tags:
-                # Modified to use file paths and session path
-                in_tokens_s, out_tokens_s, cost_s, parsed_data = scrape_urls(session_path, file_paths, urls, 
-                                                                            st.session_state['fields'],
-                                                                            st.session_state['model_selection'])
-                total_input_tokens += in_tokens_s
-                total_output_tokens += out_tokens_s
-                total_cost += cost_s
-
-                all_data = parsed_data
-                st.session_state['in_tokens_s'] = in_tokens_s
-                st.session_state['out_tokens_s'] = out_tokens_s
-                st.session_state['cost_s'] = cost_s
-                
-            # 2) Pagination logic - similarly modified
-            pagination_info = None
-            if st.session_state['use_pagination']:
-                in_tokens_p, out_tokens_p, cost_p, page_results = paginate_urls(session_path, file_paths, urls,
-                                                                              st.session_state['model_selection'],
-                                                                              st.session_state['pagination_details'])
-                total_input_tokens += in_tokens_p
-                total_output_tokens += out_tokens_p
-                total_cost += cost_p
-
-                pagination_info = page_results
-                st.session_state['in_tokens_p'] = in_tokens_p
-                st.session_state['out_tokens_p'] = out_tokens_p
-                st.session_state['cost_p'] = cost_p
-                
-            # 3) Save everything in session state
-            st.session_state['results'] = {
-                'data': all_data,
-                'input_tokens': total_input_tokens,
-                'output_tokens': total_output_tokens,
-                'total_cost': total_cost,
-                'pagination_info': pagination_info
-            }
-            
-            # 4) Update session mapping with results summary
-            session_manager = SessionManager()
-            results_summary = {
-                'scrape_completed': True,
-                'scrape_timestamp': datetime.now().isoformat(),
-                'total_cost': total_cost,
-                'total_input_tokens': total_input_tokens,
-                'total_output_tokens': total_output_tokens
-            }
-            session_manager.update_session_config(st.session_state['session_id'], results_summary)
-            
-            st.session_state['scraping_state'] = 'completed'
-            
-            # Display success message
-            st.success(f"Scraping completed. Results saved to {session_path}")
-
-            # Add debug info to verify files exist
-            if st.session_state.get('session_path'):
-                file_storage = FileStorage()
-                session_files = file_storage.list_session_files(st.session_state['session_path'])
-                if session_files:
-                    with st.expander("View saved files"):
-                        for file in session_files:
-                            st.code(file)
-    except Exception as e:
-        st.error(f"An error occurred during scraping: {e}")
-        st.session_state['scraping_state'] = 'idle'
+# Resume an interrupted run from its per-URL checkpoints
+if st.session_state['scraping_state'] == 'failed' and st.session_state.get('session_id'):
+    st.warning("The last run was interrupted. Pages that finished fetching or extraction are checkpointed "
+               "and will not be processed again.")
+    col1, col2 = st.columns(2)
+    with col1:
+        resume_clicked = st.button("Resume Session", type="primary")
+    with col2:
+        if st.button("Discard"):
+            st.session_state['scraping_state'] = 'idle'
+            st.rerun()
+    if resume_clicked:
+        try:
+            # Same URLs and settings as the session's runs so far, skipping checkpointed pages
+            submit_run(fresh=False)
+            st.rerun()
+        except ValueError as e:
+            st.error(f"Could not resume: {e}")
 
 # Display results
 if st.session_state['scraping_state'] == 'completed' and st.session_state['results']:
     results = st.session_state['results']
-    all_data = results['data']
     total_input_tokens = results['input_tokens']
     total_output_tokens = results['output_tokens']
     total_cost = results['total_cost']
@@ -353,65 +502,23 @@ if st.session_state['scraping_state'] == 'completed' and st.session_state['resul
     if show_tags:
         st.subheader("Scraping Results")
 
-        # We'll accumulate all rows in this list
-        all_rows = []
-
-        # Loop over each data item in the "all_data" list
-        for i, data_item in enumerate(all_data, start=1):
-
-            # Usually data_item is something like:
-            # {"file_path": "...", "output_path": "...", "parsed_data": DynamicListingsContainer(...) or dict or str}
-
-            # 1) Ensure data_item is a dict
-            if not isinstance(data_item, dict):
-                st.error(f"data_item is not a dict, skipping. Type: {type(data_item)}")
-                continue
-
-            # 2) If "parsed_data" is present and might be a Pydantic model or something
-            if "parsed_data" in data_item:
-                parsed_obj = data_item["parsed_data"]
-
-                # Convert if it's a Pydantic model
-                if hasattr(parsed_obj, "dict"):
-                    parsed_obj = parsed_obj.model_dump()
-                elif isinstance(parsed_obj, str):
-                    # If it's a JSON string, attempt to parse
-                    try:
-                        parsed_obj = json.loads(parsed_obj)
-                    except json.JSONDecodeError:
-                        # fallback: just keep as raw string
-                        pass
-
-                # Now we have "parsed_obj" as a dict, list, or string
-                data_item["parsed_data"] = parsed_obj
-
-            # 3) If the "parsed_data" has a 'listings' key that is a list of items,
-            #    we might want to treat them as multiple rows. 
-            #    Otherwise, we treat the entire data_item as a single row.
-
-            pd_obj = data_item["parsed_data"]
-
-            # If it has 'listings' in parsed_data
-            if isinstance(pd_obj, dict) and "listings" in pd_obj and isinstance(pd_obj["listings"], list):
-                # We'll create one row per listing, plus carry over metadata fields
-                for listing in pd_obj["listings"]:
-                    # Make a shallow copy so we don't mutate 'listing'
-                    row_dict = dict(listing)
-                    # Add file_path and output_path metadata
-                    row_dict["file_path"] = data_item.get("file_path", "")
-                    row_dict["output_path"] = data_item.get("output_path", "")
-                    all_rows.append(row_dict)
-            else:
-                # We'll just store the entire item as one row
-                row_dict = dict(data_item)  # shallow copy
-                all_rows.append(row_dict)
-
-        # After collecting all rows from all_data in "all_rows", create one DataFrame
-        if not all_rows:
+        listings_table = ListingsTable(results['listings_table']) if results.get('listings_table') else None
+        if listings_table is None or not listings_table.count():
             st.warning("No data rows to display.")
         else:
-            df = pd.DataFrame(all_rows)
-            st.dataframe(df, use_container_width=True)
+            # Only the requested page is read from the run's listings table
+            filter_col, size_col, page_col = st.columns([3, 1, 1])
+            with filter_col:
+                listing_filter = st.text_input("Filter listings", key="listings_filter")
+            with size_col:
+                page_size = st.selectbox("Rows per page", [25, 50, 100, 250], key="listings_page_size")
+            matching = listings_table.count(listing_filter)
+            with page_col:
+                page = st.number_input("Page", min_value=1, max_value=max(1, math.ceil(matching / page_size)),
+                                       value=1, step=1, key="listings_page")
+            st.dataframe(pd.DataFrame(listings_table.page(page, page_size, listing_filter),
+                                      columns=listings_table.columns), use_container_width=True)
+            st.caption(f"{matching} matching listings")
 
         if "in_tokens_s" in st.session_state:
             st.sidebar.markdown("### Scraping Details")
@@ -420,94 +527,73 @@ if st.session_state['scraping_state'] == 'completed' and st.session_state['resul
             st.sidebar.markdown(f"*Output Tokens:* {st.session_state['out_tokens_s']}")
             st.sidebar.markdown(f"**Total Cost:** :green-background[**${st.session_state['cost_s']:.4f}**]")
 
-
-        # Download options
-        st.subheader("Download Extracted Data")
-        col1, col2 = st.columns(2)
-        with col1:
-            json_data = json.dumps(all_data, default=lambda o: o.dict() if hasattr(o, 'dict') else str(o), indent=4)
-            st.download_button("Download JSON",data=json_data,file_name="scraped_data.json")
-        with col2:
-            # Convert all data to a single DataFrame
-            all_listings = []
-            for data in all_data:
-                if isinstance(data, str):
-                    try:
-                        data = json.loads(data)
-                    except json.JSONDecodeError:
-                        continue
-                
-                # Extract parsed_data
-                parsed_data = data.get('parsed_data', {})
-                
-                if isinstance(parsed_data, dict) and 'listings' in parsed_data:
-                    all_listings.extend(parsed_data['listings'])
-                elif hasattr(parsed_data, 'listings'):
-                    all_listings.extend([item.dict() for item in parsed_data.listings])
-                else:
-                    all_listings.append(data)
-            
-            combined_df = pd.DataFrame(all_listings)
-            st.download_button("Download CSV",data=combined_df.to_csv(index=False),file_name="scraped_data.csv")
+        if st.session_state.get('dedup_stats'):
+            dedup_stats = st.session_state['dedup_stats']
+            st.sidebar.markdown("#### Deduplication")
+            st.sidebar.markdown(f"*Listings Kept:* {dedup_stats['kept']}")
+            st.sidebar.markdown(f"*Duplicates Removed:* {dedup_stats['duplicates'] + dedup_stats['near_duplicates']}")
+
+        if st.session_state.get('routing_report'):
+            routing_report = st.session_state['routing_report']
+            st.sidebar.markdown("#### Model Routing")
+            for routed_model, model_stats in routing_report['models'].items():
+                if model_stats['pages']:
+                    st.sidebar.markdown(f"*{routed_model}:* {model_stats['accepted']} accepted, "
+                                        f"{model_stats['escalated']} escalated, ${model_stats['cost']:.4f}")
+            st.sidebar.markdown(f"*Estimated Savings:* ${routing_report['savings']:.4f}")
+
+        if st.session_state.get('incremental_stats'):
+            incremental_stats = st.session_state['incremental_stats']
+            st.sidebar.markdown("#### Incremental Re-scrape")
+            st.sidebar.markdown(f"*Unchanged Pages Skipped:* {incremental_stats['pages_unchanged']}")
+            st.sidebar.markdown(f"*Partially Re-extracted Pages:* {incremental_stats['pages_partial']}")
+            st.sidebar.markdown(f"*Fully Extracted Pages:* {incremental_stats['pages_full']}")
+            st.sidebar.markdown(f"*Input Tokens Saved:* {incremental_stats['tokens_saved']}")
+
+        timings = stage_breakdown()
+        if timings:
+            st.sidebar.markdown("#### Timing Breakdown")
+            st.sidebar.dataframe(pd.DataFrame([{
+                "Stage": row["stage"],
+                "Calls": row["count"],
+                "Total (s)": round(row["total_s"], 2),
+                "Mean (s)": round(row["mean_s"], 3),
+                "p95 (s)": round(row["p95_s"], 3),
+            } for row in timings]), hide_index=True, use_container_width=True)
+
+
+        # Download files are written next to the listings table only when asked for
+        if listings_table is not None:
+            st.subheader("Download Extracted Data")
+            exports = st.session_state.setdefault('listing_exports', {})
+            col1, col2 = st.columns(2)
+            for col, fmt, mime in ((col1, "json", "application/json"), (col2, "csv", "text/csv")):
+                with col:
+                    export_key = f"{results.get('key')}:{fmt}"
+                    if export_key not in exports:
+                        if st.button(f"Prepare {fmt.upper()}", key=f"prepare_{fmt}"):
+                            exports[export_key] = run_cpu(export_table, listings_table.path, fmt,
+                                                          size=os.path.getsize(listings_table.path))
+                            st.rerun()
+                    else:
+                        with open(exports[export_key], 'rb') as f:
+                            st.download_button(f"Download {fmt.upper()}", data=f, mime=mime,
+                                               file_name=f"scraped_data.{fmt}", key=f"download_{fmt}")
 
         st.success(f"Scraping completed. Results saved to {st.session_state['session_path']}")
 
     # Display pagination info
     if pagination_info:
-        all_page_rows = []
-
-        # Iterate through pagination_info, which contains multiple items
-        for i, item in enumerate(pagination_info, start=1):
-
-            # Ensure item is a dictionary
-            if not isinstance(item, dict):
-                st.error(f"item is not a dict, skipping. Type: {type(item)}")
-                continue
-
-            # Check if "pagination_data" exists
-            if "pagination_data" in item:
-                pag_obj = item["pagination_data"]
-
-                # Convert if it's a Pydantic model
-                if hasattr(pag_obj, "dict"):
-                    pag_obj = pag_obj.model_dump()
-                elif isinstance(pag_obj, str):
-                    # If it's a JSON string, attempt to parse
-                    try:
-                        pag_obj = json.loads(pag_obj)
-                    except json.JSONDecodeError:
-                        # Fallback: keep it as raw string
-                        pass
-
-                # Now we have pag_obj as a dict, list, or string
-                item["pagination_data"] = pag_obj
-
-            # Process the extracted pagination_data
-            pd_obj = item["pagination_data"]
-
-            # If it contains "page_urls" and it's a list, extract individual rows
-            if isinstance(pd_obj, dict) and "page_urls" in pd_obj and isinstance(pd_obj["page_urls"], list):
-                for page_url in pd_obj["page_urls"]:
-                    row_dict = {
-                        "page_url": page_url,
-                        "file_path": item.get("file_path", ""),
-                        "output_path": item.get("output_path", "")
-                    }
-                    all_page_rows.append(row_dict)
-            else:
-                # Otherwise, store the entire item as a single row
-                row_dict = dict(item)  # Shallow copy
-                all_page_rows.append(row_dict)
-
-        # Create an empty DataFrame by default
-        pagination_df = pd.DataFrame(columns=["page_url"])
+        # Rows and downloads are built once per run and reused across reruns
+        pagination_tables = build_pagination_tables(results.get('key'), pagination_info)
+        all_page_rows = pagination_tables["rows"]
+
+        pagination_df = pagination_tables["table"]
         
-        # Create DataFrame and display it
+        # Display the DataFrame
         if not all_page_rows:
             st.warning("No page URLs found.")
         else:
-            pagination_df = pd.DataFrame(all_page_rows)
-            
             # Configure columns for better display
             column_config = {
                 "page_url": st.column_config.LinkColumn("Page URL"),
@@ -538,9 +624,9 @@ if st.session_state['scraping_state'] == 'completed' and st.session_state['resul
             st.subheader("Download Pagination URLs")
             col1, col2 = st.columns(2)
             with col1:
-                st.download_button("Download Pagination CSV",data=pagination_df.to_csv(index=False),file_name="pagination_urls.csv")
+                st.download_button("Download Pagination CSV",data=pagination_tables["csv"],file_name="pagination_urls.csv")
             with col2:
-                st.download_button("Download Pagination JSON",data=json.dumps(all_page_rows, indent=4),file_name="pagination_urls.json")
+                st.download_button("Download Pagination JSON",data=pagination_tables["json"],file_name="pagination_urls.json")
         
         # Change the success message for pagination
         st.success(f"Pagination detection completed. Results saved to {st.session_state['session_path']}")
@@ -560,15 +646,8 @@ if st.session_state['scraping_state'] == 'completed' and st.session_state['resul
         st.session_state['results']['pagination_info']):
         st.subheader("Continue Scraping Pagination")
         
-        pagination_info = st.session_state['results']['pagination_info']
-        all_page_urls = []
-        
-        # Extract all page URLs from pagination_info
-        for item in pagination_info:
-            if isinstance(item, dict) and "pagination_data" in item:
-                pag_obj = item["pagination_data"]
-                if isinstance(pag_obj, dict) and "page_urls" in pag_obj and isinstance(pag_obj["page_urls"], list):
-                    all_page_urls.extend(pag_obj["page_urls"])
+        # Page URLs detected in pagination_info (as shown in the table above)
+        all_page_urls = unique_urls([row["page_url"] for row in all_page_rows if "page_url" in row])
         
         # Display available page URLs
         if all_page_urls:
@@ -599,13 +678,8 @@ if st.session_state['scraping_state'] == 'completed' and st.session_state['resul
                 # Disable pagination for this run (we're using pre-detected pages)
                 st.session_state['use_pagination'] = False
                 
-                # Launch the scraper
-                file_paths = fetch_and_store_markdowns(st.session_state['session_path'], selected_urls)
-                st.session_state["file_paths"] = file_paths
-                st.session_state['scraping_state'] = 'scraping'
-                
                 # Update session mapping
-                session_manager = SessionManager()
+                session_manager = get_session_manager()
                 page_batch_info = {
                     f"page_batch_{datetime.now().strftime('%Y%m%d%H%M')}": {
                         "urls": selected_urls,
@@ -614,8 +688,18 @@ if st.session_state['scraping_state'] == 'completed' and st.session_state['resul
                     }
                 }
                 session_manager.update_session_config(st.session_state['session_id'], page_batch_info)
-                
-                st.experimental_rerun()
+
+                # Launch the scraper in the background with the session's settings
+                st.session_state['urls'] = selected_urls
+                batch_config = dict(session_manager.get_session(st.session_state['session_id'])["config"])
+                batch_config.update({"urls": selected_urls, "use_pagination": False,
+                                     "fields": st.session_state.get('fields', batch_config.get("fields", [])),
+                                     "model": st.session_state.get('model_selection', batch_config.get("model"))})
+                try:
+                    submit_run(urls=selected_urls, config=batch_config)
+                except ValueError as e:
+                    st.error(str(e))
+                st.rerun()
 
     # If both scraping and pagination were performed, show totals under the pagination table
     if show_tags and pagination_info:
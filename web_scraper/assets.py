@@ -12,13 +12,203 @@ MODELS_USED = {
     GEMINI_MODEL_FULLNAME: {"GEMINI_API_KEY"},
     DEEPSEEK_MODEL_FULLNAME : {"GROQ_API_KEY"},
 }
+
+# Pseudo-model: pick the cheapest model that fits each page and escalate on bad output (see routing.py)
+AUTO_MODEL = "auto (cost-aware routing)"
+
+# Validation thresholds used before escalating to a stronger model
+ROUTING_SETTINGS = {
+    "min_field_completeness": 0.5,   # share of non-empty field values across listings
+    "min_listing_ratio": 0.3,        # listings found / listing-like price mentions in the page
+    "min_expected_listings": 3,      # only check the ratio when the page looks like a listing page
+    "output_token_reserve": 4000,    # tokens kept free in the context window for the answer
+}
+
+# Models tried, in order, when a model's provider keeps failing (see resilience.py)
+MODEL_FALLBACKS = {
+    OPENAI_MODEL_FULLNAME: [GEMINI_MODEL_FULLNAME],
+    GEMINI_MODEL_FULLNAME: [OPENAI_MODEL_FULLNAME],
+    DEEPSEEK_MODEL_FULLNAME: [OPENAI_MODEL_FULLNAME],
+}
+
+# Link compaction: URLs are swapped for short aliases before a page goes to the model (see link_aliases.py)
+LINK_ALIAS_SETTINGS = {
+    "enabled": True,
+    "min_url_length": 24,        # shorter URLs cost about as much as their alias and are left alone
+}
+
+# Local relevance selection: only the blocks of a page likely to hold listings go to the model (see relevance.py)
+RELEVANCE_SETTINGS = {
+    "enabled": True,
+    "min_page_tokens": 4000,     # smaller pages are sent whole
+    "token_budget": 12000,       # most tokens of selected blocks sent per page
+    "recall": 0.9,               # stop once the kept blocks hold this share of the page's relevance score
+    "min_block_chars": 80,       # shorter blocks are merged into the next one
+    "max_block_chars": 1000,     # longer blocks (as sent, URLs aliased) are cut at line breaks
+    "weights": {
+        "terms": 1.0,            # BM25 match with the requested field names
+        "prices": 1.0,           # price mentions in the block
+        "repeated": 0.5,         # block structure repeated across the page (listing cards)
+        "neighbours": 0.5,       # share of the best adjacent block's score (listings span blocks)
+    },
+}
+
+# Offline batch extraction for non-urgent runs (see batch.py); enabled per run with "batch_mode" in the config
+BATCH_SETTINGS = {
+    "client": "litellm",         # "litellm" (provider batch API) or "stub" (local, for testing)
+    "endpoint": "/v1/chat/completions",
+    "completion_window": "24h",
+    "discount": 0.5,             # batch price as a share of the synchronous price
+    "stub_delay": 0,             # seconds before a stub batch reports completed
+    "poll_interval": 300,        # seconds between the scheduler's checks of submitted batches
+}
+
+# Distributed workers sharing a durable task queue (see task_queue.py, distributed.py);
+# enabled per run with "distributed" in the config
+QUEUE_SETTINGS = {
+    "backend": "sqlite",         # TaskQueue implementation, see QUEUE_BACKENDS
+    "lease_seconds": 120,        # a task whose worker stops heartbeating is reclaimed after this
+    "heartbeat_interval": 30,    # seconds between lease renewals while a task runs
+    "max_attempts": 3,           # then the task is marked dead
+    "retry_base_delay": 30,      # seconds before the first retry, doubled after each failure
+    "retry_max_delay": 600,
+    "poll_interval": 2.0,        # seconds an idle worker waits before claiming again
+    "busy_timeout": 30,          # seconds to wait for another process holding the queue database
+    "concurrency": 2,            # tasks run at once per worker process
+}
+
+# Process pool for CPU-bound stages (HTML parsing, relevance scoring, exports; see offload.py)
+OFFLOAD_SETTINGS = {
+    "enabled": True,
+    "max_workers": 0,            # 0: one per CPU core but one
+    "queue_per_worker": 2,       # in-flight tasks per worker before callers wait (bounded work queue)
+    "min_size": 50_000,          # smaller inputs (characters) are processed inline
+}
+
+# Retry and circuit breaker settings for LLM provider calls
+RETRY_SETTINGS = {
+    "max_attempts": 4,           # attempts per model before moving to a fallback
+    "base_delay": 1.0,           # seconds, doubled after each failed attempt
+    "max_delay": 60.0,           # cap on a single backoff (and on honored retry-after)
+    "failure_threshold": 5,      # consecutive failures that open a provider's circuit
+    "reset_timeout": 60.0,       # seconds an open circuit waits before a trial call
+}
+
+# Requests the browser aborts while fetching a page (see resource_blocking.py)
+RESOURCE_BLOCKING_SETTINGS = {
+    "enabled": True,
+    "resource_types": ["image", "font", "media"],   # Playwright resource types never needed for the markdown
+    "tracker_hosts": [           # analytics and ad hosts (subdomains included)
+        "google-analytics.com", "googletagmanager.com", "googlesyndication.com", "doubleclick.net",
+        "googleadservices.com", "connect.facebook.net", "hotjar.com", "segment.io", "segment.com",
+        "amazon-adsystem.com", "nr-data.net", "bat.bing.com", "clarity.ms", "scorecardresearch.com",
+        "criteo.com", "criteo.net", "taboola.com", "outbrain.com", "quantserve.com", "mixpanel.com",
+    ],
+    "domains": {                 # per-domain overrides, e.g. {"example.com": {"resource_types": ["font"]}}
+    },
+    "estimated_bytes": {         # typical transfer size of a blocked request, for the bytes-saved estimate
+        "image": 40_000, "font": 30_000, "media": 500_000, "tracker": 20_000,
+    },
+}
+
+# How URLs are reduced to one canonical form before they are fetched or used as keys (see canonical.py)
+URL_CANONICAL_SETTINGS = {
+    "enabled": True,
+    "drop_params": [             # tracking and click ids, dropped on every site
+        "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl",
+    ],
+    "drop_param_prefixes": ["utm_"],
+    "sort_query": True,          # order query parameters by name
+    "drop_fragment": True,
+    "strip_trailing_slash": True,
+    "domains": {                 # per-domain rules, added to the ones above (subdomains included)
+        "amazon.com": {
+            "drop_params": ["qid", "crid", "sprefix", "ref", "ref_", "sr", "dib", "dib_tag", "content-id",
+                            "pd_rd_i", "pd_rd_r", "pd_rd_w", "pd_rd_wg", "pf_rd_i", "pf_rd_m", "pf_rd_p",
+                            "pf_rd_r", "pf_rd_s", "pf_rd_t", "spIA", "sbo"],
+            "path_patterns": [r"/ref=[^/]*$"],     # regexes removed from the path, e.g. /s/ref=sr_pg_2
+        },
+        "walmart.com": {
+            "drop_params": ["xpid", "sid", "from", "wl13", "wmlspartner", "adsRedirect", "classType", "povid"],
+            "drop_param_prefixes": ["ath"],
+        },
+    },
+}
+
 # Timeout settings for web scraping
 TIMEOUT_SETTINGS = {
     "page_load": 30,
     "script": 10
 }
 
-NUMBER_SCROLL=2
+# Cleaned HTML saved next to each page's raw markdown, for DOM-based extractors (e.g. weedmaps)
+HTML_SNAPSHOT_SETTINGS = {
+    "enabled": True,
+    "keep_data_attributes": True,   # data-* (e.g. data-testid) kept besides class, id, href, src, ...
+}
+
+# When a fetched page counts as ready to capture (see readiness.py)
+READINESS_SETTINGS = {
+    "enabled": True,
+    "strategy": "stable",        # default wait: "stable" (DOM stops changing), "networkidle" or "selector"
+    "stability_ms": 500,         # DOM unchanged this long counts as rendered
+    "poll_ms": 100,
+    "min_timeout_ms": 2000,      # bounds of the learned wait per domain
+    "max_timeout_ms": 20000,     # also the wait for a domain without history
+    "headroom": 1.5,             # learned wait = slow (p90) ready time x headroom
+    "history": 20,               # ready times kept per domain
+    "timeout_share": 0.5,        # share of timed-out stable waits that switches a domain to networkidle
+    "domains": {                 # per-domain strategy and the selector that shows listings have rendered
+        "weedmaps.com": {"strategy": "selector",
+                         "selector": "div[class*='product-card'], div[class*='ProductCard'], a[href*='/product/']"},
+    },
+}
+
+# Most scroll steps per page (was 2, which cut long catalogues short); scrolling
+# stops earlier once a step loads nothing new or max_items is reached
+NUMBER_SCROLL=20
+
+# Infinite-scroll harvesting after the page is ready (see scroll.py); each step can wait
+# up to step_timeout_ms, so it is only done for the domains that opt in under "domains"
+SCROLL_SETTINGS = {
+    "enabled": False,
+    "max_steps": NUMBER_SCROLL,
+    "max_items": 500,            # stop once this many listing items are on the page
+    "step_timeout_ms": 3000,     # wait for the DOM to settle after each scroll
+    "min_line_chars": 3,         # shorter text lines are ignored when comparing steps
+    "domains": {                 # per-domain overrides, e.g. {"example.com": {"enabled": True, "max_steps": 10}}
+        "weedmaps.com": {"enabled": True},   # dispensary menus load more products as they scroll
+    },
+}
+
+# Recurring scrape scheduler (see scheduler.py)
+SCHEDULER_SETTINGS = {
+    "max_workers": 4,            # global cap on concurrently running jobs
+    "per_domain_limit": 1,       # default cap on concurrent jobs per domain
+    "domain_limits": {           # per-domain overrides
+        "weedmaps.com": 1,
+    },
+    "poll_interval": 30,         # seconds between checks for due jobs
+    "max_attempts": 3,           # attempts per run before it is marked failed
+}
+
+# Background scrape runs started from the Streamlit app (see workers.py)
+WORKER_SETTINGS = {
+    "max_workers": 4,            # runs executed concurrently across all users and sessions
+    "poll_interval": 1.0,        # seconds between UI refreshes while a run is in progress
+    "finished_runs_kept": 50,    # finished runs kept in memory for their results
+    "preload_imports": True,     # import the scrape pipeline in the background once the pool exists
+}
+
+# Import-time budgets in seconds, checked by `python -m benchmarks.import_profile --check`
+STARTUP_SETTINGS = {
+    "targets": {
+        "app": 3.0,              # Streamlit script up to the idle screen (container readiness)
+        "scheduler": 1.5,        # run_scheduler.py before the first job starts
+        "pipeline": 1.5,         # web_scraper.pipeline, without LiteLLM/crawl4ai
+    },
+    "repeat": 3,                 # fresh interpreters per target; the median is reported
+}
 
 
 
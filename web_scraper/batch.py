@@ -0,0 +1,501 @@
+# batch.py
+
+import glob
+import json
+import os
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from .assets import BATCH_SETTINGS, SYSTEM_MESSAGE, AUTO_MODEL, MODELS_USED
+from .api_management import get_api_key
+from .file_storage import FileStorage
+from core.utils import load_json_file
+from .session_manager import SessionManager, SessionProgress, EXTRACTED
+from .llm_calls import build_messages
+from .link_aliases import compact_links, LinkAliases
+from .relevance import select_relevant
+from .offload import run_cpu
+from .json_repair import repair_json, validate_listings_output
+from .ledger import record_llm_call
+from .routing import ModelRouter, estimate_cost
+from .markdown import read_raw_data, read_html_snapshot
+from .incremental import PageSnapshotStore, split_sections, plan_incremental_extraction
+from .dedup import ListingDeduplicator, parsed_to_dict
+from .results_table import ListingsTable, table_path_for
+
+# Manifest states
+PREPARED = "prepared"
+SUBMITTED = "submitted"
+COLLECTED = "collected"
+FAILED = "failed"
+
+# How a page of a batch is extracted
+LLM = "llm"                  # sent to the provider in the batch
+LOCAL = "local"              # unchanged since its snapshot, or found by the weedmaps DOM extractor
+RESUMED = "resumed"          # already extracted in this session before an interruption
+
+# Provider batch states after which nothing changes any more (OpenAI naming)
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchClient(ABC):
+    """A provider batch endpoint: upload a JSONL request file, poll it, download the JSONL results"""
+
+    @abstractmethod
+    def submit(self, requests_path: str, model: str) -> str:
+        """Upload the request file and start a batch; returns the provider's batch id"""
+
+    @abstractmethod
+    def status(self, batch_id: str, model: str) -> str:
+        """The provider's state of the batch (see TERMINAL_STATUSES)"""
+
+    @abstractmethod
+    def download_results(self, batch_id: str, model: str, dest_path: str) -> str:
+        """Write the batch's JSONL results to dest_path and return it"""
+
+
+class LiteLLMBatchClient(BatchClient):
+    """Batches through LiteLLM's files/batches API (OpenAI-compatible providers)"""
+
+    def _provider(self, model: str) -> Dict:
+        from litellm import get_llm_provider
+        _, provider, _, _ = get_llm_provider(model)
+        params = {"custom_llm_provider": provider}
+        api_key = get_api_key(model) if model in MODELS_USED else None
+        if api_key:
+            params["api_key"] = api_key
+        return params
+
+    def submit(self, requests_path: str, model: str) -> str:
+        import litellm
+        params = self._provider(model)
+        with open(requests_path, 'rb') as f:
+            uploaded = litellm.create_file(file=f, purpose="batch", **params)
+        batch = litellm.create_batch(completion_window=BATCH_SETTINGS["completion_window"],
+                                     endpoint=BATCH_SETTINGS["endpoint"], input_file_id=uploaded.id, **params)
+        return batch.id
+
+    def status(self, batch_id: str, model: str) -> str:
+        import litellm
+        return litellm.retrieve_batch(batch_id=batch_id, **self._provider(model)).status
+
+    def download_results(self, batch_id: str, model: str, dest_path: str) -> str:
+        import litellm
+        params = self._provider(model)
+        batch = litellm.retrieve_batch(batch_id=batch_id, **params)
+        content = litellm.file_content(file_id=batch.output_file_id, **params)
+        with open(dest_path, 'wb') as f:
+            f.write(content.content)
+        return dest_path
+
+
+def empty_listings_response(body: Dict) -> str:
+    """Default stub answer: a valid response with no listings"""
+    return json.dumps({"listings": []})
+
+
+class StubBatchClient(BatchClient):
+    """
+    Local stand-in for a provider batch endpoint, for tests and offline runs.
+    Batches are kept in `directory`, report "completed" after `delay` seconds, and
+    every request is answered by `responder(body) -> content string`.
+    """
+
+    def __init__(self, directory: Optional[str] = None, delay: Optional[float] = None,
+                 responder: Optional[Callable[[Dict], str]] = None):
+        self.directory = directory or os.path.join(FileStorage().base_dir, "batches", "stub")
+        self.delay = BATCH_SETTINGS["stub_delay"] if delay is None else delay
+        self.responder = responder or empty_listings_response
+        os.makedirs(self.directory, exist_ok=True)
+
+    def submit(self, requests_path: str, model: str) -> str:
+        batch_id = f"stub_batch_{uuid.uuid4().hex[:12]}"
+        shutil.copy(requests_path, os.path.join(self.directory, f"{batch_id}.jsonl"))
+        with open(os.path.join(self.directory, f"{batch_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump({"submitted_at": time.time()}, f)
+        return batch_id
+
+    def status(self, batch_id: str, model: str) -> str:
+        with open(os.path.join(self.directory, f"{batch_id}.json"), 'r', encoding='utf-8') as f:
+            submitted_at = json.load(f)["submitted_at"]
+        return "completed" if time.time() - submitted_at >= self.delay else "in_progress"
+
+    def download_results(self, batch_id: str, model: str, dest_path: str) -> str:
+        with open(os.path.join(self.directory, f"{batch_id}.jsonl"), 'r', encoding='utf-8') as src, \
+                open(dest_path, 'w', encoding='utf-8') as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                content = self.responder(request["body"])
+                prompt_chars = sum(len(m["content"]) for m in request["body"]["messages"])
+                out.write(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": {
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                     "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4},
+                    }},
+                    "error": None,
+                }) + "\n")
+        return dest_path
+
+
+def get_batch_client(name: Optional[str] = None) -> BatchClient:
+    """The batch client named in BATCH_SETTINGS (or BATCH_CLIENT in the environment)"""
+    name = name or os.getenv("BATCH_CLIENT") or BATCH_SETTINGS["client"]
+    if name == "stub":
+        return StubBatchClient()
+    if name == "litellm":
+        return LiteLLMBatchClient()
+    raise ValueError(f"Unknown batch client: {name}")
+
+
+class BatchManager:
+    """
+    Extraction through a provider's batch API instead of one synchronous call per page.
+
+    submit() plans every fetched page as scrape_urls would: checkpointed pages are
+    reused, unchanged sections (incremental mode) and weedmaps DOM listings are
+    extracted locally, and only the rest is sent, as the same request
+    extract_listings would make, in one JSONL batch. poll() checks pending batches;
+    once a batch is complete its answers are repaired, validated, given back their
+    real URLs, merged with the local listings, deduplicated and saved as the
+    session's formatted data, with a checkpoint per page, page snapshots, ledger
+    entries at the batch price and a listings table. Only then is the session
+    completed: run_session leaves it "queued" with the usage of the rest of the run,
+    and collect() adds the batch's usage to it.
+
+    Each batch lives in <session>/batches/<batch_key>/ (manifest.json, requests.jsonl,
+    results.jsonl), so polling survives restarts.
+    """
+
+    def __init__(self, session_manager: Optional[SessionManager] = None, client: Optional[BatchClient] = None):
+        self.session_manager = session_manager or SessionManager()
+        self.storage = self.session_manager.storage
+        self.client = client or get_batch_client()
+
+    def _batch_dir(self, session_path: str, batch_key: str) -> str:
+        return os.path.join(session_path, "batches", batch_key)
+
+    def _save_manifest(self, manifest: Dict):
+        path = os.path.join(manifest["batch_dir"], "manifest.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _batch_model(self, config: Dict, texts: List[str]) -> str:
+        """One model per batch; with AUTO_MODEL the cheapest model that fits the largest page"""
+        if config["model"] != AUTO_MODEL:
+            return config["model"]
+        return ModelRouter().ladder(max(texts, key=len))[0]
+
+    def _plan_page(self, url: str, file_path: str, fields: List[str], config: Dict, progress: SessionProgress,
+                   snapshot_store: Optional[PageSnapshotStore]) -> Optional[Dict]:
+        """
+        Decide how a page is extracted, as scrape_urls would: reuse its checkpoint,
+        reuse the listings of unchanged sections (incremental mode), use the
+        weedmaps DOM extractor, or send its (changed) text in the batch.
+        Returns the manifest entry, or None for a page with no raw data.
+        """
+        from .scraper import extract_weedmaps_data
+
+        checkpoint = progress.get(url, EXTRACTED)
+        if checkpoint and os.path.exists(checkpoint["output_path"]):
+            return {"url": url, "file_path": file_path, "mode": RESUMED, "output_path": checkpoint["output_path"],
+                    "checkpoint": {k: checkpoint[k] for k in ("input_tokens", "output_tokens", "cost")}}
+        raw_data = read_raw_data(file_path)
+        if not raw_data:
+            print(f"No raw_data found for {file_path}, leaving it out of the batch")
+            return None
+
+        page = {"url": url, "file_path": file_path, "mode": LOCAL, "listings": []}
+        text, html = raw_data, read_html_snapshot(file_path) if "weedmaps.com" in url else ""
+        if snapshot_store is not None:
+            snapshot = snapshot_store.get(url, fields, config["model"])
+            plan = plan_incremental_extraction(snapshot, split_sections(raw_data))
+            page["incremental"] = {"status": plan["status"], "sections_total": plan["sections_total"],
+                                   "sections_changed": plan["sections_changed"],
+                                   "previous_tokens": snapshot.get("input_tokens", 0) if snapshot else 0}
+            if plan["status"] != "full":
+                page["listings"] = list(plan["reused_listings"])
+                if not plan["changed_sections"]:
+                    return page
+                text, html = "\n\n".join(plan["changed_sections"]), ""
+
+        if "weedmaps.com" in url:
+            source = html or text
+            weedmaps_data = run_cpu(extract_weedmaps_data, source, fields, None, size=len(source))
+            if weedmaps_data and weedmaps_data.get("listings"):
+                print(f"Extracted {len(weedmaps_data['listings'])} weedmaps products locally, leaving {url} out of the batch")
+                page["listings"] += weedmaps_data["listings"]
+                return page
+
+        relevant_data, relevance = run_cpu(select_relevant, text, fields, size=len(text))
+        llm_data, aliases = compact_links(relevant_data)
+        page.update(mode=LLM, data=llm_data, aliases=aliases.to_dict(), relevance=relevance)
+        return page
+
+    def submit(self, session: Dict, urls: List[str], file_paths: List[str], config: Dict) -> Dict:
+        """Queue extraction of the fetched pages as one batch; returns its manifest"""
+        from litellm import get_llm_provider
+        from litellm.utils import type_to_response_format_param
+        from .scraper import create_dynamic_listing_model, create_listings_container_model
+
+        fields = config.get("fields") or []
+        if not fields:
+            raise ValueError("Batch extraction needs fields")
+        container_model = create_listings_container_model(create_dynamic_listing_model(fields))
+        response_format = type_to_response_format_param(container_model)
+        progress = SessionProgress(self.storage, session["session_path"])
+        snapshot_store = PageSnapshotStore(self.storage) if config.get("incremental", False) else None
+
+        pages = []
+        for url, file_path in zip(urls, file_paths):
+            page = self._plan_page(url, file_path, fields, config, progress, snapshot_store)
+            if page is not None:
+                pages.append(page)
+        if not pages:
+            raise ValueError("No fetched pages to extract")
+        llm_pages = [(i, p) for i, p in enumerate(pages) if p["mode"] == LLM]
+
+        model = self._batch_model(config, [p["data"] for _, p in llm_pages]) if llm_pages else config["model"]
+        batch_key = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        batch_dir = self._batch_dir(session["session_path"], batch_key)
+        os.makedirs(batch_dir, exist_ok=True)
+
+        requests_path = os.path.join(batch_dir, "requests.jsonl")
+        if llm_pages:
+            provider_model = get_llm_provider(model)[0]
+            with open(requests_path, 'w', encoding='utf-8') as f:
+                for i, page in llm_pages:
+                    f.write(json.dumps({
+                        "custom_id": f"page-{i}",
+                        "method": "POST",
+                        "url": BATCH_SETTINGS["endpoint"],
+                        "body": {"model": provider_model,
+                                 "messages": build_messages(page["data"], SYSTEM_MESSAGE),
+                                 "response_format": response_format},
+                    }) + "\n")
+
+        manifest = {
+            "batch_key": batch_key,
+            "batch_dir": batch_dir,
+            "session_id": session["session_id"],
+            "session_path": session["session_path"],
+            "vendor": session["vendor"],
+            "fields": fields,
+            "model": model,
+            # What scrape_urls would be told, applied when the answers are collected
+            "options": {"model": config["model"], "incremental": config.get("incremental", False),
+                        "deduplicate": config.get("deduplicate", True), "dedupe_near": config.get("dedupe_near", False),
+                        "dedupe_across_sessions": config.get("dedupe_across_sessions", False)},
+            "status": PREPARED,
+            "provider_batch_id": None,
+            "provider_status": None,
+            "created_at": time.time(),
+            "submitted_at": None,
+            "collected_at": None,
+            "pages": {f"page-{i}": {k: v for k, v in p.items() if k != "data"} for i, p in enumerate(pages)},
+            "error": None,
+        }
+        self._save_manifest(manifest)
+
+        if llm_pages:
+            manifest["provider_batch_id"] = self.client.submit(requests_path, model)
+            print(f"Submitted batch {manifest['provider_batch_id']} with {len(llm_pages)} of {len(pages)} pages on {model}")
+        else:
+            # Everything was extracted locally: nothing to send, the first poll collects it
+            print(f"No page of batch {batch_key} needs the model")
+        manifest["status"] = SUBMITTED
+        manifest["submitted_at"] = time.time()
+        self._save_manifest(manifest)
+        return manifest
+
+    def list_batches(self, pending_only: bool = False) -> List[Dict]:
+        manifests = []
+        for path in sorted(glob.glob(os.path.join(self.storage.base_dir, "session_*", "batches", "*", "manifest.json"))):
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if not pending_only or manifest["status"] == SUBMITTED:
+                manifests.append(manifest)
+        return manifests
+
+    def poll(self, manifest: Dict) -> Dict:
+        """Check one submitted batch and collect it once the provider is done"""
+        if manifest["status"] != SUBMITTED:
+            return manifest
+        if not manifest["provider_batch_id"]:
+            return self.collect(manifest)
+        status = self.client.status(manifest["provider_batch_id"], manifest["model"])
+        if status != manifest["provider_status"]:
+            manifest["provider_status"] = status
+            self._save_manifest(manifest)
+        if status == "completed":
+            self.collect(manifest)
+        elif status in TERMINAL_STATUSES:
+            manifest["status"] = FAILED
+            manifest["error"] = f"Provider batch {status}"
+            self._save_manifest(manifest)
+            print(f"Batch {manifest['provider_batch_id']} {status}")
+        return manifest
+
+    def poll_all(self) -> List[Dict]:
+        """Poll every submitted batch; one failing batch doesn't stop the others"""
+        polled = []
+        for manifest in self.list_batches(pending_only=True):
+            try:
+                polled.append(self.poll(manifest))
+            except Exception as e:
+                print(f"Could not poll batch {manifest['batch_key']}: {e}")
+        return polled
+
+    def _read_results(self, manifest: Dict) -> Dict[str, Dict]:
+        """The provider's answers by custom_id (none if no page went to the provider)"""
+        if not manifest["provider_batch_id"]:
+            return {}
+        results_path = self.client.download_results(manifest["provider_batch_id"], manifest["model"],
+                                                    os.path.join(manifest["batch_dir"], "results.jsonl"))
+        results = {}
+        with open(results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    results[result["custom_id"]] = result
+        return results
+
+    def _deduplicator(self, manifest: Dict, progress: SessionProgress, vendor: str) -> Optional[ListingDeduplicator]:
+        """The deduplicator run_session would use for the same run"""
+        options = manifest.get("options", {})
+        if not options.get("deduplicate", True):
+            return None
+        deduplicator = ListingDeduplicator(near_duplicates=options.get("dedupe_near", False))
+        deduplicator.preload_other_pages(progress, [page["url"] for page in manifest["pages"].values()])
+        if options.get("dedupe_across_sessions", False):
+            deduplicator.preload_vendor_sessions(self.storage, vendor or "", exclude_session_path=manifest["session_path"])
+        return deduplicator
+
+    def collect(self, manifest: Dict) -> Dict:
+        """
+        Map a completed batch's results back into the session's formatted data, with
+        the same post-processing as scrape_urls: answers are merged with the listings
+        reused locally, deduplicated in page order and remembered for incremental runs.
+        """
+        from .scraper import create_dynamic_listing_model, create_listings_container_model, save_formatted_data
+
+        container_model = create_listings_container_model(create_dynamic_listing_model(manifest["fields"]))
+        results = self._read_results(manifest)
+        progress = SessionProgress(self.storage, manifest["session_path"])
+        latency = time.time() - manifest["submitted_at"]
+        options = manifest.get("options", {})
+        # Manifests written before the vendor was recorded: look it up from the session
+        vendor = manifest.get("vendor") or (self.session_manager.get_session(manifest["session_id"]) or {}).get("vendor")
+        deduplicator = self._deduplicator(manifest, progress, vendor)
+        snapshot_store = PageSnapshotStore(self.storage) if options.get("incremental", False) else None
+
+        parsed_results = []
+        total_input_tokens = total_output_tokens = 0
+        total_cost = 0.0
+        for custom_id, page in manifest["pages"].items():
+            mode = page.get("mode", LLM)
+            if mode == RESUMED:
+                parsed = load_json_file(page["output_path"])
+                if deduplicator is not None:
+                    deduplicator.preload(parsed.get("listings", []) if isinstance(parsed, dict) else [])
+                total_input_tokens += page["checkpoint"]["input_tokens"]
+                total_output_tokens += page["checkpoint"]["output_tokens"]
+                total_cost += page["checkpoint"]["cost"]
+                parsed_results.append({"url": page["url"], "file_path": page["file_path"],
+                                       "output_path": page["output_path"], "parsed_data": parsed, "resumed": True})
+                continue
+
+            input_tokens = output_tokens = 0
+            cost = 0.0
+            if mode == LOCAL:
+                parsed = {"listings": list(page["listings"])}
+            else:
+                result = results.get(custom_id) or {"error": "missing from the batch results"}
+                response = result.get("response") or {}
+                if result.get("error") or response.get("status_code") != 200:
+                    page["error"] = str(result.get("error") or response.get("status_code"))
+                    print(f"Batch request for {page['url']} failed: {page['error']}")
+                    continue
+
+                body = response["body"]
+                answer = body["choices"][0]["message"]["content"]
+                data, _ = repair_json(answer)
+                parsed, dropped = validate_listings_output(data, container_model)
+                parsed = LinkAliases.from_dict(page["aliases"]).restore(parsed if parsed is not None else answer)
+                if page.get("incremental", {}).get("status") == "partial":
+                    # Changed sections of an incremental page: add the listings of the unchanged ones
+                    new_dict = parsed_to_dict(parsed)
+                    if new_dict is not None and isinstance(new_dict.get("listings"), list):
+                        parsed = {"listings": page["listings"] + new_dict["listings"]}
+                    else:
+                        # Can't merge an unstructured answer; keep it and take a full snapshot next time
+                        print(f"Partial extraction for {page['url']} returned unstructured data, keeping it as is")
+                        page["incremental"]["status"] = "full"
+
+                usage = body.get("usage") or {}
+                input_tokens = usage.get("prompt_tokens", 0)
+                output_tokens = usage.get("completion_tokens", 0)
+                cost = estimate_cost(manifest["model"], input_tokens, output_tokens) * BATCH_SETTINGS["discount"]
+                record_llm_call(url=page["url"], model=manifest["model"], input_tokens=input_tokens,
+                                output_tokens=output_tokens, cost=cost, latency_s=latency,
+                                vendor=vendor)
+
+            # drop listings repeated across pages, keeping the full extraction for the snapshot
+            extracted = parsed
+            if deduplicator is not None:
+                parsed = deduplicator.filter_parsed(parsed)
+
+            output_path = save_formatted_data(manifest["session_path"], page["url"], parsed)
+            report = None
+            if snapshot_store is not None and "incremental" in page:
+                report = {k: page["incremental"][k] for k in ("status", "sections_total", "sections_changed")}
+                report["tokens_saved"] = max(page["incremental"]["previous_tokens"] - input_tokens, 0) \
+                    if report["status"] != "full" else 0
+                sections = split_sections(read_raw_data(page["file_path"]))
+                snapshot_store.save(page["url"], manifest["fields"], options.get("model", manifest["model"]), sections,
+                                    extracted, input_tokens + report["tokens_saved"], output_path)
+            if output_path:
+                progress.record(page["url"], EXTRACTED, output_path=output_path, input_tokens=input_tokens,
+                                output_tokens=output_tokens, cost=cost)
+            page["output_path"] = output_path
+            total_input_tokens += input_tokens
+            total_output_tokens += output_tokens
+            total_cost += cost
+            result = {"url": page["url"], "file_path": page["file_path"], "output_path": output_path,
+                      "parsed_data": parsed}
+            if report is not None:
+                result["incremental"] = report
+            parsed_results.append(result)
+
+        listings_table = ListingsTable.build(table_path_for(manifest["session_path"]), parsed_results).path
+        # run_session stored the rest of the run's usage (pagination) when it submitted the batch
+        stored = (self.session_manager.get_session(manifest["session_id"]) or {}).get("config", {})
+        self.session_manager.update_session_config(manifest["session_id"], {
+            "scrape_completed": True,
+            "scrape_timestamp": datetime.now().isoformat(),
+            "total_cost": stored.get("total_cost", 0) + total_cost,
+            "total_input_tokens": stored.get("total_input_tokens", 0) + total_input_tokens,
+            "total_output_tokens": stored.get("total_output_tokens", 0) + total_output_tokens,
+            "listings_table": listings_table,
+        })
+        progress.set_status("completed")
+        manifest.update({
+            "status": COLLECTED,
+            "collected_at": time.time(),
+            "listings_table": listings_table,
+            "usage": {"input_tokens": total_input_tokens, "output_tokens": total_output_tokens, "cost": total_cost},
+            "dedup_stats": dict(deduplicator.stats) if deduplicator is not None else None,
+        })
+        self._save_manifest(manifest)
+        print(f"Collected batch {manifest['provider_batch_id'] or manifest['batch_key']}: "
+              f"{len(parsed_results)} pages, ${total_cost:.4f}")
+        return manifest
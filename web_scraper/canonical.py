@@ -0,0 +1,95 @@
+# canonical.py
+
+import posixpath
+import re
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from .assets import URL_CANONICAL_SETTINGS
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def canonical_rules(url: str) -> Dict:
+    """URL_CANONICAL_SETTINGS with the rules of the URL's domain (or a parent domain) added"""
+    rules = {
+        "drop_params": set(URL_CANONICAL_SETTINGS["drop_params"]),
+        "drop_param_prefixes": list(URL_CANONICAL_SETTINGS["drop_param_prefixes"]),
+        "path_patterns": [],
+    }
+    host = urlsplit(url).hostname or ""
+    domain = host[4:] if host.startswith("www.") else host
+    for pattern, overrides in URL_CANONICAL_SETTINGS["domains"].items():
+        if domain == pattern or domain.endswith("." + pattern):
+            rules["drop_params"].update(overrides.get("drop_params", []))
+            rules["drop_param_prefixes"] += overrides.get("drop_param_prefixes", [])
+            rules["path_patterns"] += overrides.get("path_patterns", [])
+    return rules
+
+
+def _normalize_path(path: str, patterns: List[str], strip_trailing_slash: bool) -> str:
+    for pattern in patterns:
+        path = re.sub(pattern, "", path)
+    if not path:
+        return "/"
+    # Resolve "." and ".." segments and repeated slashes
+    normalized = posixpath.normpath(re.sub(r"/{2,}", "/", path))
+    if normalized in (".", "//"):
+        normalized = "/"
+    if path.endswith("/") and not strip_trailing_slash and normalized != "/":
+        normalized += "/"
+    return normalized
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    The canonical form of a URL: scheme and host lowercased, default port dropped,
+    path normalized, tracking parameters removed and the rest sorted by name.
+    Pages that differ only in volatile parameters (e.g. Amazon's qid or
+    Walmart's xpid) get the same key, so they are fetched and stored once.
+    Strings that aren't absolute http(s) URLs are returned stripped but unchanged.
+    """
+    url = str(url or "").strip()
+    if not URL_CANONICAL_SETTINGS["enabled"]:
+        return url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+    rules = canonical_rules(url)
+
+    host = parts.hostname
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and str(port) != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    if parts.username or parts.password:
+        host = parts.netloc.rsplit("@", 1)[0] + "@" + host
+
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key not in rules["drop_params"]
+             and not any(key.startswith(prefix) for prefix in rules["drop_param_prefixes"])]
+    if URL_CANONICAL_SETTINGS["sort_query"]:
+        # Stable sort: repeated keys keep their relative order
+        query.sort(key=lambda item: item[0])
+
+    path = _normalize_path(parts.path, rules["path_patterns"], URL_CANONICAL_SETTINGS["strip_trailing_slash"])
+    fragment = "" if URL_CANONICAL_SETTINGS["drop_fragment"] else parts.fragment
+    return urlunsplit((scheme, host, path, urlencode(query), fragment))
+
+
+def unique_urls(urls: List[str]) -> List[str]:
+    """
+    `urls` without blanks and without URLs whose canonical form came earlier.
+    The URLs are kept as given: the canonical form is only a key (checkpoints,
+    snapshots, queue dedupe), never what is fetched, since the site may not
+    serve it.
+    """
+    unique = {}
+    given = [str(url).strip() for url in urls if url and str(url).strip()]
+    for url in given:
+        unique.setdefault(canonicalize_url(url), url)
+    if len(unique) < len(given):
+        print(f"Dropped {len(given) - len(unique)} URLs with the same canonical form as an earlier one")
+    return list(unique.values())
@@ -0,0 +1,198 @@
+# dedup.py
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+from core.utils import clean_price, load_json_file
+from .canonical import canonicalize_url
+
+# Field names (normalized) that identify a listing's name, price and link.
+# Users pick arbitrary field names, so we match them loosely.
+NAME_FIELDS = {"product_name", "product", "name", "title", "product_title", "item_name"}
+PRICE_FIELDS = {"price", "cost", "amount", "current_price", "sale_price"}
+URL_FIELDS = {"url", "link", "product_url", "product_link", "href"}
+
+
+def _normalize_key(key: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(key).lower()).strip("_")
+
+
+def normalize_name(name) -> str:
+    """Lowercase a product name and strip punctuation and repeated whitespace"""
+    text = re.sub(r"[^\w\s]", " ", str(name or "").lower())
+    return " ".join(text.split())
+
+
+def normalize_price(price) -> str:
+    """Reduce a price string to a fixed two-decimal form, or '' if it has no number"""
+    value = clean_price(str(price)) if price not in (None, "") else None
+    return f"{value:.2f}" if value is not None else ""
+
+
+def normalize_url(url) -> str:
+    """Canonical form of the URL (see canonical.py), without fragment or trailing slash"""
+    url = canonicalize_url(url)
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def listing_key_fields(listing: Dict) -> Dict[str, str]:
+    """Pick out the normalized name, price and URL of a listing"""
+    key_fields = {"name": "", "price": "", "url": ""}
+    for key, value in listing.items():
+        norm_key = _normalize_key(key)
+        if norm_key in NAME_FIELDS and not key_fields["name"]:
+            key_fields["name"] = normalize_name(value)
+        elif norm_key in PRICE_FIELDS and not key_fields["price"]:
+            key_fields["price"] = normalize_price(value)
+        elif norm_key in URL_FIELDS and not key_fields["url"]:
+            key_fields["url"] = normalize_url(value)
+    return key_fields
+
+
+def fingerprint_listing(listing: Dict) -> str:
+    """
+    Hash a listing on its normalized name, price and URL.
+    Listings without any of those fields are hashed on all their values.
+    """
+    key_fields = listing_key_fields(listing)
+    if any(key_fields.values()):
+        material = "|".join((key_fields["name"], key_fields["price"], key_fields["url"]))
+    else:
+        material = json.dumps(
+            {_normalize_key(k): normalize_name(v) for k, v in listing.items()},
+            sort_keys=True,
+        )
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+
+def _name_similarity(tokens_a: frozenset, tokens_b: frozenset) -> float:
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+def parsed_to_dict(parsed):
+    """
+    Convert extraction output (Pydantic model, JSON string or dict) to a dict.
+    Returns None if the output can't be interpreted as JSON.
+    """
+    if hasattr(parsed, "model_dump"):
+        return parsed.model_dump()
+    if isinstance(parsed, str):
+        try:
+            parsed = json.loads(parsed)
+        except json.JSONDecodeError:
+            return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+class ListingDeduplicator:
+    """
+    Drops listings that were already seen in this session (or, optionally,
+    in earlier sessions for the same vendor).
+
+    Exact duplicates are found through a hash index of listing fingerprints.
+    With near_duplicates enabled, listings whose price and URL match an earlier
+    listing and whose name shares at least `similarity_threshold` of its words
+    (Jaccard similarity) are dropped as well.
+    """
+
+    def __init__(self, near_duplicates: bool = False, similarity_threshold: float = 0.8):
+        self.near_duplicates = near_duplicates
+        self.similarity_threshold = similarity_threshold
+        self._fingerprints = set()
+        # (price, url) -> list of name token sets, used for near-duplicate checks
+        self._name_index = {}
+        self.stats = {"kept": 0, "duplicates": 0, "near_duplicates": 0, "preloaded": 0}
+
+    def _remember(self, listing: Dict, fingerprint: str):
+        self._fingerprints.add(fingerprint)
+        if self.near_duplicates:
+            key_fields = listing_key_fields(listing)
+            bucket = (key_fields["price"], key_fields["url"])
+            tokens = frozenset(key_fields["name"].split())
+            self._name_index.setdefault(bucket, []).append(tokens)
+
+    def _is_near_duplicate(self, listing: Dict) -> bool:
+        key_fields = listing_key_fields(listing)
+        tokens = frozenset(key_fields["name"].split())
+        candidates = self._name_index.get((key_fields["price"], key_fields["url"]), [])
+        return any(_name_similarity(tokens, other) >= self.similarity_threshold for other in candidates)
+
+    def add(self, listing: Dict) -> bool:
+        """Register a listing; returns True if it is new, False if it is a duplicate"""
+        if not isinstance(listing, dict):
+            return True
+        fingerprint = fingerprint_listing(listing)
+        if fingerprint in self._fingerprints:
+            self.stats["duplicates"] += 1
+            return False
+        if self.near_duplicates and self._is_near_duplicate(listing):
+            self.stats["near_duplicates"] += 1
+            return False
+        self._remember(listing, fingerprint)
+        self.stats["kept"] += 1
+        return True
+
+    def filter(self, listings: List[Dict]) -> List[Dict]:
+        """Return only the listings that haven't been seen before"""
+        return [listing for listing in listings if self.add(listing)]
+
+    def filter_parsed(self, parsed):
+        """
+        Deduplicate the 'listings' of an extraction result.
+        Returns a dict if the result could be parsed, otherwise the input unchanged.
+        """
+        parsed_dict = parsed_to_dict(parsed)
+        if not parsed_dict or not isinstance(parsed_dict.get("listings"), list):
+            return parsed
+        parsed_dict["listings"] = self.filter(parsed_dict["listings"])
+        return parsed_dict
+
+    def preload(self, listings: List[Dict]):
+        """Mark listings as already seen without counting them as kept"""
+        for listing in listings:
+            if isinstance(listing, dict):
+                fingerprint = fingerprint_listing(listing)
+                if fingerprint not in self._fingerprints:
+                    self._remember(listing, fingerprint)
+                    self.stats["preloaded"] += 1
+
+    def preload_session(self, storage, session_path: str):
+        """Mark every listing already saved in a session as seen"""
+        for file_path in storage.list_formatted_data_files(session_path):
+            data = load_json_file(file_path)
+            if isinstance(data, dict) and isinstance(data.get("listings"), list):
+                self.preload(data["listings"])
+
+    def preload_other_pages(self, progress, urls: List[str]):
+        """
+        Mark as seen the listings saved for a session's pages other than `urls`.
+        The run's own pages are left out: their saved output (checkpoints it
+        reuses, incremental hits, an earlier launch of the same URLs) would
+        otherwise make every listing a duplicate of itself.
+        """
+        own = {canonicalize_url(url) for url in urls}
+        for url, stages in progress.data["pages"].items():
+            checkpoint = stages.get("extracted")
+            if url in own or not checkpoint:
+                continue
+            data = load_json_file(checkpoint["output_path"]) if os.path.exists(checkpoint["output_path"]) else None
+            if isinstance(data, dict) and isinstance(data.get("listings"), list):
+                self.preload(data["listings"])
+
+    def preload_vendor_sessions(self, storage, vendor: str, exclude_session_path: Optional[str] = None):
+        """Mark every listing saved in previous sessions for this vendor as seen"""
+        exclude = os.path.abspath(exclude_session_path) if exclude_session_path else None
+        for session_id in storage.list_vendor_sessions(vendor):
+            session_path = os.path.join(storage.base_dir, session_id)
+            if exclude and os.path.abspath(session_path) == exclude:
+                continue
+            self.preload_session(storage, session_path)
@@ -0,0 +1,276 @@
+# distributed.py
+
+import hashlib
+import json
+import os
+import shutil
+import socket
+import threading
+import traceback
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+from .assets import AUTO_MODEL, QUEUE_SETTINGS
+from .session_manager import SessionManager, SessionProgress, FETCHED, EXTRACTED, PAGINATED
+from .task_queue import TaskQueue, get_task_queue, PENDING, LEASED, DONE
+from .canonical import canonicalize_url, unique_urls
+from core.utils import load_json_file
+
+# Task kinds
+PAGE_TASK = "page"            # fetch, extract and paginate one URL of a run
+FINALIZE_TASK = "finalize"    # once every page task of the run is done or dead
+
+
+def enqueue_run(session: Dict, urls: List[str], config: Dict, queue: Optional[TaskQueue] = None,
+                priority: int = 0) -> Dict:
+    """
+    Queue one page task per URL for the queue workers (run_worker.py) instead of
+    running them here. The tasks of a run share a group id; the worker that
+    finishes its last page queues the finalize task that completes the session.
+    """
+    queue = queue or get_task_queue()
+    group_id = f"{session['session_id']}@{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    initial_urls = {canonicalize_url(url) for url in config.get("urls", [])}
+    queued = 0
+    # Keyed by canonical URL, so the same page can't be queued twice under different URLs
+    for url in unique_urls(urls):
+        key = canonicalize_url(url)
+        payload = {"session_id": session["session_id"], "url": url, "config": config,
+                   # Pagination is detected on the session's initial URLs only
+                   "paginate": bool(config.get("use_pagination")) and key in initial_urls}
+        if queue.enqueue(PAGE_TASK, payload, group_id, dedupe_key=f"{group_id}:{PAGE_TASK}:{key}",
+                         priority=priority) is not None:
+            queued += 1
+    print(f"Queued {queued} page tasks for {session['session_id']} as {group_id}")
+    return {"group_id": group_id, "tasks": queued}
+
+
+def run_page_task(payload: Dict, session_manager: SessionManager, group_id: str = "") -> Dict:
+    """Fetch, extract and paginate one URL; returns what the finalize step records for it"""
+    from .ledger import set_vendor, reset_vendor
+
+    session = session_manager.get_session(payload["session_id"])
+    if not session:
+        raise ValueError(f"Session not found: {payload['session_id']}")
+    session_path = session["session_path"]
+    config, url = payload["config"], payload["url"]
+    vendor_token = set_vendor(session["vendor"])
+    try:
+        return _run_page(session_manager.storage, session_path, config, url, payload,
+                         _checkpoint_path(session_path, group_id, url))
+    finally:
+        reset_vendor(vendor_token)
+
+
+def _checkpoint_dir(session_path: str, group_id: str) -> str:
+    """Where the page tasks of a run keep their stage checkpoints until the run is finalized"""
+    return os.path.join(session_path, "tasks", group_id.rsplit("@", 1)[-1] or "default")
+
+
+def _checkpoint_path(session_path: str, group_id: str, url: str) -> str:
+    key = hashlib.sha1(canonicalize_url(url).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(_checkpoint_dir(session_path, group_id), f"{key}.json")
+
+
+def _save_checkpoint(path: str, result: Dict):
+    """Write a page task's finished stages, replacing the file atomically"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _run_page(storage, session_path: str, config: Dict, url: str, payload: Dict, checkpoint_path: str) -> Dict:
+    from .markdown import fetch_and_store_markdowns
+    from .scraper import scrape_urls
+    from .pagination import paginate_urls
+    from .routing import ModelRouter
+
+    # Progress is written once by the finalize task, not concurrently by every worker. Until then each
+    # stage is checkpointed per task, so a retry after a failed stage doesn't fetch or pay for the others again.
+    result = (load_json_file(checkpoint_path) if os.path.exists(checkpoint_path) else None) or {"url": url}
+    if FETCHED in result and os.path.exists(result[FETCHED]["raw_path"]):
+        print(f"Reusing the page fetched by an earlier attempt for {url}")
+        file_paths = [result[FETCHED]["raw_path"]]
+    else:
+        file_paths = fetch_and_store_markdowns(session_path, [url])
+        if not file_paths or not file_paths[0]:
+            raise RuntimeError(f"Could not store the page of {url}")
+        result = {"url": url, FETCHED: {"raw_path": file_paths[0]}}
+        _save_checkpoint(checkpoint_path, result)
+
+    fields = config.get("fields") or []
+    if fields and not (EXTRACTED in result and os.path.exists(result[EXTRACTED]["output_path"])):
+        router = ModelRouter() if config["model"] == AUTO_MODEL else None
+        in_tokens, out_tokens, cost, parsed_results = scrape_urls(session_path, file_paths, [url], fields,
+                                                                  config["model"], deduplicator=None,
+                                                                  incremental=config.get("incremental", False),
+                                                                  router=router, storage=storage)
+        if parsed_results:
+            result[EXTRACTED] = {"output_path": parsed_results[0]["output_path"], "input_tokens": in_tokens,
+                                 "output_tokens": out_tokens, "cost": cost}
+            _save_checkpoint(checkpoint_path, result)
+
+    if payload.get("paginate") and not (PAGINATED in result and os.path.exists(result[PAGINATED]["output_path"])):
+        in_tokens, out_tokens, cost, pagination_results = paginate_urls(session_path, file_paths, [url],
+                                                                        config["model"],
+                                                                        config.get("pagination_details", ""))
+        if pagination_results:
+            result[PAGINATED] = {"output_path": pagination_results[0]["output_path"], "input_tokens": in_tokens,
+                                 "output_tokens": out_tokens, "cost": cost}
+            _save_checkpoint(checkpoint_path, result)
+    return result
+
+
+def finalize_run(group_id: str, queue: TaskQueue, session_manager: SessionManager) -> Dict:
+    """
+    Complete a session once its page tasks have finished: checkpoint every page
+    in progress.json, drop listings repeated across pages (in URL order, as a
+    single-process run would), build the listings table and record the totals.
+    """
+    from .dedup import ListingDeduplicator
+    from .results_table import ListingsTable, table_path_for
+    from .metrics import write_snapshot
+
+    tasks = [t for t in queue.group_tasks(group_id) if t["kind"] == PAGE_TASK]
+    if not tasks:
+        raise ValueError(f"No page tasks in {group_id}")
+    config = tasks[0]["payload"]["config"]
+    session = session_manager.get_session(tasks[0]["payload"]["session_id"])
+    storage = session_manager.storage
+    session_path = session["session_path"]
+    progress = SessionProgress(storage, session_path)
+
+    deduplicator = None
+    if config.get("fields") and config.get("deduplicate", True):
+        deduplicator = ListingDeduplicator(near_duplicates=config.get("dedupe_near", False))
+        # As in run_session: other pages of the session count, this run's own pages don't
+        deduplicator.preload_other_pages(progress, [task["payload"]["url"] for task in tasks])
+        if config.get("dedupe_across_sessions", False):
+            deduplicator.preload_vendor_sessions(storage, session["vendor"], exclude_session_path=session_path)
+
+    totals = {"input_tokens": 0, "output_tokens": 0, "cost": 0}
+    parsed_results, failed = [], []
+    for task in tasks:
+        result = task["result"] or {}
+        if task["status"] != DONE:
+            failed.append(f"{task['payload']['url']}: {task['error']}")
+            continue
+        url = result["url"]
+        for stage in (FETCHED, EXTRACTED, PAGINATED):
+            if stage in result:
+                progress.record(url, stage, **result[stage])
+                for key in totals:
+                    totals[key] += result[stage].get(key, 0)
+        if EXTRACTED in result:
+            output_path = result[EXTRACTED]["output_path"]
+            parsed = load_json_file(output_path)
+            if deduplicator is not None and isinstance(parsed, dict):
+                parsed = deduplicator.filter_parsed(parsed)
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    json.dump(parsed, f, indent=2)
+            parsed_results.append({"url": url, "file_path": result[FETCHED]["raw_path"], "output_path": output_path,
+                                   "parsed_data": parsed})
+
+    listings_table = ListingsTable.build(table_path_for(session_path), parsed_results).path if parsed_results else None
+    write_snapshot(os.path.join(storage.base_dir, "metrics"))
+    summary = {
+        'scrape_completed': not failed,
+        'scrape_timestamp': datetime.now().isoformat(),
+        'total_cost': totals["cost"],
+        'total_input_tokens': totals["input_tokens"],
+        'total_output_tokens': totals["output_tokens"],
+    }
+    session_manager.update_session_config(session["session_id"], dict(summary, listings_table=listings_table))
+    # Every page's stages are in progress.json now
+    shutil.rmtree(_checkpoint_dir(session_path, group_id), ignore_errors=True)
+    if failed:
+        progress.set_status("failed", error=f"{len(failed)} pages failed: " + "; ".join(failed)[:2000])
+    else:
+        progress.set_status("completed")
+    print(f"Finalized {group_id}: {len(tasks) - len(failed)}/{len(tasks)} pages, ${totals['cost']:.4f}")
+    return {"listings_table": listings_table, "pages": len(tasks), "failed": len(failed),
+            "dedup_stats": dict(deduplicator.stats) if deduplicator is not None else None, **summary}
+
+
+class QueueWorker:
+    """
+    Claims tasks from the shared queue and runs them, renewing each lease on a
+    heartbeat thread while the task runs. Start any number of these, in one
+    process (`concurrency`) or in several containers mounting the same output/.
+    """
+
+    def __init__(self, queue: Optional[TaskQueue] = None, session_manager: Optional[SessionManager] = None,
+                 worker_id: Optional[str] = None):
+        self.queue = queue or get_task_queue()
+        self.session_manager = session_manager or SessionManager()
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+        self._stop = threading.Event()
+
+    def _heartbeat(self, task_id: int, done: threading.Event, lost: threading.Event):
+        while not done.wait(QUEUE_SETTINGS["heartbeat_interval"]):
+            if not self.queue.heartbeat(task_id, self.worker_id):
+                print(f"Worker {self.worker_id} lost the lease on task {task_id}")
+                lost.set()
+                return
+
+    def _execute(self, task: Dict) -> Dict:
+        if task["kind"] == PAGE_TASK:
+            return run_page_task(task["payload"], self.session_manager, task["group_id"])
+        if task["kind"] == FINALIZE_TASK:
+            return finalize_run(task["group_id"], self.queue, self.session_manager)
+        raise ValueError(f"Unknown task kind: {task['kind']}")
+
+    def _finalize_later(self, group_id: str):
+        self.queue.enqueue(FINALIZE_TASK, {}, group_id, dedupe_key=f"{group_id}:{FINALIZE_TASK}", priority=1)
+
+    def _after_page(self, group_id: str):
+        """Queue the run's finalize task once none of its pages is pending or running"""
+        counts = self.queue.counts(group_id)
+        if not counts.get(PENDING) and not counts.get(LEASED):
+            self._finalize_later(group_id)
+
+    def finalize_settled_runs(self):
+        """Queue finalize tasks for runs whose last page died by lease expiry, with no worker left to do it"""
+        for group_id in self.queue.settled_groups(without_kind=FINALIZE_TASK):
+            self._finalize_later(group_id)
+
+    def run_once(self) -> bool:
+        """Claim and run one task; False if there was none"""
+        task = self.queue.claim(self.worker_id)
+        if task is None:
+            return False
+        print(f"Worker {self.worker_id} running {task['kind']} task {task['id']} "
+              f"(attempt {task['attempts']}/{task['max_attempts']})")
+        done, lost = threading.Event(), threading.Event()
+        threading.Thread(target=self._heartbeat, args=(task["id"], done, lost), daemon=True).start()
+        try:
+            result = self._execute(task)
+            done.set()
+            if not self.queue.complete(task["id"], self.worker_id, result):
+                print(f"Task {task['id']} finished after its lease was lost; another worker owns it now")
+        except Exception as e:
+            done.set()
+            traceback.print_exc()
+            status = self.queue.fail(task["id"], self.worker_id, str(e))
+            print(f"Task {task['id']} failed ({status}): {e}")
+        if task["kind"] == PAGE_TASK:
+            self._after_page(task["group_id"])
+        return True
+
+    def run_forever(self, poll_interval: Optional[float] = None):
+        """Run tasks until stop() is called, waiting poll_interval whenever the queue is empty"""
+        poll_interval = poll_interval or QUEUE_SETTINGS["poll_interval"]
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+                self.finalize_settled_runs()
+            except Exception as e:
+                print(f"Worker {self.worker_id} could not reach the queue: {e}")
+            self._stop.wait(poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
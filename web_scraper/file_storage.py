@@ -1,6 +1,8 @@
 import os
+import re
 import json
 from datetime import datetime
+from .metrics import span
 
 class FileStorage:
     def __init__(self, base_dir="/app/output/web_crawler"):
@@ -18,15 +20,30 @@ class FileStorage:
         print(f"Created session directory: {os.path.abspath(session_path)}")
         return session_id, session_path
         
+    def _new_file_path(self, session_path, suffix):
+        """
+        Create an empty <timestamp>_<suffix> in the session, with -1, -2, ... after the
+        timestamp if that name is taken, and return its path. The file is created
+        exclusively, so workers saving at the same moment never get the same name.
+        """
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        file_path = os.path.join(session_path, f"{timestamp}_{suffix}")
+        n = 0
+        while True:
+            try:
+                with open(file_path, 'x', encoding='utf-8'):
+                    return file_path
+            except FileExistsError:
+                n += 1
+                file_path = os.path.join(session_path, f"{timestamp}-{n}_{suffix}")
+
     def save_raw_data(self, session_path, url, raw_data):
         """Save raw markdown data to file"""
         vendor = self._extract_brand_from_url(url)
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f"{timestamp}_{vendor}_raw_data.md"
-        file_path = os.path.join(session_path, filename)
         
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
+            file_path = self._new_file_path(session_path, f"{vendor}_raw_data.md")
+            with span("storage.write", url=url), open(file_path, 'w', encoding='utf-8') as f:
                 f.write(raw_data)
             print(f"Successfully saved raw data to: {os.path.abspath(file_path)}")
             return file_path
@@ -34,15 +51,31 @@ class FileStorage:
             print(f"Error saving raw data: {e}")
             return None
     
+    @staticmethod
+    def html_snapshot_path(raw_path):
+        """Where the cleaned HTML of a raw markdown file is kept: same name, .html"""
+        return os.path.splitext(raw_path)[0] + ".html"
+
+    def save_html_snapshot(self, raw_path, url, html):
+        """Save the cleaned HTML of a page next to its raw markdown"""
+        file_path = self.html_snapshot_path(raw_path)
+
+        try:
+            with span("storage.write", url=url), open(file_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            print(f"Successfully saved HTML snapshot to: {os.path.abspath(file_path)}")
+            return file_path
+        except Exception as e:
+            print(f"Error saving HTML snapshot: {e}")
+            return None
+
     def save_formatted_data(self, session_path, url, formatted_data):
         """Save formatted JSON data to file"""
         vendor = self._extract_brand_from_url(url)
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f"{timestamp}_{vendor}_formatted_data.json"
-        file_path = os.path.join(session_path, filename)
         
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
+            file_path = self._new_file_path(session_path, f"{vendor}_formatted_data.json")
+            with span("storage.write", url=url), open(file_path, 'w', encoding='utf-8') as f:
                 json.dump(formatted_data, f, indent=2)
             print(f"Successfully saved formatted data to: {os.path.abspath(file_path)}")
             return file_path
@@ -53,12 +86,10 @@ class FileStorage:
     def save_pagination_data(self, session_path, url, pagination_data):
         """Save pagination data to file"""
         vendor = self._extract_brand_from_url(url)
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f"{timestamp}_{vendor}_pagination.json"
-        file_path = os.path.join(session_path, filename)
         
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
+            file_path = self._new_file_path(session_path, f"{vendor}_pagination.json")
+            with span("storage.write", url=url), open(file_path, 'w', encoding='utf-8') as f:
                 json.dump(pagination_data, f, indent=2)
             print(f"Successfully saved pagination data to: {os.path.abspath(file_path)}")
             return file_path
@@ -70,7 +101,7 @@ class FileStorage:
         """Read raw data from file"""
         if not os.path.exists(file_path):
             return ""
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with span("storage.read"), open(file_path, 'r', encoding='utf-8') as f:
             return f.read()
     
     def _extract_brand_from_url(self, url):
@@ -102,6 +133,31 @@ class FileStorage:
             print(f"Error saving mapping data: {e}")
             return None
     
+    def save_progress(self, session_path, progress):
+        """Save per-URL progress checkpoints, replacing the file atomically"""
+        file_path = os.path.join(session_path, "progress.json")
+        tmp_path = f"{file_path}.tmp"
+        try:
+            with span("storage.checkpoint"), open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(progress, f, indent=2)
+            os.replace(tmp_path, file_path)
+            return file_path
+        except Exception as e:
+            print(f"Error saving progress data: {e}")
+            return None
+
+    def load_progress(self, session_path):
+        """Load per-URL progress checkpoints (empty if none were written yet)"""
+        file_path = os.path.join(session_path, "progress.json")
+        if not os.path.exists(file_path):
+            return {}
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading progress data: {e}")
+            return {}
+
     def list_sessions(self):
         """List all available sessions"""
         if not os.path.exists(self.base_dir):
@@ -131,4 +187,18 @@ class FileStorage:
             return files
         except Exception as e:
             print(f"Error listing session files: {e}")
-            return [] 
\ No newline at end of file
+            return []
+
+    def list_vendor_sessions(self, vendor):
+        """List sessions created for a vendor, oldest first"""
+        pattern = re.compile(rf"^session_{re.escape(vendor)}_\d{{12}}$")
+        return sorted(s for s in self.list_sessions() if pattern.match(s))
+
+    def list_formatted_data_files(self, session_path):
+        """List formatted data files in a session directory, oldest first"""
+        if not os.path.exists(session_path):
+            return []
+        return sorted(
+            os.path.join(session_path, f) for f in os.listdir(session_path)
+            if f.endswith("_formatted_data.json")
+        )
@@ -0,0 +1,182 @@
+# incremental.py
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+from .dedup import NAME_FIELDS, _normalize_key, parsed_to_dict
+from .canonical import canonicalize_url
+
+# Sections longer than this are split further at blank lines so a single
+# changed listing doesn't invalidate a whole heading-less page.
+MAX_SECTION_CHARS = 2000
+
+HEADING_PATTERN = re.compile(r"^#{1,6}\s", re.MULTILINE)
+
+
+def split_sections(markdown: str) -> List[str]:
+    """
+    Split markdown into sections at headings, breaking long sections at
+    blank lines into chunks of at most MAX_SECTION_CHARS.
+    """
+    if not markdown:
+        return []
+
+    starts = [m.start() for m in HEADING_PATTERN.finditer(markdown)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(markdown))
+
+    sections = []
+    for begin, end in zip(starts, starts[1:]):
+        section = markdown[begin:end]
+        if len(section) <= MAX_SECTION_CHARS:
+            sections.append(section)
+            continue
+        chunk = ""
+        for block in re.split(r"(\n\s*\n)", section):
+            if chunk and len(chunk) + len(block) > MAX_SECTION_CHARS:
+                sections.append(chunk)
+                chunk = ""
+            chunk += block
+        if chunk:
+            sections.append(chunk)
+    return [s for s in sections if s.strip()]
+
+
+def hash_section(section: str) -> str:
+    """Hash a section, ignoring whitespace-only differences"""
+    normalized = " ".join(section.split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _listing_anchor(listing: Dict) -> str:
+    """Text used to locate a listing in the page: its name, else its first non-empty value"""
+    for key, value in listing.items():
+        if _normalize_key(key) in NAME_FIELDS and value:
+            return str(value).lower()
+    for value in listing.values():
+        if value:
+            return str(value).lower()
+    return ""
+
+
+def assign_listings_to_sections(sections: List[str], listings: List[Dict]):
+    """
+    Attribute each listing to the first section whose text contains it.
+    Returns (per-section listing lists, listings that couldn't be placed).
+    """
+    lowered = [s.lower() for s in sections]
+    per_section = [[] for _ in sections]
+    unassigned = []
+    for listing in listings:
+        anchor = _listing_anchor(listing) if isinstance(listing, dict) else ""
+        index = next((i for i, text in enumerate(lowered) if anchor and anchor in text), None)
+        if index is None:
+            unassigned.append(listing)
+        else:
+            per_section[index].append(listing)
+    return per_section, unassigned
+
+
+class PageSnapshotStore:
+    """
+    Remembers, per URL, the section hashes of the last extracted version of a
+    page and the listings extracted from each section. Snapshots are stored as
+    one JSON file per URL, field set and model under <base_dir>/page_snapshots/:
+    listings extracted for other fields or by another model are never reused.
+    """
+
+    def __init__(self, storage):
+        self.snapshot_dir = os.path.join(storage.base_dir, "page_snapshots")
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    @staticmethod
+    def _key(url: str, fields: List[str], model: str) -> str:
+        return json.dumps([canonicalize_url(url), sorted(fields), model])
+
+    def _path(self, url: str, fields: List[str], model: str) -> str:
+        key = self._key(url, fields, model)
+        return os.path.join(self.snapshot_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str, fields: List[str], model: str) -> Optional[Dict]:
+        path = self._path(url, fields, model)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading page snapshot for {url}: {e}")
+            return None
+
+    def save(self, url: str, fields: List[str], model: str, sections: List[str], parsed, input_tokens: int,
+             formatted_path: Optional[str]):
+        """Store the section hashes of a page and the listings extracted from it"""
+        parsed_dict = parsed_to_dict(parsed)
+        if not parsed_dict or not isinstance(parsed_dict.get("listings"), list):
+            # Nothing structured to reuse next time
+            return
+        per_section, unassigned = assign_listings_to_sections(sections, parsed_dict["listings"])
+        snapshot = {
+            "url": url,
+            "fields": sorted(fields),
+            "model": model,
+            "timestamp": datetime.now().isoformat(),
+            "formatted_path": formatted_path,
+            "input_tokens": input_tokens,
+            "sections": [
+                {"hash": hash_section(section), "listings": listings}
+                for section, listings in zip(sections, per_section)
+            ],
+            "unassigned_listings": unassigned,
+        }
+        try:
+            with open(self._path(url, fields, model), "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=2)
+        except OSError as e:
+            print(f"Error saving page snapshot for {url}: {e}")
+
+
+def plan_incremental_extraction(snapshot: Optional[Dict], sections: List[str]) -> Dict:
+    """
+    Compare a freshly fetched page with its last snapshot.
+
+    Returns a dict with:
+      - status: "unchanged" (reuse everything), "partial" (extract only
+        changed_sections) or "full" (extract the whole page)
+      - changed_sections: list of section texts to send to the model
+      - reused_listings: listings carried over from unchanged sections
+    """
+    plan = {"status": "full", "changed_sections": sections, "reused_listings": [],
+            "sections_total": len(sections), "sections_changed": len(sections)}
+    if not snapshot or not snapshot.get("sections"):
+        return plan
+
+    previous = {s["hash"]: s["listings"] for s in snapshot["sections"]}
+    hashes = [hash_section(section) for section in sections]
+    changed = [section for section, h in zip(sections, hashes) if h not in previous]
+    plan["sections_changed"] = len(changed)
+
+    if not changed and len(hashes) == len(previous):
+        reused = [l for s in snapshot["sections"] for l in s["listings"]] + snapshot.get("unassigned_listings", [])
+        plan.update(status="unchanged", changed_sections=[], reused_listings=reused)
+    elif not snapshot.get("unassigned_listings"):
+        # Only safe when every old listing is tied to a section we can check
+        reused = [l for h in hashes if h in previous for l in previous[h]]
+        plan.update(status="partial", changed_sections=changed, reused_listings=reused)
+    return plan
+
+
+def summarize_incremental(parsed_results: List[Dict]) -> Dict:
+    """Aggregate the per-page incremental reports returned by scrape_urls"""
+    summary = {"pages_unchanged": 0, "pages_partial": 0, "pages_full": 0, "tokens_saved": 0}
+    for item in parsed_results:
+        report = item.get("incremental")
+        if not report:
+            continue
+        summary[f"pages_{report['status']}"] += 1
+        summary["tokens_saved"] += report.get("tokens_saved", 0)
+    return summary
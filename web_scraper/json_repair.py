@@ -0,0 +1,237 @@
+# json_repair.py
+
+import json
+import re
+import typing
+from typing import Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from .assets import SYSTEM_MESSAGE
+from .llm_calls import call_llm_model
+from .metrics import span
+
+# Continuation requests allowed per page when the model's answer is cut off
+MAX_CONTINUATIONS = 2
+
+CODE_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove ```json fences and any prose before the first JSON bracket"""
+    fenced = CODE_FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    return text[min(starts):] if starts else text
+
+
+def _strip_trailing_comma(out: List[str]):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def repair_json(text: str) -> Tuple[Optional[object], Dict]:
+    """
+    Parse model output as JSON, repairing the usual defects along the way:
+    code fences and surrounding prose, trailing commas, unterminated strings
+    and truncation. A truncated answer is cut back to the last complete element
+    of its outermost array (the listings), so a half-written listing is dropped
+    rather than kept, even when it was cut inside one of its own nested arrays.
+
+    Returns (parsed or None, info) where info has "repaired" and "truncated" flags.
+    """
+    info = {"repaired": False, "truncated": False}
+    if not isinstance(text, str):
+        return text, info
+    try:
+        return json.loads(text, strict=False), info
+    except json.JSONDecodeError:
+        info["repaired"] = True
+
+    text = strip_code_fences(text)
+    out: List[str] = []
+    stack: List[str] = []
+    # Places the output can be cut at: (length of out, open brackets at that point)
+    cut_points: List[Tuple[int, str]] = []
+    in_string = False
+    escaped = False
+    complete = False
+
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                if stack and stack[-1] == "[":
+                    cut_points.append((len(out), "".join(stack)))
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+            if ch == "[":
+                cut_points.append((len(out), "".join(stack)))
+            continue
+        elif ch in "}]":
+            if not stack:
+                break
+            _strip_trailing_comma(out)
+            stack.pop()
+            out.append(ch)
+            if stack and stack[-1] == "[":
+                cut_points.append((len(out), "".join(stack)))
+            if not stack:
+                complete = True
+                break
+            continue
+        elif ch == "," and stack and stack[-1] == "[":
+            cut_points.append((len(out), "".join(stack)))
+        out.append(ch)
+
+    if not complete:
+        info["truncated"] = True
+        if not cut_points:
+            return None, info
+        # Only cut between elements of the shallowest array: a cut inside a nested
+        # array (e.g. a listing's list of tags) would keep the listing half-written
+        depth = min(len(open_brackets) for _, open_brackets in cut_points)
+        length, open_brackets = [point for point in cut_points if len(point[1]) == depth][-1]
+        out = out[:length]
+        _strip_trailing_comma(out)
+        out.extend("]" if b == "[" else "}" for b in reversed(open_brackets))
+
+    try:
+        return json.loads("".join(out), strict=False), info
+    except json.JSONDecodeError:
+        return None, info
+
+
+def _listing_model(container_model):
+    annotation = container_model.model_fields["listings"].annotation
+    args = typing.get_args(annotation)
+    return args[0] if args else None
+
+
+def validate_listings_output(data, container_model) -> Tuple[Optional[Dict], int]:
+    """
+    Validate parsed output against the dynamic listings container.
+    If the whole object doesn't validate, listings are checked one by one:
+    missing fields are filled with "" and non-string values are stringified,
+    and listings with none of the requested fields are dropped.
+
+    Returns (validated dict or None, number of listings dropped).
+    """
+    if isinstance(data, list):
+        data = {"listings": data}
+    if not isinstance(data, dict) or not isinstance(data.get("listings"), list):
+        return None, 0
+    try:
+        return container_model.model_validate(data).model_dump(), 0
+    except ValidationError:
+        pass
+
+    listing_model = _listing_model(container_model)
+    fields = list(listing_model.model_fields) if listing_model else []
+    listings = []
+    dropped = 0
+    for item in data["listings"]:
+        if not isinstance(item, dict) or not any(f in item for f in fields):
+            dropped += 1
+            continue
+        coerced = {f: "" if item.get(f) is None else str(item.get(f)) for f in fields}
+        try:
+            listings.append(listing_model.model_validate(coerced).model_dump())
+        except ValidationError:
+            dropped += 1
+    return {"listings": listings}, dropped
+
+
+def parse_model_output(text, model_cls) -> Optional[Dict]:
+    """Repair and validate a single structured answer (e.g. PaginationModel); None if unusable"""
+    data, _ = repair_json(text)
+    if data is None:
+        return None
+    try:
+        return model_cls.model_validate(data).model_dump()
+    except ValidationError:
+        return None
+
+
+def _continuation_data(raw_data: str, last_listing: Dict) -> str:
+    """The part of the page after the last listing we already have (the whole page if it can't be found)"""
+    lowered = raw_data.lower()
+    for value in last_listing.values():
+        value = str(value or "").strip().lower()
+        if len(value) >= 4:
+            position = lowered.rfind(value)
+            if position != -1:
+                return raw_data[position:]
+    return raw_data
+
+
+def extract_with_repair(raw_data: str, container_model, model: str, system_message: str = SYSTEM_MESSAGE,
+                        fallback_models=None):
+    """
+    Call the model for listings, then repair and validate its answer locally.
+    If the answer was truncated, only the rest of the page (after the last
+    complete listing) is sent back, asking for the remaining listings.
+
+    Returns (parsed, token_counts, cost): parsed is a validated dict, or the raw
+    answer if it couldn't be interpreted at all. token_counts and cost include
+    any continuation calls and carry a "repair" report.
+    """
+    answer, token_counts, cost = call_llm_model(raw_data, container_model, model, system_message,
+                                                fallback_models=fallback_models)
+    model_used = token_counts.get("model", model)
+    with span("parse.llm_output", model=model_used):
+        data, info = repair_json(answer)
+        parsed, dropped = validate_listings_output(data, container_model)
+    if parsed is None:
+        print(f"Could not repair model output into listings ({len(str(answer))} chars)")
+        token_counts["repair"] = {"status": "failed", **info}
+        return answer, token_counts, cost
+
+    report = {"status": "repaired" if info["repaired"] else "valid", "truncated": info["truncated"],
+              "listings_dropped": dropped, "continuations": 0}
+
+    truncated = info["truncated"]
+    while truncated and parsed["listings"] and report["continuations"] < MAX_CONTINUATIONS:
+        last_listing = parsed["listings"][-1]
+        instruction = (
+            f"A previous extraction of this page was cut off after {len(parsed['listings'])} listings. "
+            f"The last complete listing was: {json.dumps(last_listing)}. "
+            "Extract ONLY the listings that come after it, in the same format."
+        )
+        tail = _continuation_data(raw_data, last_listing)
+        more, more_counts, more_cost = call_llm_model(tail, container_model, model_used, system_message,
+                                                      extra_user_instruction=instruction, fallback_models=[])
+        token_counts["input_tokens"] += more_counts["input_tokens"]
+        token_counts["output_tokens"] += more_counts["output_tokens"]
+        cost += more_cost
+        report["continuations"] += 1
+
+        with span("parse.llm_output", model=model_used):
+            more_data, more_info = repair_json(more)
+            more_parsed, more_dropped = validate_listings_output(more_data, container_model)
+        if not more_parsed or not more_parsed["listings"]:
+            break
+        # The model often repeats the anchor listing; skip it
+        new_listings = [l for l in more_parsed["listings"] if l != last_listing]
+        if not new_listings:
+            break
+        parsed["listings"].extend(new_listings)
+        report["listings_dropped"] += more_dropped
+        truncated = more_info["truncated"]
+
+    if report["truncated"] or report["listings_dropped"]:
+        print(f"Repaired model output: {len(parsed['listings'])} listings kept, "
+              f"{report['listings_dropped']} dropped, {report['continuations']} continuation(s)")
+    token_counts["repair"] = report
+    return parsed, token_counts, cost
@@ -0,0 +1,157 @@
+# ledger.py
+
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from .file_storage import FileStorage
+from .metrics import domain_of
+
+# Vendor of the session whose pages are being extracted, for the calls made meanwhile
+_current_vendor = contextvars.ContextVar("ledger_vendor", default="")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    vendor TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    url TEXT NOT NULL,
+    model TEXT NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    latency_s REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    cache_hit INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_vendor_day ON llm_calls (vendor, day);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_domain_day ON llm_calls (domain, day);
+"""
+
+
+class CostLedger:
+    """
+    Append-only SQLite ledger of every LLM call, kept across sessions in
+    <base_dir>/ledger.sqlite (or COST_LEDGER_PATH). One row per call with model, domain, URL,
+    tokens, cost, latency and whether the answer came from a cache.
+    """
+
+    def __init__(self, storage: Optional[FileStorage] = None, db_path: Optional[str] = None):
+        self.storage = storage or FileStorage()
+        self.db_path = (db_path or os.getenv("COST_LEDGER_PATH")
+                        or os.path.join(self.storage.base_dir, "ledger.sqlite"))
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A short-lived connection, committed and closed on exit (safe to use from any thread)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def record(self, url: str, model: str, input_tokens: int, output_tokens: int, cost: float,
+               latency_s: float, attempts: int = 1, cache_hit: bool = False, vendor: Optional[str] = None):
+        """
+        Append one LLM call. The vendor defaults to the session's (see set_vendor);
+        it is only guessed from the URL for calls made outside a session.
+        """
+        now = time.time()
+        row = (
+            now,
+            datetime.fromtimestamp(now).strftime('%Y-%m-%d'),
+            vendor or _current_vendor.get() or self.storage._extract_brand_from_url(url or ""),
+            domain_of(url),
+            url or "",
+            model,
+            int(input_tokens),
+            int(output_tokens),
+            float(cost or 0.0),
+            float(latency_s),
+            int(attempts),
+            int(bool(cache_hit)),
+        )
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO llm_calls (created_at, day, vendor, domain, url, model, input_tokens, output_tokens, "
+                "cost, latency_s, attempts, cache_hit) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def _query(self, sql: str, params=()) -> List[Dict]:
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+    def cost_per_vendor_per_day(self, since_day: Optional[str] = None) -> List[Dict]:
+        """Calls, tokens and cost per (vendor, day), newest day first"""
+        return self._query(
+            "SELECT vendor, day, COUNT(*) AS calls, SUM(input_tokens) AS input_tokens, "
+            "SUM(output_tokens) AS output_tokens, SUM(cost) AS cost FROM llm_calls "
+            "WHERE day >= ? GROUP BY vendor, day ORDER BY day DESC, cost DESC",
+            (since_day or "",))
+
+    def tokens_per_page_by_domain(self) -> List[Dict]:
+        """Average tokens and cost per distinct page (URL) for each domain, most expensive pages first"""
+        return self._query(
+            "SELECT domain, COUNT(DISTINCT url) AS pages, COUNT(*) AS calls, "
+            "SUM(input_tokens) * 1.0 / COUNT(DISTINCT url) AS input_tokens_per_page, "
+            "SUM(output_tokens) * 1.0 / COUNT(DISTINCT url) AS output_tokens_per_page, "
+            "SUM(cost) / COUNT(DISTINCT url) AS cost_per_page, SUM(cost) AS cost, "
+            "AVG(latency_s) AS mean_latency_s, SUM(cache_hit) AS cache_hits "
+            "FROM llm_calls GROUP BY domain ORDER BY cost_per_page DESC")
+
+    def cost_by_model(self) -> List[Dict]:
+        """Calls, tokens and cost per model"""
+        return self._query(
+            "SELECT model, COUNT(*) AS calls, SUM(input_tokens) AS input_tokens, "
+            "SUM(output_tokens) AS output_tokens, SUM(cost) AS cost FROM llm_calls "
+            "GROUP BY model ORDER BY cost DESC")
+
+    def totals(self) -> Dict:
+        rows = self._query(
+            "SELECT COUNT(*) AS calls, COALESCE(SUM(input_tokens), 0) AS input_tokens, "
+            "COALESCE(SUM(output_tokens), 0) AS output_tokens, COALESCE(SUM(cost), 0) AS cost FROM llm_calls")
+        return rows[0]
+
+
+_ledgers: Dict[str, CostLedger] = {}
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> CostLedger:
+    """
+    Process-wide ledger, created on first use. COST_LEDGER_PATH is read on every
+    call, so a path set later gets its own ledger instead of the cached one.
+    """
+    path = os.getenv("COST_LEDGER_PATH") or ""
+    with _ledger_lock:
+        if path not in _ledgers:
+            _ledgers[path] = CostLedger(db_path=path or None)
+        return _ledgers[path]
+
+
+def set_vendor(vendor: str) -> contextvars.Token:
+    """Attribute the LLM calls made from here on (in this thread) to a session's vendor"""
+    return _current_vendor.set(vendor or "")
+
+
+def reset_vendor(token: contextvars.Token):
+    _current_vendor.reset(token)
+
+
+def record_llm_call(**kwargs):
+    """Append a call to the ledger; a ledger failure never fails the scrape"""
+    try:
+        get_ledger().record(**kwargs)
+    except Exception as e:
+        print(f"Could not record LLM call in the cost ledger: {e}")
@@ -0,0 +1,109 @@
+# link_aliases.py
+
+import re
+from typing import Dict, Tuple
+from urllib.parse import urlparse, parse_qsl
+from .assets import LINK_ALIAS_SETTINGS
+
+# Absolute URLs as they appear in markdown links and bare text
+URL_PATTERN = re.compile(r"https?://[^\s()<>\[\]\"'`]+")
+ALIAS_PATTERN = re.compile(r"~L(\d+)")
+BARE_ALIAS_PATTERN = re.compile(r"^L(\d+)$")
+
+# Query parameters and path segments that mark a link to another results page
+PAGINATION_PARAMS = {"page", "p", "pg", "pagenumber", "page_number", "offset", "start"}
+PAGINATION_PATH = re.compile(r"/page/\d+", re.IGNORECASE)
+
+ALIAS_NOTE = ("[Links in this page are shortened to aliases like ~L1. "
+              "Copy an alias exactly wherever its URL belongs in the answer.]\n\n")
+
+
+def is_pagination_url(url: str) -> bool:
+    """Whether a URL looks like a link to another page of results"""
+    parsed = urlparse(url)
+    if PAGINATION_PATH.search(parsed.path):
+        return True
+    return any(key.lower() in PAGINATION_PARAMS for key, _ in parse_qsl(parsed.query))
+
+
+class LinkAliases:
+    """
+    Reversible table of short aliases (~L1, ~L2, ...) for the URLs of one page.
+    compact() swaps URLs in the markdown for aliases before it goes to the model;
+    restore() puts the real URLs back into whatever the model answered.
+    """
+
+    def __init__(self):
+        self.by_url: Dict[str, str] = {}
+        self.by_alias: Dict[str, str] = {}
+
+    def __len__(self):
+        return len(self.by_url)
+
+    def to_dict(self) -> Dict[str, str]:
+        """Alias -> URL, enough to restore answers later (e.g. from a batch)"""
+        return dict(self.by_alias)
+
+    @classmethod
+    def from_dict(cls, by_alias: Dict[str, str]) -> "LinkAliases":
+        aliases = cls()
+        aliases.by_alias = dict(by_alias)
+        aliases.by_url = {url: alias for alias, url in by_alias.items()}
+        return aliases
+
+    def alias(self, url: str) -> str:
+        alias = self.by_url.get(url)
+        if alias is None:
+            alias = f"~L{len(self.by_url) + 1}"
+            self.by_url[url] = alias
+            self.by_alias[alias] = url
+        return alias
+
+    def compact(self, text: str, keep_pagination: bool = False) -> str:
+        """Replace URLs in `text` with aliases; short URLs (and page links if keep_pagination) stay as they are"""
+        min_length = LINK_ALIAS_SETTINGS["min_url_length"]
+
+        def replace(match):
+            url = match.group(0)
+            if len(url) < min_length or (keep_pagination and is_pagination_url(url)):
+                return url
+            return self.alias(url)
+
+        compacted = URL_PATTERN.sub(replace, text)
+        return ALIAS_NOTE + compacted if self.by_url else compacted
+
+    def _restore_text(self, text: str) -> str:
+        bare = BARE_ALIAS_PATTERN.match(text.strip())
+        if bare and f"~L{bare.group(1)}" in self.by_alias:
+            # The model dropped the tilde from an alias given as the whole value
+            return self.by_alias[f"~L{bare.group(1)}"]
+        return ALIAS_PATTERN.sub(lambda m: self.by_alias.get(m.group(0), m.group(0)), text)
+
+    def restore(self, data):
+        """`data` (model answer: dict, list, string or pydantic model) with every alias replaced by its URL"""
+        if not self.by_alias:
+            return data
+        if hasattr(data, "model_dump"):
+            data = data.model_dump()
+        if isinstance(data, str):
+            return self._restore_text(data)
+        if isinstance(data, dict):
+            return {key: self.restore(value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self.restore(item) for item in data]
+        return data
+
+
+def compact_links(text: str, keep_pagination: bool = False) -> Tuple[str, LinkAliases]:
+    """
+    Shorten the links of a page before it is sent to the model.
+    Returns the text to send and the alias table to restore the answer with.
+    Disabled (text unchanged, empty table) when LINK_ALIAS_SETTINGS["enabled"] is off.
+    """
+    aliases = LinkAliases()
+    if not LINK_ALIAS_SETTINGS["enabled"]:
+        return text, aliases
+    compacted = aliases.compact(text, keep_pagination=keep_pagination)
+    if aliases:
+        print(f"Aliased {len(aliases)} links: {len(text)} -> {len(compacted)} characters")
+    return compacted, aliases
@@ -1,23 +1,38 @@
 # llm_calls.py
-import litellm
 import json
-from litellm import (completion,token_counter,completion_cost,get_max_tokens,)
-from .assets import USER_MESSAGE, MODELS_USED
+from .assets import USER_MESSAGE, MODELS_USED, MODEL_FALLBACKS
 from .api_management import get_api_key
+from .resilience import call_with_resilience
+from .metrics import span, current_url
+from .ledger import record_llm_call
 import os
+import time
 
 
 
-def call_llm_model(data,response_format,model,system_message,extra_user_instruction="",max_tokens=None,use_model_max_tokens_if_none=False):
+def build_messages(data, system_message, extra_user_instruction=""):
+    """The conversation sent for one extraction (also used for batch requests)"""
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user","content": f"{USER_MESSAGE} {extra_user_instruction} {data}"}
+    ]
+
+
+def call_llm_model(data,response_format,model,system_message,extra_user_instruction="",max_tokens=None,use_model_max_tokens_if_none=False,
+                   fallback_models=None, url=None):
     """
     Calls an LLM via LiteLLM and returns:
       - parsed_response (str or dict, depending on your response_format),
-      - token_counts ({"input_tokens": int, "output_tokens": int}),
+      - token_counts ({"input_tokens": int, "output_tokens": int, ...}),
       - cost (float).
 
     It also checks the maximum allowable tokens for the chosen model via
     'get_max_tokens' and ensures the 'max_tokens' parameter doesn't exceed that.
 
+    Transient provider errors (429, 5xx, timeouts) are retried with exponential
+    backoff, honoring retry-after headers. If the model keeps failing or its
+    provider's circuit breaker is open, the fallback models are tried in order.
+
     Parameters:
         data (str): Additional data to append to the user message.
         response_format: Desired response format (a dict or Pydantic model).
@@ -27,45 +42,62 @@ def call_llm_model(data,response_format,model,system_message,extra_user_instruct
         max_tokens (int, optional): The maximum number of tokens to allow in the completion.
         use_model_max_tokens_if_none (bool, optional): If True and max_tokens is not provided,
             the function will automatically use the model's maximum context size.
+        fallback_models (list, optional): Models to try if `model` fails. Defaults to
+            MODEL_FALLBACKS[model]; pass [] to disable fallback.
+        url (str, optional): Page the call is made for, recorded in the cost ledger.
+            Defaults to the URL of the enclosing metrics span.
 
     Returns:
         tuple: (parsed_response, token_counts, cost)
             - parsed_response: The parsed output (could be text or a structured object).
-            - token_counts: A dict with "input_tokens" and "output_tokens".
+            - token_counts: A dict with "input_tokens" and "output_tokens", plus
+              "model" (the model that answered) and "attempts" (failed attempts).
             - cost: The overall cost (in USD) for the API call.
     """
-    # 1) Retrieve the single API key name for this model from MODELS_USED
-    env_var_name = list(MODELS_USED[model])[0]  # e.g., "GEMINI_API_KEY"
-    # 2) Retrieve the actual key from session or OS
-    env_value = get_api_key(model)
-    print("env variable is:" + env_value)
-    # 3) Set it in os.environ so that litellm / underlying client sees it
-    if env_value:
-        os.environ[env_var_name] = env_value
-
-    model_max_tokens = get_max_tokens(model)
-    if max_tokens is not None:
-        max_tokens = min(max_tokens, model_max_tokens)-100 
-    elif use_model_max_tokens_if_none:
-        max_tokens = model_max_tokens -100
-
-    # Build the conversation messages
-    messages = [
-        {"role": "system", "content": system_message},
-        {"role": "user","content": f"{USER_MESSAGE} {extra_user_instruction} {data}"}
-    ]
+    # LiteLLM takes seconds to import; load it on the first call, not at app start
+    from litellm import completion, token_counter, completion_cost, get_max_tokens
 
-    # Prepare parameters for the LiteLLM completion call
-    params = {
-        "model": model,
-        "messages": messages,
-        "response_format": response_format,
-    }
-    if max_tokens is not None:
-        params["max_tokens"] = max_tokens
+    if fallback_models is None:
+        fallback_models = MODEL_FALLBACKS.get(model, [])
+    models = [model] + [m for m in fallback_models if m != model and m in MODELS_USED]
 
-    # Call the LLM using LiteLLM
-    response = completion(**params)
+    # Build the conversation messages
+    messages = build_messages(data, system_message, extra_user_instruction)
+
+    def attempt_completion(candidate_model):
+        model_max_tokens = get_max_tokens(candidate_model)
+        candidate_max_tokens = None
+        if max_tokens is not None:
+            candidate_max_tokens = min(max_tokens, model_max_tokens)-100
+        elif use_model_max_tokens_if_none:
+            candidate_max_tokens = model_max_tokens -100
+
+        # Prepare parameters for the LiteLLM completion call
+        params = {
+            "model": candidate_model,
+            "messages": messages,
+            "response_format": response_format,
+        }
+        if candidate_max_tokens is not None:
+            params["max_tokens"] = candidate_max_tokens
+        # Passed per call, never through os.environ: worker threads share the process,
+        # so a key left there would be used by other users' runs that have none
+        api_key = get_api_key(candidate_model)
+        if api_key:
+            params["api_key"] = api_key
+        else:
+            print(f"No API key found for {candidate_model} ({list(MODELS_USED[candidate_model])[0]})")
+        # Point OpenAI-compatible calls at another endpoint (e.g. the benchmark's fake LLM)
+        if os.getenv("LLM_API_BASE"):
+            params["api_base"] = os.getenv("LLM_API_BASE")
+
+        # Call the LLM using LiteLLM
+        with span("llm.call", model=candidate_model):
+            return completion(**params)
+
+    started = time.perf_counter()
+    response, model_used, failed_attempts = call_with_resilience(attempt_completion, models)
+    latency = time.perf_counter() - started
 
     # Extract the parsed response
     parsed_response = response.choices[0].message.content
@@ -73,22 +105,33 @@ def call_llm_model(data,response_format,model,system_message,extra_user_instruct
     # Calculate token counts:
     #   - input_tokens: from the user/system prompt
     #   - output_tokens: from the returned content
-    input_tokens = token_counter(model=model, messages=messages)
-
-    # Make sure we convert the parsed response to a string for counting
-    output_text = (
-        parsed_response if isinstance(parsed_response, str)
-        else json.dumps(parsed_response)
-    )
-    output_tokens = token_counter(model=model, text=output_text)
+    # Counted in this process: tiktoken encodes outside the GIL, and a spawned pool worker
+    # would have to import LiteLLM first, which takes longer than the counting
+    with span("llm.token_count", model=model_used):
+        input_tokens = token_counter(model=model_used, messages=messages)
+
+        # Make sure we convert the parsed response to a string for counting
+        output_text = (
+            parsed_response if isinstance(parsed_response, str)
+            else json.dumps(parsed_response)
+        )
+        output_tokens = token_counter(model=model_used, text=output_text)
 
     token_counts = {
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "model": model_used,
+        "attempts": len(failed_attempts) + 1,
+        "failed_attempts": failed_attempts,
     }
 
-    # Calculate the total cost for the request
+    # Calculate the total cost for the request (priced for the model that answered)
     cost = completion_cost(completion_response=response)
 
-    return parsed_response, token_counts, cost
+    # Keep every call in the persistent ledger for per-domain / per-vendor cost analysis
+    hidden_params = getattr(response, "_hidden_params", None) or {}
+    record_llm_call(url=url or current_url(), model=model_used, input_tokens=input_tokens,
+                    output_tokens=output_tokens, cost=cost, latency_s=latency,
+                    attempts=token_counts["attempts"], cache_hit=bool(hidden_params.get("cache_hit")))
 
+    return parsed_response, token_counts, cost
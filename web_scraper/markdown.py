@@ -1,13 +1,18 @@
 # markdown.py
 
 import asyncio
+import os
 import random
 import time
-from typing import List
+from typing import List, Tuple
 from core.utils import generate_unique_name
-from crawl4ai import AsyncWebCrawler
+from .assets import HTML_SNAPSHOT_SETTINGS, READINESS_SETTINGS, TIMEOUT_SETTINGS
 from .asyncio_helper import ensure_event_loop
 from .file_storage import FileStorage
+from .metrics import span
+from .readiness import ReadinessWaiter
+from .scroll import ScrollHarvester
+from .resource_blocking import ResourceBlocker
 
 # List of common user agents to rotate through
 USER_AGENTS = [
@@ -19,9 +24,11 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36 Edg/121.0.0.0",
 ]
 
-async def get_fit_markdown_async(url: str) -> str:
+async def get_page_async(url: str) -> Tuple[str, str]:
     """
-    Async function using crawl4ai's AsyncWebCrawler to produce the regular raw markdown.
+    Async function using crawl4ai's AsyncWebCrawler to produce the regular raw markdown
+    and the cleaned HTML of the same render (scripts and styles stripped, classes kept),
+    as (markdown, html); ("", "") if the fetch failed.
     Enhanced with anti-scraping measures:
     - Rotating user agents
     - Random delays
@@ -31,7 +38,8 @@ async def get_fit_markdown_async(url: str) -> str:
     ensure_event_loop()
     
     # Add random delay to avoid rate limiting (0.5 to 3 seconds)
-    await asyncio.sleep(random.uniform(0.5, 3))
+    with span("fetch.delay"):
+        await asyncio.sleep(random.uniform(0.5, 3))
     
     # Select a random user agent
     user_agent = random.choice(USER_AGENTS)
@@ -61,65 +69,125 @@ async def get_fit_markdown_async(url: str) -> str:
             "DNT": "1",  # Do Not Track
         })
         # Extra delay for weedmaps
-        await asyncio.sleep(random.uniform(1, 2))
+        with span("fetch.delay"):
+            await asyncio.sleep(random.uniform(1, 2))
     
+    # crawl4ai pulls in Playwright; only import it once a page is actually fetched
+    from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+
+    # Abort images, fonts, media and tracker requests the markdown doesn't need
+    blocker = ResourceBlocker(url)
+    # Capture the page as soon as it is ready rather than after a fixed delay
+    waiter = ReadinessWaiter(url) if READINESS_SETTINGS["enabled"] else None
+    # Then scroll infinite catalogues until they stop loading new listings
+    harvester = ScrollHarvester(url)
+
     # Configure crawler with enhanced options
-    crawler_config = {
-        "headers": headers,
-        "timeout": 30,
-        "wait_for": 2000,  # Wait 2 seconds for JS to load
-        "playwright_args": {
-            "headless": True,
-        }
-    }
+    browser_config = BrowserConfig(headless=True, user_agent=user_agent, headers=headers)
+    run_config = CrawlerRunConfig(
+        wait_until="domcontentloaded",
+        page_timeout=TIMEOUT_SETTINGS["page_load"] * 1000,
+        delay_before_return_html=0 if waiter else 2.0,
+        keep_data_attributes=HTML_SNAPSHOT_SETTINGS["keep_data_attributes"],
+    )
 
     try:
-        async with AsyncWebCrawler() as crawler:
-            result = await crawler.arun(url=url, **crawler_config)
-            if result.success:
-                return result.markdown
-            else:
-                print(f"Failed to fetch markdown for {url}: {result.error if hasattr(result, 'error') else 'Unknown error'}")
-                return ""
+        with span("fetch.crawl"):
+            async with AsyncWebCrawler(config=browser_config) as crawler:
+                if blocker.enabled:
+                    crawler.crawler_strategy.set_hook("on_page_context_created", blocker.on_page_context_created)
+                if waiter:
+                    crawler.crawler_strategy.set_hook("after_goto", waiter.after_goto)
+                if harvester.enabled:
+                    crawler.crawler_strategy.set_hook("before_retrieve_html", harvester.before_retrieve_html)
+                result = await crawler.arun(url=url, config=run_config)
+        blocker.record()
+        if waiter:
+            waiter.record()
+        harvester.record()
+        if result.success:
+            return harvester.merge(str(result.markdown)), result.cleaned_html or ""
+        else:
+            print(f"Failed to fetch markdown for {url}: {result.error if hasattr(result, 'error') else 'Unknown error'}")
+            return "", ""
     except Exception as e:
         print(f"Exception while fetching markdown for {url}: {str(e)}")
-        return ""
+        return "", ""
 
 
-def fetch_fit_markdown(url: str) -> str:
+async def get_fit_markdown_async(url: str) -> str:
+    """Markdown of the page only, see get_page_async()"""
+    markdown, _ = await get_page_async(url)
+    return markdown
+
+
+def fetch_page(url: str) -> Tuple[str, str]:
     """
-    Synchronous wrapper around get_fit_markdown_async().
+    Synchronous wrapper around get_page_async().
     """
     # Use ensure_event_loop instead of creating a new one
     loop = ensure_event_loop()
     try:
-        return loop.run_until_complete(get_fit_markdown_async(url))
+        with span("fetch", url=url):
+            return loop.run_until_complete(get_page_async(url))
     finally:
         # Don't close the loop, as it might be used elsewhere
         pass
 
 
+def fetch_fit_markdown(url: str) -> str:
+    """
+    Synchronous wrapper around get_fit_markdown_async().
+    """
+    return fetch_page(url)[0]
+
+
 def read_raw_data(file_path: str) -> str:
     """Read raw data from file"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with span("storage.read"), open(file_path, 'r', encoding='utf-8') as f:
             return f.read()
     except Exception as e:
         print(f"Error reading raw data: {e}")
         return ""
 
 
-def fetch_and_store_markdowns(session_path: str, urls: List[str]) -> List[str]:
-    """Fetch and store markdown to files instead of database"""
+def read_html_snapshot(file_path: str) -> str:
+    """Cleaned HTML saved with a raw markdown file ("" for pages fetched without one)"""
+    html_path = FileStorage.html_snapshot_path(file_path)
+    if not os.path.exists(html_path):
+        return ""
+    try:
+        with span("storage.read"), open(html_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except Exception as e:
+        print(f"Error reading HTML snapshot: {e}")
+        return ""
+
+
+def fetch_and_store_markdowns(session_path: str, urls: List[str], progress=None) -> List[str]:
+    """
+    Fetch and store markdown to files instead of database.
+    With a SessionProgress, pages already fetched in this session are reused
+    and each newly fetched page is checkpointed.
+    """
     file_paths = []
     file_storage = FileStorage()
 
     for url in urls:
-        # Check if we already have raw_data in files
-        # This would need a way to locate existing files - perhaps by session and URL
-        # For now, always fetch new data
-        fit_md = fetch_fit_markdown(url)
+        checkpoint = progress.get(url, "fetched") if progress is not None else None
+        if checkpoint and os.path.exists(checkpoint["raw_path"]):
+            print(f"Reusing previously fetched markdown for {url}")
+            file_paths.append(checkpoint["raw_path"])
+            continue
+
+        fit_md, html = fetch_page(url)
         file_path = file_storage.save_raw_data(session_path, url, fit_md)
         file_paths.append(file_path)
+        if file_path and html and HTML_SNAPSHOT_SETTINGS["enabled"]:
+            # DOM-based extractors read this instead of parsing the markdown
+            file_storage.save_html_snapshot(file_path, url, html)
+        if progress is not None and fit_md and file_path:
+            progress.record(url, "fetched", raw_path=file_path)
 
-    return file_paths
+    return file_paths
\ No newline at end of file
@@ -0,0 +1,210 @@
+# metrics.py
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+# Histogram bucket upper bounds in seconds (Prometheus-style, cumulative on export)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Labels inherited by nested spans, so an LLM call knows which page it was made for
+_current_domain = contextvars.ContextVar("metrics_domain", default="")
+_current_model = contextvars.ContextVar("metrics_model", default="")
+_current_url = contextvars.ContextVar("metrics_url", default="")
+
+
+def current_url() -> str:
+    """URL of the innermost enclosing span that was given one ("" outside any page)"""
+    return _current_url.get()
+
+
+def domain_of(url: str) -> str:
+    """Host of a URL without a leading www. ("" if it has none)"""
+    host = urlparse(url or "").netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class Histogram:
+    """Count, sum and bucket counts of durations for one (stage, domain, model)"""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: the upper bound of the bucket it falls in"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "sum": self.sum, "max": self.max, "buckets": list(self.buckets)}
+
+
+class MetricsRegistry:
+    """Thread-safe store of stage timings keyed by (stage, domain, model), plus counters keyed by (name, domain, kind)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._counters: Dict[tuple, float] = {}
+
+    def observe(self, stage: str, seconds: float, domain: str = "", model: str = ""):
+        key = (stage, domain or "", model or "")
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, value: float = 1.0, domain: str = "", kind: str = ""):
+        key = (name, domain or "", kind or "")
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def counters(self) -> List[Dict]:
+        """Every counter as a plain dict, sorted by name, domain and kind"""
+        with self._lock:
+            return [{"name": n, "domain": d, "kind": k, "value": v} for (n, d, k), v in sorted(self._counters.items())]
+
+    def snapshot(self) -> List[Dict]:
+        """Every series as a plain dict, sorted by stage, domain and model"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return [{"stage": s, "domain": d, "model": m, **h.to_dict()} for (s, d, m), h in items]
+
+    def stage_breakdown(self) -> List[Dict]:
+        """Timings summed over domains and models, one row per stage, slowest total first"""
+        merged: Dict[str, Histogram] = {}
+        with self._lock:
+            for (stage, _, _), histogram in self._histograms.items():
+                total = merged.setdefault(stage, Histogram())
+                total.count += histogram.count
+                total.sum += histogram.sum
+                total.max = max(total.max, histogram.max)
+                total.buckets = [a + b for a, b in zip(total.buckets, histogram.buckets)]
+        rows = [{
+            "stage": stage,
+            "count": h.count,
+            "total_s": h.sum,
+            "mean_s": h.sum / h.count if h.count else 0.0,
+            "p95_s": h.quantile(0.95),
+            "max_s": h.max,
+        } for stage, h in merged.items()]
+        return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format for all series"""
+        lines = [
+            "# HELP scraper_stage_seconds Time spent per scraper stage",
+            "# TYPE scraper_stage_seconds histogram",
+        ]
+        for series in self.snapshot():
+            labels = (f'stage="{series["stage"]}",domain="{_escape(series["domain"])}",'
+                      f'model="{_escape(series["model"])}"')
+            cumulative = 0
+            for bound, n in zip(BUCKETS, series["buckets"]):
+                cumulative += n
+                lines.append(f'scraper_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'scraper_stage_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f'scraper_stage_seconds_sum{{{labels}}} {series["sum"]:.6f}')
+            lines.append(f'scraper_stage_seconds_count{{{labels}}} {series["count"]}')
+        typed = set()
+        for counter in self.counters():
+            metric = f"scraper_{counter['name']}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f'{metric}{{domain="{_escape(counter["domain"])}",kind="{_escape(counter["kind"])}"}} '
+                         f'{counter["value"]:g}')
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, directory: str) -> Dict[str, str]:
+        """Write metrics.prom and metrics.json to `directory`, replacing earlier snapshots atomically"""
+        os.makedirs(directory, exist_ok=True)
+        paths = {
+            "prometheus": os.path.join(directory, "metrics.prom"),
+            "json": os.path.join(directory, "metrics.json"),
+        }
+        contents = {
+            "prometheus": self.to_prometheus(),
+            "json": json.dumps({"generated_at": time.time(), "buckets": list(BUCKETS),
+                                "series": self.snapshot(), "stages": self.stage_breakdown(),
+                                "counters": self.counters()}, indent=2),
+        }
+        for kind, path in paths.items():
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(contents[kind])
+            os.replace(tmp_path, path)
+        return paths
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Process-wide registry used by span()
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def span(stage: str, url: Optional[str] = None, model: Optional[str] = None):
+    """
+    Time a block and record it under `stage`.
+    Domain (from `url`) and model are inherited from the enclosing span when not given,
+    so e.g. an LLM call inside a page's extraction is labelled with that page's domain.
+    The duration is recorded even if the block raises.
+    """
+    domain_token = _current_domain.set(domain_of(url)) if url else None
+    url_token = _current_url.set(url) if url else None
+    model_token = _current_model.set(model) if model else None
+    domain, model_label = _current_domain.get(), _current_model.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(stage, time.perf_counter() - start, domain, model_label)
+        if model_token is not None:
+            _current_model.reset(model_token)
+        if domain_token is not None:
+            _current_domain.reset(domain_token)
+            _current_url.reset(url_token)
+
+
+def count(name: str, value: float = 1.0, domain: Optional[str] = None, kind: str = ""):
+    """Add to a counter; the domain defaults to the enclosing span's"""
+    REGISTRY.increment(name, value, _current_domain.get() if domain is None else domain, kind)
+
+
+def stage_breakdown() -> List[Dict]:
+    return REGISTRY.stage_breakdown()
+
+
+def write_snapshot(directory: str) -> Dict[str, str]:
+    return REGISTRY.write_snapshot(directory)
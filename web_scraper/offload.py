@@ -0,0 +1,76 @@
+# offload.py
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+from .assets import OFFLOAD_SETTINGS
+from .metrics import span
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _warm_worker():
+    """Import the parsing dependencies once per worker process rather than on its first task"""
+    try:
+        import bs4  # noqa: F401
+        from . import relevance  # noqa: F401
+    except Exception as e:
+        print(f"Preloading offload worker failed: {e}")
+
+
+def pool_size() -> int:
+    return OFFLOAD_SETTINGS["max_workers"] or max((os.cpu_count() or 2) - 1, 1)
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Process-wide pool for CPU-bound stages, created on first use.
+    Workers are spawned rather than forked: the app and workers run threads
+    (and Playwright) that a forked child must not inherit.
+    """
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = pool_size()
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_warm_worker)
+            # Bounded work queue: callers beyond this many in-flight tasks wait for a slot
+            _slots = threading.BoundedSemaphore(workers * OFFLOAD_SETTINGS["queue_per_worker"])
+        return _pool
+
+
+def run_cpu(fn: Callable, *args, size: Optional[int] = None):
+    """
+    Run fn(*args) in the process pool and wait for its result, so the GIL stays free
+    for the threads doing fetch and LLM I/O meanwhile. fn and its arguments must be
+    picklable (module-level functions, plain data).
+    Runs inline when offloading is disabled or `size` (e.g. characters of input) is
+    under min_size, where handing the work over costs more than it saves.
+    """
+    if not OFFLOAD_SETTINGS["enabled"] or (size is not None and size < OFFLOAD_SETTINGS["min_size"]):
+        return fn(*args)
+    pool, slots = get_process_pool(), _slots
+    with span("offload.wait"):
+        slots.acquire()
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory): start a fresh pool next time, do this one here
+        print(f"Process pool broken, running {getattr(fn, '__name__', fn)} inline")
+        shutdown_pool()
+        return fn(*args)
+    finally:
+        slots.release()
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -1,15 +1,22 @@
 # pagination.py
 
 import json
+import os
 from typing import List, Dict
-from .assets import PROMPT_PAGINATION
-from .markdown import read_raw_data
+from .assets import PROMPT_PAGINATION, AUTO_MODEL
+from .markdown import read_raw_data, read_html_snapshot
 from pydantic import BaseModel, Field
 from typing import List
 from pydantic import create_model
 from .llm_calls import (call_llm_model)
+from .json_repair import parse_model_output
 from .file_storage import FileStorage
-from bs4 import BeautifulSoup
+from .routing import ModelRouter
+from .metrics import span
+from .link_aliases import compact_links
+from .offload import run_cpu
+from .canonical import unique_urls
+from core.utils import load_json_file
 import re
 from urllib.parse import urljoin, urlparse
 
@@ -60,16 +67,36 @@ def save_pagination_data(session_path: str, url: str, pagination_data) -> str:
     return file_storage.save_pagination_data(session_path, url, pagination_data)
 
 
+def canonical_pagination(pag_data, url: str):
+    """
+    Pagination data with its page_urls made absolute and canonical, without
+    duplicates, so variants of one page (e.g. differing only in tracking
+    parameters) are offered and fetched once. Unparsed output is returned as is.
+    """
+    if hasattr(pag_data, "model_dump"):
+        pag_data = pag_data.model_dump()
+    elif hasattr(pag_data, "dict"):
+        pag_data = pag_data.dict()
+    if not isinstance(pag_data, dict) or not isinstance(pag_data.get("page_urls"), list):
+        return pag_data
+    base = url if urlparse(url).scheme else ""
+    page_urls = [urljoin(base, page_url) if base else page_url
+                 for page_url in pag_data["page_urls"] if isinstance(page_url, str)]
+    return {**pag_data, "page_urls": unique_urls(page_urls)}
+
+
 def extract_weedmaps_pagination(raw_data: str, url: str) -> Dict:
     """
-    Specialized function to extract pagination from weedmaps.com
+    Specialized function to extract pagination from weedmaps.com, run on the
+    page's HTML snapshot (or on the markdown for pages fetched without one)
     """
     # Create an empty result in the expected format
     empty_result = {
         "page_urls": []
     }
     
-    # Parse the markdown/HTML with BeautifulSoup
+    # Parse the page's DOM with BeautifulSoup
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(raw_data, 'html.parser')
     
     # Extract base URL for building absolute links
@@ -149,11 +176,37 @@ def extract_weedmaps_pagination(raw_data: str, url: str) -> Dict:
     return empty_result
 
 
-def paginate_urls(session_path: str, file_paths: List[str], urls: List[str], selected_model: str, indication: str):
+def detect_pagination_with_llm(raw_data: str, url: str, model: str, indication: str):
+    """
+    Ask the model for the page's pagination URLs.
+    Links are sent as short aliases, except the ones that already look like page
+    links (the model needs to see their pattern); page_urls come back with real URLs.
+    Returns (pag_data, token_counts, cost).
+    """
+    llm_data, aliases = compact_links(raw_data, keep_pagination=True)
+    response_schema = get_pagination_response_format()
+    full_indication = build_pagination_prompt(indication, url)
+    pag_data, token_counts, cost = call_llm_model(llm_data, response_schema, model, full_indication, url=url)
+
+    # repair malformed or truncated JSON locally instead of storing raw text
+    if isinstance(pag_data, str):
+        with span("parse.llm_output"):
+            pag_data = parse_model_output(pag_data, PaginationModel) or pag_data
+    return aliases.restore(pag_data), token_counts, cost
+
+
+def paginate_urls(session_path: str, file_paths: List[str], urls: List[str], selected_model: str, indication: str,
+                  progress=None):
     """
     For each file_path, read raw_data, detect pagination, save results,
     accumulate cost usage, and return a final summary.
+
+    With a SessionProgress, pages already paginated in this session are loaded
+    from their saved output, and every newly paginated page is checkpointed.
+
+    With AUTO_MODEL as selected_model, each page goes to the cheapest model that fits it.
     """
+    router = ModelRouter() if selected_model == AUTO_MODEL else None
     total_input_tokens = 0
     total_output_tokens = 0
     total_cost = 0
@@ -168,34 +221,55 @@ def paginate_urls(session_path: str, file_paths: List[str], urls: List[str], sel
             continue
             
         current_url = urls[i] if i < len(urls) else "unknown_url"
+
+        # Already paginated before an interruption: reuse the saved output
+        checkpoint = progress.get(current_url, "paginated") if progress is not None else None
+        if checkpoint and os.path.exists(checkpoint["output_path"]):
+            print(f"Reusing checkpointed pagination for {current_url}")
+            total_input_tokens += checkpoint["input_tokens"]
+            total_output_tokens += checkpoint["output_tokens"]
+            total_cost += checkpoint["cost"]
+            pagination_results.append({"file_path": file_path, "output_path": checkpoint["output_path"],
+                                       "pagination_data": load_json_file(checkpoint["output_path"]),
+                                       "resumed": True})
+            continue
         
-        # Check if this is a weedmaps URL and use specialized pagination detection
-        if "weedmaps.com" in current_url:
-            print(f"Detected weedmaps.com URL - using specialized pagination detection")
+        with span("paginate", url=current_url):
+            pag_data = None
+            token_counts = {"input_tokens": 0, "output_tokens": 0}
+            cost = 0
+
+            # Check if this is a weedmaps URL and use specialized pagination detection
+            if "weedmaps.com" in current_url:
+                print(f"Detected weedmaps.com URL - using specialized pagination detection")
             
-            # Try specialized pagination detection
-            pag_data = extract_weedmaps_pagination(raw_data, current_url)
+                # Try specialized pagination detection
+                with span("parse.weedmaps_pagination"):
+                    page = read_html_snapshot(file_path) or raw_data
+                    pag_data = run_cpu(extract_weedmaps_pagination, page, current_url, size=len(page))
             
-            # If we found pagination URLs, use them; otherwise fall back to LLM
-            if pag_data and pag_data.get("page_urls") and len(pag_data["page_urls"]) > 0:
-                print(f"Successfully extracted {len(pag_data['page_urls'])} pagination URLs with specialized extractor")
-                token_counts = {"input_tokens": 0, "output_tokens": 0}
-                cost = 0
-            else:
-                # Fall back to LLM
-                print(f"Specialized pagination detection found no URLs, falling back to LLM")
-                response_schema = get_pagination_response_format()
-                full_indication = build_pagination_prompt(indication, current_url)
-                pag_data, token_counts, cost = call_llm_model(raw_data, response_schema, selected_model, full_indication)
-        else:
-            # Standard LLM-based pagination detection for other sites
-            response_schema = get_pagination_response_format()
-            full_indication = build_pagination_prompt(indication, current_url)
-            pag_data, token_counts, cost = call_llm_model(raw_data, response_schema, selected_model, full_indication)
+                # If we found pagination URLs, use them; otherwise fall back to LLM
+                if pag_data and pag_data.get("page_urls") and len(pag_data["page_urls"]) > 0:
+                    print(f"Successfully extracted {len(pag_data['page_urls'])} pagination URLs with specialized extractor")
+                else:
+                    print(f"Specialized pagination detection found no URLs, falling back to LLM")
+                    pag_data = None
+
+            if pag_data is None:
+                # LLM-based pagination detection; the routed model is only worked out when it is needed
+                page_model = router.cheapest_model(raw_data) if router is not None else selected_model
+                pag_data, token_counts, cost = detect_pagination_with_llm(raw_data, current_url, page_model,
+                                                                          indication)
 
         # store
+        pag_data = canonical_pagination(pag_data, current_url)
         output_path = save_pagination_data(session_path, current_url, pag_data)
 
+        if progress is not None and output_path:
+            progress.record(current_url, "paginated", output_path=output_path,
+                            input_tokens=token_counts["input_tokens"],
+                            output_tokens=token_counts["output_tokens"], cost=cost)
+
         # accumulate cost
         total_input_tokens += token_counts["input_tokens"]
         total_output_tokens += token_counts["output_tokens"]
@@ -0,0 +1,181 @@
+# pipeline.py
+
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+from .markdown import fetch_and_store_markdowns
+from .scraper import scrape_urls
+from .pagination import paginate_urls
+from .dedup import ListingDeduplicator
+from .incremental import summarize_incremental
+from .routing import ModelRouter
+from .assets import AUTO_MODEL
+from .results_table import ListingsTable, table_path_for
+from .session_manager import SessionManager, SessionProgress
+from .metrics import write_snapshot
+from .ledger import set_vendor, reset_vendor
+from .canonical import canonicalize_url, unique_urls
+
+
+def run_scrape_session(config: Dict, vendor: Optional[str] = None, session_manager: Optional[SessionManager] = None) -> Dict:
+    """
+    Run a full scrape without the Streamlit UI, the same way the LAUNCH button does:
+    create a session, fetch every URL, extract listings and detect pagination.
+
+    `config` has the shape stored in scrape_config.json (urls, fields, model,
+    use_pagination, pagination_details, deduplicate, ...).
+    Returns a summary dict with the session id, token usage and cost.
+    """
+    session_manager = session_manager or SessionManager()
+    storage = session_manager.storage
+    urls = unique_urls(config.get("urls", []))
+    if not urls:
+        raise ValueError("Scrape config has no URLs")
+    config = dict(config, urls=urls)
+
+    vendor = vendor or storage._extract_brand_from_url(urls[0])
+    session = session_manager.create_session(vendor, config)
+    progress = SessionProgress(storage, session["session_path"])
+    return run_session(session, urls, session_manager, progress)
+
+
+def run_session(session: Dict, urls: List[str], session_manager: SessionManager, progress: SessionProgress,
+                config: Optional[Dict] = None) -> Dict:
+    """
+    Fetch, extract and paginate `urls` for an existing session, checkpointing
+    each page in `progress` and skipping pages it already records as done.
+    `config` overrides the session's stored scrape_config.json settings (e.g.
+    for a run launched with different fields or model).
+    On failure the progress is marked "failed" (so the session can be resumed)
+    and the exception is re-raised. A run handed to the queue workers, or whose
+    extraction went to a provider batch, is left "queued" until finalize_run or
+    BatchManager.collect completes it.
+    """
+    storage = session_manager.storage
+    config = config or session["config"]
+    session_path = session["session_path"]
+    # Equivalent URLs (differing only in tracking parameters, ...) are fetched and extracted once
+    urls = unique_urls(urls)
+    progress.set_status("running")
+
+    if config.get("distributed"):
+        # Pages are fetched and extracted by the queue workers; the last one finalises the session
+        from .distributed import enqueue_run
+        queued = enqueue_run(session, urls, config)
+        progress.set_status("queued")
+        return {
+            "session_id": session["session_id"],
+            "session_path": session_path,
+            "data": [],
+            "pagination_info": None,
+            "listings_table": None,
+            "distributed": queued,
+            "status": "queued",
+            'scrape_completed': False,
+            'scrape_timestamp': datetime.now().isoformat(),
+            'total_cost': 0,
+            'total_input_tokens': 0,
+            'total_output_tokens': 0,
+        }
+
+    vendor_token = set_vendor(session["vendor"])
+    try:
+        file_paths = fetch_and_store_markdowns(session_path, urls, progress=progress)
+
+        total_input_tokens = 0
+        total_output_tokens = 0
+        total_cost = 0
+        parsed_results = []
+        pagination_results = None
+        scrape_usage = None
+        pagination_usage = None
+        deduplicator = None
+        router = None
+        listings_table = None
+        batches = None
+        manifest = None
+
+        fields = config.get("fields") or []
+        if fields and config.get("batch_mode"):
+            # Non-urgent run: extraction goes out as one provider batch, collected later by BatchManager.poll
+            from .batch import BatchManager
+            batches = BatchManager(session_manager)
+            manifest = batches.submit(session, urls, file_paths, config)
+        elif fields:
+            if config.get("deduplicate", True):
+                # Drop listings repeated across pages, including other pages scraped earlier in this session
+                deduplicator = ListingDeduplicator(near_duplicates=config.get("dedupe_near", False))
+                deduplicator.preload_other_pages(progress, urls)
+                if config.get("dedupe_across_sessions", False):
+                    deduplicator.preload_vendor_sessions(storage, session["vendor"], exclude_session_path=session_path)
+            if config["model"] == AUTO_MODEL:
+                router = ModelRouter()
+            in_tokens, out_tokens, cost, parsed_results = scrape_urls(session_path, file_paths, urls, fields, config["model"],
+                                                                      deduplicator=deduplicator,
+                                                                      incremental=config.get("incremental", False),
+                                                                      progress=progress, router=router,
+                                                                      storage=storage)
+            scrape_usage = {"input_tokens": in_tokens, "output_tokens": out_tokens, "cost": cost}
+            # One normalized table per run for paging, filtering and exports
+            listings_table = ListingsTable.build(table_path_for(session_path), parsed_results).path
+            total_input_tokens += in_tokens
+            total_output_tokens += out_tokens
+            total_cost += cost
+
+        if config.get("use_pagination"):
+            # Pagination is detected on the session's initial URLs only
+            initial_urls = {canonicalize_url(url) for url in config.get("urls", [])}
+            pag_urls = [url for url in urls if canonicalize_url(url) in initial_urls]
+            pag_files = [path for url, path in zip(urls, file_paths) if canonicalize_url(url) in initial_urls]
+            in_tokens, out_tokens, cost, pagination_results = paginate_urls(session_path, pag_files, pag_urls, config["model"],
+                                                                            config.get("pagination_details", ""),
+                                                                            progress=progress)
+            pagination_usage = {"input_tokens": in_tokens, "output_tokens": out_tokens, "cost": cost}
+            total_input_tokens += in_tokens
+            total_output_tokens += out_tokens
+            total_cost += cost
+    except Exception as e:
+        progress.set_status("failed", error=str(e))
+        raise
+    finally:
+        reset_vendor(vendor_token)
+        # Export stage timings for Prometheus / offline analysis
+        write_snapshot(os.path.join(storage.base_dir, "metrics"))
+
+    results_summary = {
+        # A batch run completes when BatchManager.collect adds the batch's results and usage
+        'scrape_completed': manifest is None,
+        'scrape_timestamp': datetime.now().isoformat(),
+        'total_cost': total_cost,
+        'total_input_tokens': total_input_tokens,
+        'total_output_tokens': total_output_tokens
+    }
+    session_manager.update_session_config(session["session_id"], results_summary)
+    progress.set_status("completed" if manifest is None else "queued")
+
+    batch = None
+    if manifest is not None:
+        # A batch with nothing for the provider is collected right away
+        if not manifest["provider_batch_id"]:
+            manifest = batches.poll(manifest)
+        batch = {"batch_key": manifest["batch_key"], "provider_batch_id": manifest["provider_batch_id"],
+                 "pages": len(manifest["pages"]), "model": manifest["model"], "status": manifest["status"]}
+        stored = session_manager.get_session(session["session_id"])["config"]
+        results_summary = {key: stored[key] for key in results_summary}
+        listings_table = stored.get("listings_table") if results_summary['scrape_completed'] else None
+
+    return {
+        "session_id": session["session_id"],
+        "session_path": session_path,
+        "data": parsed_results,
+        "pagination_info": pagination_results,
+        "listings_table": listings_table,
+        "batch": batch,
+        "scrape_usage": scrape_usage,
+        "pagination_usage": pagination_usage,
+        "dedup_stats": dict(deduplicator.stats) if deduplicator is not None else None,
+        "routing_report": router.report() if router is not None else None,
+        "incremental_stats": summarize_incremental(parsed_results) if config.get("incremental", False) else None,
+        "status": "completed" if results_summary['scrape_completed'] else "queued",
+        **results_summary,
+    }
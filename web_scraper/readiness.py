@@ -0,0 +1,172 @@
+# readiness.py
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from .assets import READINESS_SETTINGS
+from .file_storage import FileStorage
+from .metrics import count, domain_of, span
+
+# Counts DOM mutations from the moment it is installed, so stability can be polled cheaply
+INSTALL_OBSERVER_JS = """() => {
+    if (window.__scraperObserver) return;
+    window.__scraperMutations = 0;
+    window.__scraperObserver = new MutationObserver(m => { window.__scraperMutations += m.length; });
+    window.__scraperObserver.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+}"""
+MUTATIONS_JS = "() => document.readyState === 'loading' ? -1 : (window.__scraperMutations || 0)"
+
+
+async def wait_for_stable_dom(page, timeout_ms: float) -> bool:
+    """Poll the page until its DOM has not changed for stability_ms; False if that takes over timeout_ms"""
+    await page.evaluate(INSTALL_OBSERVER_JS)
+    stability_s = READINESS_SETTINGS["stability_ms"] / 1000
+    deadline = time.perf_counter() + timeout_ms / 1000
+    last_count, changed_at = None, time.perf_counter()
+    while time.perf_counter() < deadline:
+        mutations = await page.evaluate(MUTATIONS_JS)
+        now = time.perf_counter()
+        if mutations != last_count or mutations < 0:
+            last_count, changed_at = mutations, now
+        elif now - changed_at >= stability_s:
+            return True
+        await asyncio.sleep(READINESS_SETTINGS["poll_ms"] / 1000)
+    return False
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ReadinessProfiles:
+    """
+    Learned wait profile per domain, kept across sessions in
+    <base_dir>/readiness_profiles.json (or READINESS_PROFILES_PATH): the recent
+    ready times and timeouts of its pages, from which plan() derives how a page
+    is waited for and for how long.
+    """
+
+    def __init__(self, storage: Optional[FileStorage] = None, path: Optional[str] = None):
+        self.path = (path or os.getenv("READINESS_PROFILES_PATH")
+                     or os.path.join((storage or FileStorage()).base_dir, "readiness_profiles.json"))
+        self._lock = threading.Lock()
+        self.profiles: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.profiles = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable readiness profiles {self.path}: {e}")
+
+    def plan(self, url: str) -> Dict:
+        """Strategy, selector and wait budget for a page of this URL's domain"""
+        domain = domain_of(url)
+        configured = next((overrides for pattern, overrides in READINESS_SETTINGS["domains"].items()
+                           if domain == pattern or domain.endswith("." + pattern)), {})
+        strategy = configured.get("strategy", READINESS_SETTINGS["strategy"])
+        if strategy == "selector" and not configured.get("selector"):
+            strategy = "stable"
+        with self._lock:
+            samples = list(self.profiles.get(domain, {}).get("samples", []))
+
+        stable = [s for s in samples if s["strategy"] == "stable"]
+        if (strategy == "stable" and "strategy" not in configured and len(stable) >= 3
+                and sum(s["timed_out"] for s in stable) / len(stable) >= READINESS_SETTINGS["timeout_share"]):
+            # The DOM of this domain never settles (tickers, carousels): wait for the network instead
+            strategy = "networkidle"
+
+        ready_times = [s["ready_ms"] for s in samples if s["strategy"] == strategy and not s["timed_out"]]
+        if ready_times:
+            # Ready times of stable waits already include the stability window
+            timeout_ms = _percentile(ready_times, 0.9) * READINESS_SETTINGS["headroom"]
+            timeout_ms = max(READINESS_SETTINGS["min_timeout_ms"], min(timeout_ms, READINESS_SETTINGS["max_timeout_ms"]))
+        else:
+            timeout_ms = READINESS_SETTINGS["max_timeout_ms"]
+        return {"domain": domain, "strategy": strategy, "selector": configured.get("selector"),
+                "timeout_ms": int(timeout_ms), "samples": len(samples)}
+
+    def record(self, domain: str, strategy: str, ready_ms: float, timed_out: bool):
+        with self._lock:
+            profile = self.profiles.setdefault(domain, {"samples": []})
+            profile["samples"] = (profile["samples"] + [{
+                "strategy": strategy, "ready_ms": round(ready_ms), "timed_out": timed_out, "at": time.time(),
+            }])[-READINESS_SETTINGS["history"]:]
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.profiles, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save readiness profiles: {e}")
+
+
+_profiles = None
+_profiles_lock = threading.Lock()
+
+
+def get_readiness_profiles() -> ReadinessProfiles:
+    """Process-wide readiness profiles, loaded on first use"""
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = ReadinessProfiles()
+        return _profiles
+
+
+class ReadinessWaiter:
+    """
+    Waits for one fetched page to be ready, in place of a fixed delay.
+    Installed as crawl4ai's after_goto hook (the page has reached DOMContentLoaded);
+    depending on the domain's plan it waits for the listings selector, for network
+    idle, or for the DOM to stop changing for stability_ms. A wait that runs out
+    never fails the fetch: the page is captured as it is and the timeout is learned.
+    """
+
+    def __init__(self, url: str, profiles: Optional[ReadinessProfiles] = None):
+        self.profiles = profiles or get_readiness_profiles()
+        self.plan = self.profiles.plan(url)
+        self.ready_ms: Optional[float] = None
+        self.timed_out = False
+
+    async def wait(self, page) -> bool:
+        """Wait until the page is ready or the plan's budget is spent; whether it became ready"""
+        start = time.perf_counter()
+        timeout_ms = self.plan["timeout_ms"]
+        strategy = self.plan["strategy"]
+        try:
+            if strategy == "selector":
+                await page.wait_for_selector(self.plan["selector"], timeout=timeout_ms)
+            elif strategy == "networkidle":
+                await page.wait_for_load_state("networkidle", timeout=timeout_ms)
+            elif not await wait_for_stable_dom(page, timeout_ms):
+                raise TimeoutError(f"DOM still changing after {timeout_ms} ms")
+            ready = True
+        except Exception as e:
+            print(f"Page not ready ({strategy}) for {self.plan['domain']}: {str(e).splitlines()[0]}")
+            ready = False
+        self.ready_ms = (time.perf_counter() - start) * 1000
+        self.timed_out = not ready
+        return ready
+
+    async def after_goto(self, page, context=None, url=None, response=None, **kwargs):
+        """crawl4ai hook: hold the capture until the page is ready"""
+        with span("fetch.ready"):
+            await self.wait(page)
+        return page
+
+    def record(self):
+        """Learn from this page's wait and count timeouts in metrics"""
+        if self.ready_ms is None:
+            # Served from crawl4ai's cache or failed before navigation: nothing was waited for
+            return
+        self.profiles.record(self.plan["domain"], self.plan["strategy"], self.ready_ms, self.timed_out)
+        count("ready_waits", domain=self.plan["domain"], kind=self.plan["strategy"])
+        if self.timed_out:
+            count("ready_timeouts", domain=self.plan["domain"], kind=self.plan["strategy"])
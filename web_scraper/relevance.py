@@ -0,0 +1,198 @@
+# relevance.py
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+from .assets import RELEVANCE_SETTINGS
+from .routing import PRICE_PATTERN
+from .link_aliases import URL_PATTERN
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+BLOCK_SPLIT = re.compile(r"\n\s*\n")
+
+
+def field_terms(fields: List[str]) -> List[str]:
+    """Query terms for the user's fields: "productName" / "product_name" -> product, name"""
+    terms = []
+    for field in fields:
+        spaced = re.sub(r"([a-z])([A-Z])", r"\1 \2", field)
+        for term in WORD_PATTERN.findall(spaced.lower()):
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of text as the model will see it (URLs become short aliases)"""
+    return _sent_length(text) // 4 + 1
+
+
+def _sent_length(text: str) -> int:
+    """Length of text once its URLs are aliased"""
+    return len(URL_PATTERN.sub("~L000", text))
+
+
+def _pieces(markdown: str) -> List[str]:
+    """Blank-line separated pieces; pieces over max_block_chars (as sent) are cut further at line breaks"""
+    max_chars = RELEVANCE_SETTINGS["max_block_chars"]
+    for piece in BLOCK_SPLIT.split(markdown):
+        if _sent_length(piece) <= max_chars:
+            yield piece
+            continue
+        chunk, chunk_length = "", 0
+        for line in piece.split("\n"):
+            line_length = _sent_length(line)
+            if chunk and chunk_length + line_length > max_chars:
+                yield chunk
+                chunk, chunk_length = "", 0
+            chunk = f"{chunk}\n{line}" if chunk else line
+            chunk_length += line_length + 1
+        if chunk:
+            yield chunk
+
+
+def split_blocks(markdown: str) -> List[str]:
+    """Page blocks of bounded size, with tiny ones merged into the next so a card isn't split into crumbs"""
+    blocks, pending = [], ""
+    for block in _pieces(markdown):
+        if not block.strip():
+            continue
+        pending = f"{pending}\n\n{block}" if pending else block
+        if _sent_length(pending) >= RELEVANCE_SETTINGS["min_block_chars"]:
+            blocks.append(pending)
+            pending = ""
+    if pending:
+        blocks.append(pending)
+    return blocks
+
+
+def _shape(block: str) -> str:
+    """Structure of a block with its content abstracted away, to spot repeated listing cards"""
+    shape = URL_PATTERN.sub("U", block)
+    shape = re.sub(r"\d+", "9", shape)
+    shape = re.sub(r"[^\W\d_]+", "a", shape)
+    return re.sub(r"\s+", " ", shape)[:60]
+
+
+def bm25_scores(blocks: List[str], terms: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """BM25 score of each block (as a document) for the query terms"""
+    documents = [Counter(WORD_PATTERN.findall(URL_PATTERN.sub(" ", block.lower()))) for block in blocks]
+    lengths = [sum(doc.values()) for doc in documents]
+    average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+    n = len(documents)
+    scores = [0.0] * n
+    for term in terms:
+        df = sum(1 for doc in documents if term in doc)
+        if not df:
+            continue
+        idf = math.log((n - df + 0.5) / (df + 0.5) + 1)
+        for i, doc in enumerate(documents):
+            tf = doc.get(term, 0)
+            if tf:
+                norm = k1 * (1 - b + b * lengths[i] / average_length) if average_length else k1
+                scores[i] += idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+def score_blocks(blocks: List[str], fields: List[str]) -> List[float]:
+    """
+    Relevance of each block to a listings extraction: BM25 against the field
+    names plus listing-shape evidence (prices, and structures repeated across
+    the page like product cards). A block also gets part of its best neighbour's
+    score, since a listing often spans a few blocks (image, title, price).
+    Scores are comparable within one page only.
+    """
+    weights = RELEVANCE_SETTINGS["weights"]
+    text_scores = bm25_scores(blocks, field_terms(fields))
+    top_text = max(text_scores, default=0.0) or 1.0
+    shapes = Counter(_shape(block) for block in blocks)
+
+    own = []
+    for block, text_score in zip(blocks, text_scores):
+        prices = len(PRICE_PATTERN.findall(block))
+        repeats = shapes[_shape(block)] - 1
+        own.append(weights["terms"] * text_score / top_text
+                   + weights["prices"] * min(prices, 5) / 5
+                   + weights["repeated"] * (min(repeats, 5) / 5 if repeats >= 2 else 0.0))
+    return [score + weights["neighbours"] * max(own[i - 1] if i else 0.0, own[i + 1] if i + 1 < len(own) else 0.0)
+            for i, score in enumerate(own)]
+
+
+def select_relevant(markdown: str, fields: List[str]) -> Tuple[str, Dict]:
+    """
+    Keep only the blocks of a page most likely to hold listings.
+    Blocks are taken best-first until they hold RELEVANCE_SETTINGS["recall"] of
+    the page's total relevance score or the token budget is spent, then put
+    back in page order. Pages already within min_page_tokens are left whole.
+    Returns (text to send, report).
+    """
+    page_tokens = estimate_tokens(markdown)
+    report = {"applied": False, "blocks_total": 0, "blocks_kept": 0, "page_tokens": page_tokens,
+              "tokens_kept": page_tokens, "score_recall": 1.0, "prices_total": 0, "prices_kept": 0}
+    if not RELEVANCE_SETTINGS["enabled"] or page_tokens <= RELEVANCE_SETTINGS["min_page_tokens"]:
+        return markdown, report
+
+    blocks = split_blocks(markdown)
+    scores = score_blocks(blocks, fields)
+    total_score = sum(scores)
+    report["blocks_total"] = len(blocks)
+    report["prices_total"] = len(PRICE_PATTERN.findall(markdown))
+    if not blocks or total_score <= 0:
+        return markdown, report
+
+    kept, kept_score, kept_tokens = set(), 0.0, 0
+    for i in sorted(range(len(blocks)), key=lambda i: scores[i], reverse=True):
+        if scores[i] <= 0 or kept_score >= RELEVANCE_SETTINGS["recall"] * total_score:
+            break
+        block_tokens = estimate_tokens(blocks[i])
+        if kept_tokens + block_tokens > RELEVANCE_SETTINGS["token_budget"]:
+            continue
+        kept.add(i)
+        kept_score += scores[i]
+        kept_tokens += block_tokens
+
+    selected = "\n\n".join(blocks[i] for i in sorted(kept))
+    report.update({
+        "applied": True,
+        "blocks_kept": len(kept),
+        "tokens_kept": kept_tokens,
+        "score_recall": kept_score / total_score,
+        "prices_kept": len(PRICE_PATTERN.findall(selected)),
+    })
+    print(f"Relevance selection kept {len(kept)}/{len(blocks)} blocks, ~{kept_tokens}/{page_tokens} tokens, "
+          f"{report['score_recall']:.0%} of the relevance score, "
+          f"{report['prices_kept']}/{report['prices_total']} prices")
+    return selected, report
+
+
+def _value_found(value: str, haystack: str) -> bool:
+    """Whether a field value the model returned can be found in the text, allowing for its rewording"""
+    value = value.strip().lower().rstrip(".…").strip()
+    if len(value) >= 20:
+        # Long values (names) are often truncated by the model: match their start
+        return value[:40] in haystack
+    numbers = re.findall(r"\d+(?:\.\d+)?", value)
+    if numbers:
+        # Prices get reformatted ("$12.99" -> "12.99"): match the main number, also when split as 12 / 99
+        main = numbers[0]
+        return main in haystack or main.replace(".", "\n") in haystack or main.split(".")[0] in haystack
+    return value in haystack
+
+
+def listing_coverage(selected: str, listings: List[Dict], fields: List[str]) -> float:
+    """
+    Share of a full-page result's listings whose field values can all still be
+    found in the selected text, i.e. how much of the full-page extraction the
+    selection could reproduce.
+    """
+    haystack = selected.lower()
+    listings = [l for l in listings if isinstance(l, dict)]
+    if not listings:
+        return 1.0
+    covered = 0
+    for listing in listings:
+        values = [str(listing.get(f) or "") for f in fields]
+        if all(_value_found(v, haystack) for v in values if v.strip()):
+            covered += 1
+    return covered / len(listings)
@@ -0,0 +1,181 @@
+# resilience.py
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from .assets import RETRY_SETTINGS
+
+# HTTP status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# litellm exception class names that are transient even without a status code
+RETRYABLE_EXCEPTION_NAMES = {
+    "RateLimitError", "APIConnectionError", "Timeout", "APITimeoutError",
+    "ServiceUnavailableError", "InternalServerError",
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit breaker is open and calls are being refused"""
+
+
+def provider_for_model(model: str) -> str:
+    """Provider prefix of a LiteLLM model name ("gemini/gemini-1.5-flash" -> "gemini")"""
+    return model.split("/", 1)[0] if "/" in model else "openai"
+
+
+def is_retryable(exc: Exception) -> bool:
+    """True for rate limits, timeouts, connection problems and 5xx responses"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status_code = getattr(exc, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return type(exc).__name__ in RETRYABLE_EXCEPTION_NAMES
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Read a Retry-After / retry-after-ms header from a provider error, if there is one"""
+    headers = getattr(exc, "litellm_response_headers", None)
+    if headers is None:
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except (TypeError, ValueError):
+            pass
+
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, exc: Exception) -> float:
+    """Exponential backoff with full jitter, or the provider's retry-after if it gave one"""
+    retry_after = retry_after_seconds(exc)
+    if retry_after is not None:
+        return min(retry_after, RETRY_SETTINGS["max_delay"])
+    ceiling = min(RETRY_SETTINGS["base_delay"] * (2 ** (attempt - 1)), RETRY_SETTINGS["max_delay"])
+    return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After `failure_threshold` consecutive transient failures the circuit opens
+    and calls are refused for `reset_timeout` seconds. Then a single trial call
+    is let through (half-open): any answer from the provider, a client error
+    included, closes the circuit; a transient failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or RETRY_SETTINGS["failure_threshold"]
+        self.reset_timeout = reset_timeout or RETRY_SETTINGS["reset_timeout"]
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"Circuit opened for provider {self.name} after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Shared circuit breaker for a provider"""
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+def call_with_resilience(call: Callable[[str], object], models: List[str]):
+    """
+    Call `call(model)` for the first model in `models`, retrying transient
+    errors with backoff and moving on to the next model when the model's
+    attempts run out, its provider's circuit is open, or it fails with a
+    non-transient error.
+
+    Returns (result, model_used, attempts) where attempts is a list of
+    {"model", "attempt", "error", "delay"} dicts for every failed attempt.
+    Raises the last error if every model fails.
+    """
+    attempts: List[Dict] = []
+    last_error: Optional[Exception] = None
+
+    for model in models:
+        breaker = get_circuit_breaker(provider_for_model(model))
+        for attempt in range(1, RETRY_SETTINGS["max_attempts"] + 1):
+            if not breaker.allow_request():
+                last_error = CircuitOpenError(f"Circuit open for provider {breaker.name}")
+                attempts.append({"model": model, "attempt": attempt, "error": str(last_error), "delay": 0})
+                break
+            try:
+                result = call(model)
+            except Exception as e:
+                last_error = e
+                retryable = is_retryable(e)
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    # The provider answered (a 400, or output that failed validation): it is up
+                    breaker.record_success()
+                # Give up on this model for non-transient errors or once its provider's circuit opens
+                give_up = not retryable or breaker.state == "open" or attempt == RETRY_SETTINGS["max_attempts"]
+                delay = 0 if give_up else backoff_delay(attempt, e)
+                attempts.append({"model": model, "attempt": attempt, "error": f"{type(e).__name__}: {e}", "delay": delay})
+                print(f"LLM call to {model} failed (attempt {attempt}): {type(e).__name__}: {e}")
+                if give_up:
+                    break
+                if delay:
+                    time.sleep(delay)
+                continue
+            breaker.record_success()
+            return result, model, attempts
+
+        if model != models[-1]:
+            print(f"Falling back from {model} to the next model")
+
+    raise last_error
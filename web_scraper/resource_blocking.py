@@ -0,0 +1,94 @@
+# resource_blocking.py
+
+from typing import Dict, List
+from urllib.parse import urlparse
+from .assets import RESOURCE_BLOCKING_SETTINGS
+from .metrics import count, domain_of
+
+
+def blocking_settings(url: str) -> Dict:
+    """RESOURCE_BLOCKING_SETTINGS with the overrides of the page's domain (or a parent domain) applied"""
+    settings = {key: value for key, value in RESOURCE_BLOCKING_SETTINGS.items() if key != "domains"}
+    domain = domain_of(url)
+    for pattern, overrides in RESOURCE_BLOCKING_SETTINGS["domains"].items():
+        if domain == pattern or domain.endswith("." + pattern):
+            settings.update(overrides)
+    return settings
+
+
+def is_tracker(request_url: str, tracker_hosts: List[str]) -> bool:
+    host = urlparse(request_url).hostname or ""
+    return any(host == tracker or host.endswith("." + tracker) for tracker in tracker_hosts)
+
+
+class ResourceBlocker:
+    """
+    Request interception for one page fetch.
+    Installed as crawl4ai's on_page_context_created hook, it routes every request
+    of the browser context through allow(): images, fonts, media and tracker hosts
+    are aborted, the rest continue. Counts are reported to metrics by record().
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.settings = blocking_settings(url)
+        self.blocked: Dict[str, int] = {}
+        self.allowed = 0
+        self.bytes_loaded = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings["enabled"])
+
+    def classify(self, request_url: str, resource_type: str) -> str:
+        """Why a request is blocked ("tracker" or its resource type), or "" to let it through"""
+        if request_url == self.url:
+            return ""
+        if is_tracker(request_url, self.settings["tracker_hosts"]):
+            return "tracker"
+        if resource_type in self.settings["resource_types"]:
+            return resource_type
+        return ""
+
+    async def _route(self, route):
+        request = route.request
+        kind = self.classify(request.url, request.resource_type)
+        if kind:
+            self.blocked[kind] = self.blocked.get(kind, 0) + 1
+            await route.abort("blockedbyclient")
+        else:
+            self.allowed += 1
+            await route.continue_()
+
+    def _on_response(self, response):
+        try:
+            self.bytes_loaded += int(response.headers.get("content-length") or 0)
+        except (TypeError, ValueError):
+            pass
+
+    async def on_page_context_created(self, page, context=None, **kwargs):
+        """crawl4ai hook: intercept the context's requests before the page is loaded"""
+        if context is not None:
+            await context.route("**/*", self._route)
+        page.on("response", self._on_response)
+        return page
+
+    def bytes_saved(self) -> int:
+        """Estimated transfer avoided, from the typical size of each blocked kind"""
+        estimates = self.settings["estimated_bytes"]
+        return sum(n * estimates.get(kind, 0) for kind, n in self.blocked.items())
+
+    def record(self):
+        """Report the fetch's blocked/allowed requests and bytes to metrics"""
+        domain = domain_of(self.url)
+        for kind, n in self.blocked.items():
+            count("blocked_requests", n, domain=domain, kind=kind)
+            count("blocked_bytes_estimated", n * self.settings["estimated_bytes"].get(kind, 0),
+                  domain=domain, kind=kind)
+        count("allowed_requests", self.allowed, domain=domain)
+        count("loaded_bytes", self.bytes_loaded, domain=domain)
+        if self.blocked:
+            print(f"Blocked {sum(self.blocked.values())} requests for {domain} "
+                  f"({', '.join(f'{k}: {n}' for k, n in sorted(self.blocked.items()))}), "
+                  f"~{self.bytes_saved() // 1024} KB saved; {self.allowed} allowed, "
+                  f"{self.bytes_loaded // 1024} KB loaded")
@@ -0,0 +1,168 @@
+# results_table.py
+
+import csv
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+# Where each listing came from; added after the listing's own fields
+META_COLUMNS = ["page_url", "file_path", "output_path"]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_path_for(session_path: str) -> str:
+    """A new listings table file for a run in this session"""
+    return os.path.join(session_path, f"listings_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.sqlite")
+
+
+class ListingsTable:
+    """
+    A run's listings normalized into a single SQLite table on disk: one row per
+    listing with the user's fields plus the page it came from. Built once when
+    the run finishes, so the results view can page and filter it with SQL and
+    export it on demand without keeping every listing in memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @classmethod
+    def build(cls, path: str, parsed_results: List[Dict]) -> "ListingsTable":
+        """Write the listings of scrape_urls results to a new table at `path` (replacing it atomically)"""
+        columns: List[str] = []
+        rows: List[Dict] = []
+        for item in parsed_results:
+            parsed = item.get("parsed_data") if isinstance(item, dict) else None
+            if hasattr(parsed, "model_dump"):
+                parsed = parsed.model_dump()
+            elif isinstance(parsed, str):
+                try:
+                    parsed = json.loads(parsed)
+                except json.JSONDecodeError:
+                    parsed = None
+            if not isinstance(parsed, dict) or not isinstance(parsed.get("listings"), list):
+                continue
+            meta = {"page_url": item.get("url", ""), "file_path": item.get("file_path", ""),
+                    "output_path": item.get("output_path", "")}
+            for listing in parsed["listings"]:
+                if not isinstance(listing, dict):
+                    continue
+                for field in listing:
+                    if field not in columns:
+                        columns.append(field)
+                # The listing's own fields win over source metadata with the same name
+                rows.append({**meta, **listing})
+        columns += [c for c in META_COLUMNS if c not in columns]
+
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            column_sql = ", ".join(f"{_quote(c)} TEXT" for c in columns)
+            conn.execute(f"CREATE TABLE listings (_row INTEGER PRIMARY KEY, {column_sql})")
+            placeholders = ", ".join("?" for _ in columns)
+            conn.executemany(
+                f"INSERT INTO listings ({', '.join(_quote(c) for c in columns)}) VALUES ({placeholders})",
+                ([None if row.get(c) is None else str(row.get(c)) for c in columns] for row in rows))
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+        print(f"Saved {len(rows)} listings to {path}")
+        return cls(path)
+
+    @property
+    def columns(self) -> List[str]:
+        with self._connect() as conn:
+            return [r["name"] for r in conn.execute("PRAGMA table_info(listings)") if r["name"] != "_row"]
+
+    def _where(self, search: str, columns: List[str]):
+        if not search:
+            return "", []
+        clause = " OR ".join(f"{_quote(c)} LIKE ?" for c in columns)
+        return f" WHERE {clause}", [f"%{search}%"] * len(columns)
+
+    def count(self, search: str = "") -> int:
+        """Number of listings, optionally only those with `search` in any column"""
+        where, params = self._where(search, self.columns)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM listings{where}", params).fetchone()[0]
+
+    def page(self, page: int, page_size: int, search: str = "") -> List[Dict]:
+        """One page (1-based) of listings in extraction order, optionally filtered by `search`"""
+        columns = self.columns
+        where, params = self._where(search, columns)
+        select = ", ".join(_quote(c) for c in columns)
+        with self._connect() as conn:
+            cursor = conn.execute(f"SELECT {select} FROM listings{where} ORDER BY _row LIMIT ? OFFSET ?",
+                                  params + [page_size, max(page - 1, 0) * page_size])
+            return [dict(r) for r in cursor]
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Every listing, read in batches"""
+        columns = self.columns
+        select = ", ".join(_quote(c) for c in columns)
+        with self._connect() as conn:
+            cursor = conn.execute(f"SELECT {select} FROM listings ORDER BY _row")
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                for row in batch:
+                    yield dict(row)
+
+    def _export_path(self, extension: str) -> Optional[str]:
+        """Path of an export next to the table, or None if it must be (re)generated"""
+        export_path = os.path.splitext(self.path)[0] + extension
+        if os.path.exists(export_path) and os.path.getmtime(export_path) >= os.path.getmtime(self.path):
+            return export_path
+        return None
+
+    def export_csv(self) -> str:
+        """Write (once) and return a CSV export of the table"""
+        existing = self._export_path(".csv")
+        if existing:
+            return existing
+        export_path = os.path.splitext(self.path)[0] + ".csv"
+        with open(export_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns)
+            writer.writeheader()
+            for row in self.iter_rows():
+                writer.writerow(row)
+        return export_path
+
+    def export_json(self) -> str:
+        """Write (once) and return a JSON export of the table, streamed row by row"""
+        existing = self._export_path(".json")
+        if existing:
+            return existing
+        export_path = os.path.splitext(self.path)[0] + ".json"
+        with open(export_path, 'w', encoding='utf-8') as f:
+            f.write("[")
+            for i, row in enumerate(self.iter_rows()):
+                f.write(("," if i else "") + "\n  " + json.dumps(row, ensure_ascii=False))
+            f.write("\n]\n")
+        return export_path
+
+
+def export_table(path: str, fmt: str) -> str:
+    """Export the table at `path` as "json" or "csv" (module-level so it can run in the process pool)"""
+    table = ListingsTable(path)
+    return table.export_json() if fmt == "json" else table.export_csv()
@@ -0,0 +1,183 @@
+# routing.py
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from .assets import MODELS_USED, ROUTING_SETTINGS, SYSTEM_MESSAGE
+from .api_management import get_api_key
+from .dedup import parsed_to_dict
+from .json_repair import extract_with_repair
+
+# Prices like "$21.00", "21,99 €", "USD 5" — a cheap proxy for how many listings a page holds
+PRICE_PATTERN = re.compile(r"(?:[$€£]\s?\d[\d,]*(?:\.\d{2})?|\d[\d,]*(?:\.\d{2})?\s?(?:€|USD|EUR))")
+
+
+@lru_cache(maxsize=None)
+def _model_info(model: str) -> Dict:
+    """LiteLLM's model map entry, looked up once per process"""
+    from litellm import get_model_info
+    try:
+        return get_model_info(model)
+    except Exception as e:
+        print(f"No model info for {model}: {e}")
+        return {}
+
+
+def model_profile(model: str) -> Dict:
+    """Context size and per-token prices of a model, from LiteLLM's model map"""
+    info = _model_info(model)
+    return {
+        "model": model,
+        "max_input_tokens": info.get("max_input_tokens") or info.get("max_tokens") or 0,
+        "input_cost_per_token": info.get("input_cost_per_token") or 0.0,
+        "output_cost_per_token": info.get("output_cost_per_token") or 0.0,
+    }
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """What a call of this size would have cost on `model`"""
+    from litellm import cost_per_token
+    try:
+        prompt_cost, completion_cost = cost_per_token(model=model, prompt_tokens=input_tokens,
+                                                      completion_tokens=output_tokens)
+        return prompt_cost + completion_cost
+    except Exception:
+        profile = model_profile(model)
+        return input_tokens * profile["input_cost_per_token"] + output_tokens * profile["output_cost_per_token"]
+
+
+def count_tokens(models: List[str], text: str) -> List[int]:
+    """Tokens `text` takes for each model"""
+    from litellm import token_counter
+    return [token_counter(model=model, text=text) for model in models]
+
+
+def validate_listings(parsed, fields: List[str], raw_data: str) -> Tuple[bool, str]:
+    """
+    Check that an extraction looks complete enough to keep:
+      - it parses to {"listings": [...]},
+      - enough of the requested fields are filled in,
+      - the number of listings is plausible given the prices on the page.
+    Returns (ok, reason).
+    """
+    parsed_dict = parsed_to_dict(parsed)
+    if not parsed_dict or not isinstance(parsed_dict.get("listings"), list):
+        return False, "output is not a listings object"
+
+    listings = [l for l in parsed_dict["listings"] if isinstance(l, dict)]
+    expected = len(PRICE_PATTERN.findall(raw_data))
+
+    if not listings:
+        if expected >= ROUTING_SETTINGS["min_expected_listings"]:
+            return False, f"no listings but {expected} prices on the page"
+        return True, "no listings on the page"
+
+    if fields:
+        filled = sum(1 for l in listings for f in fields if str(l.get(f, "") or "").strip())
+        completeness = filled / (len(listings) * len(fields))
+        if completeness < ROUTING_SETTINGS["min_field_completeness"]:
+            return False, f"only {completeness:.0%} of fields filled"
+
+    if expected >= ROUTING_SETTINGS["min_expected_listings"] and len(listings) < expected * ROUTING_SETTINGS["min_listing_ratio"]:
+        return False, f"{len(listings)} listings for {expected} prices on the page"
+
+    return True, "ok"
+
+
+class ModelRouter:
+    """
+    Cost-aware model selection for AUTO_MODEL.
+
+    Models from MODELS_USED that have an API key are ordered from cheapest to
+    most expensive. Each page goes to the cheapest model whose context window
+    fits it; if the output fails validate_listings, the next model up is tried.
+    Traffic, escalations and spend are tracked per model so report() can show
+    the savings against sending every page to the most expensive model.
+    """
+
+    def __init__(self, models: Optional[List[str]] = None):
+        candidates = models or [m for m in MODELS_USED if get_api_key(m)]
+        profiles = [model_profile(m) for m in candidates]
+        profiles.sort(key=lambda p: (p["input_cost_per_token"], p["output_cost_per_token"]))
+        self.profiles = profiles
+        self.stats = {p["model"]: {"pages": 0, "accepted": 0, "escalated": 0, "input_tokens": 0,
+                                   "output_tokens": 0, "cost": 0.0} for p in profiles}
+        self.baseline_cost = 0.0
+        self.actual_cost = 0.0
+
+    def ladder(self, text: str) -> List[str]:
+        """Models that can take `text`, cheapest first"""
+        if not self.profiles:
+            raise ValueError("No model with an API key is available for routing")
+        # In this process, as in call_llm_model: a pool worker would import LiteLLM from cold first
+        counts = count_tokens([p["model"] for p in self.profiles], text)
+        fitting = []
+        for profile, tokens in zip(self.profiles, counts):
+            limit = profile["max_input_tokens"]
+            if not limit or tokens + ROUTING_SETTINGS["output_token_reserve"] <= limit:
+                fitting.append(profile["model"])
+        # Nothing fits: let the largest context window try
+        return fitting or [max(self.profiles, key=lambda p: p["max_input_tokens"])["model"]]
+
+    def cheapest_model(self, text: str) -> str:
+        return self.ladder(text)[0]
+
+    def _record(self, model: str, token_counts: Dict, cost: float, accepted: bool):
+        stats = self.stats.setdefault(model, {"pages": 0, "accepted": 0, "escalated": 0, "input_tokens": 0,
+                                              "output_tokens": 0, "cost": 0.0})
+        stats["pages"] += 1
+        stats["accepted" if accepted else "escalated"] += 1
+        stats["input_tokens"] += token_counts["input_tokens"]
+        stats["output_tokens"] += token_counts["output_tokens"]
+        stats["cost"] += cost
+        self.actual_cost += cost
+
+    def extract(self, raw_data: str, container_model, fields: List[str], system_message: str = SYSTEM_MESSAGE):
+        """
+        Extract listings with the cheapest adequate model.
+        Returns (parsed, token_counts, cost) with tokens and cost summed over
+        every model tried, like a single call_llm_model call.
+        """
+        ladder = self.ladder(raw_data)
+        total_counts = {"input_tokens": 0, "output_tokens": 0}
+        total_cost = 0.0
+        parsed = None
+        last_counts = None
+
+        index = 0
+        while index < len(ladder):
+            model = ladder[index]
+            parsed, token_counts, cost = extract_with_repair(raw_data, container_model, model, system_message,
+                                                             fallback_models=ladder[index + 1:])
+            # A provider failure may already have moved the call further up the ladder
+            model_used = token_counts.get("model", model)
+            index = ladder.index(model_used) if model_used in ladder else index
+            total_counts["input_tokens"] += token_counts["input_tokens"]
+            total_counts["output_tokens"] += token_counts["output_tokens"]
+            total_cost += cost
+            last_counts = token_counts
+
+            ok, reason = validate_listings(parsed, fields, raw_data)
+            is_last = index == len(ladder) - 1
+            self._record(model_used, token_counts, cost, accepted=ok or is_last)
+            if ok:
+                break
+            if is_last:
+                print(f"Output from {model_used} failed validation ({reason}) and no stronger model is left")
+                break
+            print(f"Output from {model_used} failed validation ({reason}), escalating")
+            index += 1
+
+        # Baseline: the same page on the most expensive model that fits it
+        self.baseline_cost += estimate_cost(ladder[-1], last_counts["input_tokens"], last_counts["output_tokens"])
+        total_counts["model"] = last_counts.get("model")
+        return parsed, total_counts, total_cost
+
+    def report(self) -> Dict:
+        """Per-model traffic and the estimated savings of routing"""
+        return {
+            "models": self.stats,
+            "actual_cost": self.actual_cost,
+            "baseline_cost": self.baseline_cost,
+            "savings": max(self.baseline_cost - self.actual_cost, 0.0),
+        }
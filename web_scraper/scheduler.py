@@ -0,0 +1,368 @@
+# scheduler.py
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+from .assets import SCHEDULER_SETTINGS, BATCH_SETTINGS
+from .file_storage import FileStorage
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialised
+    fcntl = None
+
+# Run states
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Completed/failed runs kept per job in the state file
+RUN_HISTORY_PER_JOB = 20
+
+# Delay before retrying a failed run, multiplied by the number of attempts so far
+RETRY_DELAY_SECONDS = 60
+
+
+def job_domains(config: Dict) -> List[str]:
+    """Domains a job's URLs point at (without a leading 'www.')"""
+    domains = set()
+    for url in config.get("urls", []):
+        netloc = urlparse(url).netloc.lower()
+        if netloc.startswith("www."):
+            netloc = netloc[4:]
+        if netloc:
+            domains.add(netloc)
+    return sorted(domains)
+
+
+class JobStore:
+    """
+    Persists recurring job definitions and run state in a single JSON file
+    (<base_dir>/scheduler/state.json), written atomically so a crash never
+    leaves a half-written file behind.
+
+    A job holds a scrape config in the same shape as scrape_config.json plus
+    its schedule:
+        {"job_id", "vendor", "config", "interval_minutes", "priority",
+         "enabled", "next_run_at"}
+
+    A run is identified by "<job_id>@<scheduled_for>", so the same scheduled
+    slot can never be queued twice, even across restarts.
+
+    Every change goes through transaction(), which re-reads the file under an
+    exclusive file lock before applying it. Jobs added or removed by another
+    process (run_scheduler.py add/remove while the scheduler runs) are
+    therefore kept, not overwritten by this process's copy.
+    """
+
+    def __init__(self, path: Optional[str] = None, storage: Optional[FileStorage] = None):
+        if path is None:
+            storage = storage or FileStorage()
+            path = os.path.join(storage.base_dir, "scheduler", "state.json")
+        self.path = path
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.RLock()
+        self._lock_path = f"{self.path}.lock"
+        self._depth = 0
+        self.state = self._load()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {"jobs": {}, "runs": {}}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading scheduler state: {e}")
+            raise
+        state.setdefault("jobs", {})
+        state.setdefault("runs", {})
+        return state
+
+    def save(self):
+        """Write the state file atomically"""
+        with self.lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def transaction(self, write: bool = True):
+        """
+        Hold the state exclusively, across threads and processes: the state is
+        re-read from disk on entry and (with write=True) saved on exit.
+        Nested transactions join the outermost one.
+        """
+        with self.lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self.state
+                finally:
+                    self._depth -= 1
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._depth = 1
+                try:
+                    self.state = self._load()
+                    yield self.state
+                    if write:
+                        self.save()
+                finally:
+                    self._depth = 0
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add_job(self, config: Dict, interval_minutes: float, priority: int = 0, vendor: Optional[str] = None,
+                job_id: Optional[str] = None, start_at: Optional[datetime] = None) -> Dict:
+        """Add (or replace) a recurring job; it first runs at start_at (default: now)"""
+        if not config.get("urls"):
+            raise ValueError("Job config must contain at least one URL")
+        if interval_minutes <= 0:
+            raise ValueError("interval_minutes must be positive")
+        job_id = job_id or uuid.uuid4().hex[:12]
+        job = {
+            "job_id": job_id,
+            "vendor": vendor,
+            "config": config,
+            "interval_minutes": interval_minutes,
+            "priority": priority,
+            "enabled": True,
+            "next_run_at": (start_at or datetime.now()).isoformat(),
+        }
+        with self.transaction() as state:
+            state["jobs"][job_id] = job
+        return job
+
+    def remove_job(self, job_id: str) -> bool:
+        with self.transaction() as state:
+            return state["jobs"].pop(job_id, None) is not None
+
+    def set_enabled(self, job_id: str, enabled: bool) -> bool:
+        with self.transaction() as state:
+            job = state["jobs"].get(job_id)
+            if not job:
+                return False
+            job["enabled"] = enabled
+            return True
+
+    def list_jobs(self) -> List[Dict]:
+        with self.transaction(write=False) as state:
+            return [dict(job) for job in state["jobs"].values()]
+
+    def list_runs(self, job_id: Optional[str] = None) -> List[Dict]:
+        with self.transaction(write=False) as state:
+            runs = [dict(r) for r in state["runs"].values() if job_id is None or r["job_id"] == job_id]
+        return sorted(runs, key=lambda r: r["scheduled_for"])
+
+    def prune_runs(self):
+        """Keep only the most recent finished runs of each job"""
+        with self.lock:
+            finished = {}
+            for run_id, run in self.state["runs"].items():
+                if run["status"] in (COMPLETED, FAILED):
+                    finished.setdefault(run["job_id"], []).append((run["scheduled_for"], run_id))
+            for items in finished.values():
+                items.sort()
+                for _, run_id in items[:-RUN_HISTORY_PER_JOB]:
+                    del self.state["runs"][run_id]
+
+
+class Scheduler:
+    """
+    Runs due jobs from a JobStore on a thread pool.
+
+    - At most `max_workers` runs execute at once, and at most the configured
+      per-domain limit for any one domain.
+    - Pending runs are started highest priority first, then oldest first.
+    - Runs left "running" by a crashed process are put back to "pending" on
+      startup; failed runs are retried until `max_attempts` is reached.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, runner: Optional[Callable] = None,
+                 max_workers: Optional[int] = None, per_domain_limit: Optional[int] = None,
+                 domain_limits: Optional[Dict[str, int]] = None, max_attempts: Optional[int] = None):
+        self.store = store or JobStore()
+        if runner is None:
+            from .pipeline import run_scrape_session
+            runner = run_scrape_session
+        self.runner = runner
+        self.max_workers = max_workers or SCHEDULER_SETTINGS["max_workers"]
+        self.per_domain_limit = per_domain_limit or SCHEDULER_SETTINGS["per_domain_limit"]
+        self.domain_limits = domain_limits if domain_limits is not None else SCHEDULER_SETTINGS["domain_limits"]
+        self.max_attempts = max_attempts or SCHEDULER_SETTINGS["max_attempts"]
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scrape-job")
+        self._active = {}          # run_id -> list of domains
+        self._domain_counts = {}   # domain -> running count
+        self._stop = threading.Event()
+        self.batches = None        # BatchManager for runs with batch_mode, created on first poll
+        self._batches_polled_at = 0.0
+        self.recover()
+
+    def recover(self):
+        """Requeue runs that were interrupted by a restart"""
+        with self.store.transaction() as state:
+            for run in state["runs"].values():
+                if run["status"] == RUNNING:
+                    print(f"Recovering interrupted run {run['run_id']}")
+                    run["status"] = PENDING if run["attempts"] < self.max_attempts else FAILED
+
+    def _domain_limit(self, domain: str) -> int:
+        return self.domain_limits.get(domain, self.per_domain_limit)
+
+    def enqueue_due_runs(self, now: Optional[datetime] = None) -> List[str]:
+        """Create pending runs for every enabled job whose next run time has passed"""
+        now = now or datetime.now()
+        created = []
+        with self.store.transaction() as state:
+            runs = state["runs"]
+            for job in state["jobs"].values():
+                if not job.get("enabled", True):
+                    continue
+                scheduled_for = datetime.fromisoformat(job["next_run_at"])
+                if scheduled_for > now:
+                    continue
+
+                # Advance the schedule; missed slots collapse into this one run
+                interval = timedelta(minutes=job["interval_minutes"])
+                next_run = scheduled_for + interval
+                if next_run <= now:
+                    next_run = now + interval
+                job["next_run_at"] = next_run.isoformat()
+
+                # Don't pile up runs behind one that is still waiting or running
+                if any(r["job_id"] == job["job_id"] and r["status"] in (PENDING, RUNNING) for r in runs.values()):
+                    print(f"Job {job['job_id']} still has an unfinished run, skipping slot {scheduled_for.isoformat()}")
+                    continue
+
+                run_id = f"{job['job_id']}@{scheduled_for.isoformat()}"
+                if run_id in runs:
+                    continue
+                runs[run_id] = {
+                    "run_id": run_id,
+                    "job_id": job["job_id"],
+                    "priority": job.get("priority", 0),
+                    "scheduled_for": scheduled_for.isoformat(),
+                    "status": PENDING,
+                    "attempts": 0,
+                    "retry_at": None,
+                    "started_at": None,
+                    "finished_at": None,
+                    "session_id": None,
+                    "error": None,
+                }
+                created.append(run_id)
+            self.store.prune_runs()
+        return created
+
+    def dispatch(self) -> List[str]:
+        """Start pending runs while global and per-domain capacity allows"""
+        started = []
+        now = datetime.now().isoformat()
+        with self.store.transaction() as state:
+            pending = [r for r in state["runs"].values()
+                       if r["status"] == PENDING and (not r.get("retry_at") or r["retry_at"] <= now)]
+            pending.sort(key=lambda r: (-r["priority"], r["scheduled_for"]))
+            for run in pending:
+                if len(self._active) >= self.max_workers:
+                    break
+                job = state["jobs"].get(run["job_id"])
+                if job is None:
+                    run["status"] = FAILED
+                    run["error"] = "Job was removed"
+                    continue
+                domains = job_domains(job["config"])
+                if any(self._domain_counts.get(d, 0) >= self._domain_limit(d) for d in domains):
+                    continue
+
+                run["status"] = RUNNING
+                run["attempts"] += 1
+                run["started_at"] = datetime.now().isoformat()
+                self._active[run["run_id"]] = domains
+                for d in domains:
+                    self._domain_counts[d] = self._domain_counts.get(d, 0) + 1
+                started.append(run["run_id"])
+
+        for run_id in started:
+            self.executor.submit(self._execute, run_id)
+        return started
+
+    def _update_run(self, run_id: str, **changes):
+        """Apply changes to a run (read afresh, other processes may have changed the state)"""
+        with self.store.transaction() as state:
+            run = state["runs"].get(run_id)
+            if run is not None:
+                run.update(changes)
+
+    def _execute(self, run_id: str):
+        with self.store.transaction(write=False) as state:
+            run = dict(state["runs"][run_id])
+            job = state["jobs"].get(run["job_id"])
+        print(f"Starting scheduled run {run_id}")
+        try:
+            if job is None:
+                raise ValueError("Job was removed")
+            summary = self.runner(dict(job["config"]), job.get("vendor"))
+            self._update_run(run_id, status=COMPLETED, session_id=(summary or {}).get("session_id"), error=None)
+            print(f"Scheduled run {run_id} completed")
+        except Exception as e:
+            print(f"Scheduled run {run_id} failed: {e}")
+            retry_at = datetime.now() + timedelta(seconds=RETRY_DELAY_SECONDS * run["attempts"])
+            self._update_run(run_id, status=PENDING if run["attempts"] < self.max_attempts else FAILED,
+                             error=str(e), retry_at=retry_at.isoformat())
+        finally:
+            self._update_run(run_id, finished_at=datetime.now().isoformat())
+            with self.store.lock:
+                for d in self._active.pop(run_id, []):
+                    self._domain_counts[d] -= 1
+            if not self._stop.is_set():
+                self.dispatch()
+
+    def poll_batches(self, force: bool = False):
+        """Collect batch extractions submitted by batch_mode runs, at most every BATCH_SETTINGS['poll_interval']"""
+        if not force and time.time() - self._batches_polled_at < BATCH_SETTINGS["poll_interval"]:
+            return
+        self._batches_polled_at = time.time()
+        try:
+            if self.batches is None:
+                from .batch import BatchManager
+                self.batches = BatchManager()
+            self.batches.poll_all()
+        except Exception as e:
+            print(f"Polling batches failed: {e}")
+
+    def tick(self, now: Optional[datetime] = None):
+        """Queue due runs, start as many as capacity allows and collect finished batches"""
+        self.enqueue_due_runs(now)
+        self.dispatch()
+        self.poll_batches()
+
+    def run_forever(self, poll_interval: Optional[float] = None):
+        """Poll for due jobs until stop() is called"""
+        poll_interval = poll_interval or SCHEDULER_SETTINGS["poll_interval"]
+        print(f"Scheduler started with {len(self.store.list_jobs())} jobs, {self.max_workers} workers")
+        try:
+            while not self._stop.is_set():
+                self.tick()
+                self._stop.wait(poll_interval)
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self, wait: bool = True):
+        """Stop dispatching and wait for running jobs to finish"""
+        self._stop.set()
+        self.executor.shutdown(wait=wait)
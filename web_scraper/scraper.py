@@ -1,15 +1,23 @@
 # scraper.py
 
 import json
+import os
 from typing import List, Dict, Any
 from pydantic import BaseModel, create_model, Field
-from .assets import (OPENAI_MODEL_FULLNAME,GEMINI_MODEL_FULLNAME,SYSTEM_MESSAGE)
+from .assets import (OPENAI_MODEL_FULLNAME,GEMINI_MODEL_FULLNAME,SYSTEM_MESSAGE,AUTO_MODEL)
 from .llm_calls import (call_llm_model)
-from .markdown import read_raw_data
-from core.utils import generate_unique_name
+from .json_repair import extract_with_repair
+from .markdown import read_raw_data, read_html_snapshot
+from core.utils import generate_unique_name, load_json_file
 from .file_storage import FileStorage
+from .dedup import parsed_to_dict
+from .incremental import PageSnapshotStore, split_sections, plan_incremental_extraction
+from .routing import ModelRouter
+from .metrics import span
+from .link_aliases import compact_links
+from .relevance import select_relevant
+from .offload import run_cpu
 import re
-from bs4 import BeautifulSoup
 
 def create_dynamic_listing_model(fields: List[str]):
     """Create a Pydantic model with the fields provided by the user"""
@@ -61,7 +69,8 @@ def save_formatted_data(session_path: str, url: str, data):
 
 def extract_weedmaps_data(raw_data: str, fields: List[str], container_model) -> Dict:
     """
-    Specialized extractor for weedmaps.com data
+    Specialized extractor for weedmaps.com data, run on the page's HTML snapshot
+    (or on the markdown for pages fetched without one)
     Falls back to LLM if this doesn't find anything
     """
     # Create an empty container that matches the expected format
@@ -69,8 +78,8 @@ def extract_weedmaps_data(raw_data: str, fields: List[str], container_model) ->
         "listings": []
     }
     
-    # Try to parse the markdown with BeautifulSoup
-    # Since markdown is basically HTML, we can use it directly
+    # Parse the page's DOM with BeautifulSoup
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(raw_data, 'html.parser')
     
     # Look for product cards
@@ -130,14 +139,114 @@ def extract_weedmaps_data(raw_data: str, fields: List[str], container_model) ->
     # Return parsed data
     return empty_container
 
-def scrape_urls(session_path: str, file_paths: List[str], urls: List[str], fields: List[str], selected_model: str):
+def extract_listings(raw_data: str, url: str, fields: List[str], container_model, selected_model: str,
+                     router=None, html: str = ""):
+    """
+    Extract listings from one page's raw data: the specialized weedmaps
+    extractor first where it applies (on the page's cleaned HTML when given),
+    otherwise (or if it finds nothing) the LLM.
+    With AUTO_MODEL selected, the ModelRouter picks and escalates the model.
+    Returns (parsed, token_counts, cost).
+    """
+    # Check if this is a weedmaps URL and use specialized extraction first
+    if "weedmaps.com" in url:
+        print(f"Detected weedmaps.com URL - using specialized extraction")
+        
+        # Try weedmaps-specific extraction first
+        with span("parse.weedmaps"):
+            # Parsed in the process pool; the dynamic container model can't be pickled (and isn't used)
+            page = html or raw_data
+            weedmaps_data = run_cpu(extract_weedmaps_data, page, fields, None, size=len(page))
+        
+        # If we found data, use it; otherwise fall back to LLM
+        if weedmaps_data and weedmaps_data.get("listings") and len(weedmaps_data["listings"]) > 0:
+            print(f"Successfully extracted {len(weedmaps_data['listings'])} products with specialized extractor")
+            return weedmaps_data, {"input_tokens": 0, "output_tokens": 0}, 0
+
+        # Fall back to LLM
+        print(f"Specialized extraction found no data, falling back to LLM")
+
+    # Only the blocks likely to hold listings, with long tracking URLs as short aliases
+    with span("relevance"):
+        relevant_data, relevance = run_cpu(select_relevant, raw_data, fields, size=len(raw_data))
+    llm_data, aliases = compact_links(relevant_data)
+
+    # Cost-aware routing: cheapest fitting model first, escalate on bad output
+    if selected_model == AUTO_MODEL:
+        parsed, token_counts, cost = router.extract(llm_data, container_model, fields, SYSTEM_MESSAGE)
+    else:
+        # Standard LLM-based extraction, with the answer repaired and validated locally
+        parsed, token_counts, cost = extract_with_repair(llm_data, container_model, selected_model, SYSTEM_MESSAGE)
+    token_counts["relevance"] = relevance
+    return aliases.restore(parsed), token_counts, cost
+
+def extract_incrementally(raw_data: str, url: str, fields: List[str], container_model, selected_model: str,
+                          snapshot_store, router=None, html: str = ""):
+    """
+    Extract a page, reusing listings from its last snapshot for sections that
+    haven't changed. Unchanged pages skip extraction entirely; changed pages
+    only send their changed sections to the model.
+    Returns (parsed, token_counts, cost, sections, report).
+    """
+    sections = split_sections(raw_data)
+    snapshot = snapshot_store.get(url, fields, selected_model)
+    plan = plan_incremental_extraction(snapshot, sections)
+    previous_tokens = snapshot.get("input_tokens", 0) if snapshot else 0
+
+    report = {
+        "status": plan["status"],
+        "sections_total": plan["sections_total"],
+        "sections_changed": plan["sections_changed"],
+        "tokens_saved": 0,
+    }
+
+    if plan["status"] == "full":
+        parsed, token_counts, cost = extract_listings(raw_data, url, fields, container_model, selected_model, router,
+                                                      html)
+        return parsed, token_counts, cost, sections, report
+
+    listings = list(plan["reused_listings"])
+    token_counts = {"input_tokens": 0, "output_tokens": 0}
+    cost = 0
+    if plan["changed_sections"]:
+        changed_data = "\n\n".join(plan["changed_sections"])
+        new_parsed, token_counts, cost = extract_listings(changed_data, url, fields, container_model, selected_model, router)
+        new_dict = parsed_to_dict(new_parsed)
+        if new_dict is None or not isinstance(new_dict.get("listings"), list):
+            # Can't merge an unstructured answer; redo the whole page
+            print(f"Partial extraction for {url} returned unstructured data, extracting full page")
+            report["status"] = "full"
+            parsed, token_counts, cost = extract_listings(raw_data, url, fields, container_model, selected_model, router,
+                                                          html)
+            return parsed, token_counts, cost, sections, report
+        listings.extend(new_dict["listings"])
+
+    report["tokens_saved"] = max(previous_tokens - token_counts["input_tokens"], 0)
+    print(f"Incremental extraction for {url}: {report['status']}, "
+          f"{report['sections_changed']}/{report['sections_total']} sections changed")
+    return {"listings": listings}, token_counts, cost, sections, report
+
+def scrape_urls(session_path: str, file_paths: List[str], urls: List[str], fields: List[str], selected_model: str,
+                deduplicator=None, incremental=False, progress=None, router=None, storage=None):
     """
     For each file_path:
       1) read raw_data from file
-      2) parse with selected LLM
-      3) save formatted_data
-      4) accumulate cost
+      2) parse with selected LLM (in incremental mode, only the sections that
+         changed since the last scrape of the same URL)
+      3) drop listings already seen (if a ListingDeduplicator is given)
+      4) save formatted_data
+      5) accumulate cost
     Return total usage + list of final parsed data
+
+    With a SessionProgress, pages already extracted in this session are loaded
+    from their saved output instead of being extracted again, and every newly
+    extracted page is checkpointed.
+
+    With AUTO_MODEL as selected_model, pages are routed through a ModelRouter
+    (pass one in to read its report() afterwards).
+
+    In incremental mode, page snapshots are kept in `storage` (the session's
+    FileStorage; the default output directory if none is given).
     """
     total_input_tokens = 0
     total_output_tokens = 0
@@ -146,6 +255,9 @@ def scrape_urls(session_path: str, file_paths: List[str], urls: List[str], field
 
     DynamicListingModel = create_dynamic_listing_model(fields)
     DynamicListingsContainer = create_listings_container_model(DynamicListingModel)
+    snapshot_store = PageSnapshotStore(storage or FileStorage()) if incremental else None
+    if selected_model == AUTO_MODEL and router is None:
+        router = ModelRouter()
 
     for i, file_path in enumerate(file_paths):
         raw_data = read_raw_data(file_path)
@@ -156,34 +268,60 @@ def scrape_urls(session_path: str, file_paths: List[str], urls: List[str], field
             continue
 
         url = urls[i] if i < len(urls) else "unknown_url"
-        
-        # Check if this is a weedmaps URL and use specialized extraction first
-        if "weedmaps.com" in url:
-            print(f"Detected weedmaps.com URL - using specialized extraction")
-            
-            # Try weedmaps-specific extraction first
-            weedmaps_data = extract_weedmaps_data(raw_data, fields, DynamicListingsContainer)
-            
-            # If we found data, use it; otherwise fall back to LLM
-            if weedmaps_data and weedmaps_data.get("listings") and len(weedmaps_data["listings"]) > 0:
-                print(f"Successfully extracted {len(weedmaps_data['listings'])} products with specialized extractor")
-                parsed = weedmaps_data
-                token_counts = {"input_tokens": 0, "output_tokens": 0}
-                cost = 0
+
+        # Already extracted before an interruption: reuse the saved output
+        checkpoint = progress.get(url, "extracted") if progress is not None else None
+        if checkpoint and os.path.exists(checkpoint["output_path"]):
+            print(f"Reusing checkpointed extraction for {url}")
+            parsed = load_json_file(checkpoint["output_path"])
+            if deduplicator is not None:
+                deduplicator.preload(parsed.get("listings", []) if isinstance(parsed, dict) else [])
+            total_input_tokens += checkpoint["input_tokens"]
+            total_output_tokens += checkpoint["output_tokens"]
+            total_cost += checkpoint["cost"]
+            parsed_results.append({"url": url, "file_path": file_path, "output_path": checkpoint["output_path"],
+                                   "parsed_data": parsed, "resumed": True})
+            continue
+
+        # The cleaned DOM of the same render, for the deterministic extractors
+        html = read_html_snapshot(file_path) if "weedmaps.com" in url else ""
+
+        report = None
+        with span("extract", url=url):
+            if snapshot_store is not None:
+                parsed, token_counts, cost, sections, report = extract_incrementally(
+                    raw_data, url, fields, DynamicListingsContainer, selected_model, snapshot_store, router, html)
             else:
-                # Fall back to LLM
-                print(f"Specialized extraction found no data, falling back to LLM")
-                parsed, token_counts, cost = call_llm_model(raw_data, DynamicListingsContainer, selected_model, SYSTEM_MESSAGE)
-        else:
-            # Standard LLM-based extraction for other sites
-            parsed, token_counts, cost = call_llm_model(raw_data, DynamicListingsContainer, selected_model, SYSTEM_MESSAGE)
+                parsed, token_counts, cost = extract_listings(raw_data, url, fields, DynamicListingsContainer, selected_model, router,
+                                                              html)
+
+        # drop listings repeated across pages (sponsored / featured blocks)
+        extracted = parsed
+        if deduplicator is not None:
+            with span("dedup", url=url):
+                parsed = deduplicator.filter_parsed(parsed)
 
         # store
         output_path = save_formatted_data(session_path, url, parsed)
 
+        # remember what this page looked like, with its listings before deduplication
+        if snapshot_store is not None:
+            full_page_tokens = token_counts["input_tokens"] + report["tokens_saved"]
+            snapshot_store.save(url, fields, selected_model, sections, extracted, full_page_tokens, output_path)
+
+        if progress is not None and output_path:
+            progress.record(url, "extracted", output_path=output_path,
+                            input_tokens=token_counts["input_tokens"],
+                            output_tokens=token_counts["output_tokens"], cost=cost)
+
         total_input_tokens += token_counts["input_tokens"]
         total_output_tokens += token_counts["output_tokens"]
         total_cost += cost
-        parsed_results.append({"file_path": file_path, "output_path": output_path, "parsed_data": parsed})
+        result = {"url": url, "file_path": file_path, "output_path": output_path, "parsed_data": parsed}
+        if report is not None:
+            result["incremental"] = report
+        if token_counts.get("relevance"):
+            result["relevance"] = token_counts["relevance"]
+        parsed_results.append(result)
 
     return total_input_tokens, total_output_tokens, total_cost, parsed_results
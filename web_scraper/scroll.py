@@ -0,0 +1,155 @@
+# scroll.py
+
+import re
+from typing import Dict, List
+from .assets import READINESS_SETTINGS, SCROLL_SETTINGS
+from .metrics import count, domain_of, span
+from .readiness import wait_for_stable_dom
+
+# What one scroll step looks at: page height, visible text and how many listing items are rendered
+SNAPSHOT_JS = """(selector) => {
+    let items = 0;
+    if (selector) {
+        try { items = document.querySelectorAll(selector).length; } catch (e) { items = 0; }
+    } else {
+        items = new Set(Array.from(document.querySelectorAll('a[href]'), a => a.href)).size;
+    }
+    return {height: document.body ? document.body.scrollHeight : 0,
+            text: document.body ? document.body.innerText : '', items: items};
+}"""
+SCROLL_JS = "() => window.scrollTo(0, document.body ? document.body.scrollHeight : 0)"
+
+DELTA_HEADING = "## Loaded while scrolling"
+
+# Markdown markup that has no counterpart in the page's innerText
+MARKDOWN_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+MARKDOWN_MARKUP = re.compile(r"^\s*(?:[-+*]|\d+\.)\s+|[#*_`>|~]")
+
+
+def normalize_line(line: str) -> str:
+    """A text line as compared across innerText and markdown: markup, case and spacing ignored"""
+    line = MARKDOWN_MARKUP.sub(" ", MARKDOWN_LINK.sub(r"\1", line))
+    return " ".join(line.split()).lower()
+
+
+def markdown_lines(markdown: str) -> set:
+    """Normalized lines of a markdown document, and of each cell of its table rows"""
+    lines = set()
+    for line in markdown.splitlines():
+        lines.add(normalize_line(line))
+        if "|" in line:
+            lines.update(normalize_line(cell) for cell in line.split("|"))
+    lines.discard("")
+    return lines
+
+
+def scroll_settings(url: str) -> Dict:
+    """SCROLL_SETTINGS with the overrides of the page's domain (or a parent domain) applied"""
+    settings = {key: value for key, value in SCROLL_SETTINGS.items() if key != "domains"}
+    domain = domain_of(url)
+    for pattern, overrides in SCROLL_SETTINGS["domains"].items():
+        if domain == pattern or domain.endswith("." + pattern):
+            settings.update(overrides)
+    return settings
+
+
+class ScrollHarvester:
+    """
+    Incremental infinite-scroll harvesting for one page fetch.
+    Installed as crawl4ai's before_retrieve_html hook (after the readiness wait), it
+    scrolls to the bottom one step at a time, lets the DOM settle, and keeps the
+    text lines that step rendered for the first time. It stops when a step adds no
+    new lines and no height, when max_items listing items are on the page, or after
+    max_steps. Listing items are counted with the domain's readiness selector, or
+    as distinct links.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.settings = scroll_settings(url)
+        domain = domain_of(url)
+        self.selector = next((overrides.get("selector") for pattern, overrides in READINESS_SETTINGS["domains"].items()
+                              if domain == pattern or domain.endswith("." + pattern)), None)
+        self.seen = set()
+        # New text lines per snapshot: before the first scroll, then after each step
+        self.deltas: List[List[str]] = []
+        self.items = 0
+        self.stop_reason = ""
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings["enabled"]) and self.settings["max_steps"] > 0
+
+    def _new_lines(self, text: str) -> List[str]:
+        """Lines of the page text not seen in an earlier snapshot"""
+        new = []
+        for line in text.splitlines():
+            line = line.strip()
+            if len(line) >= self.settings["min_line_chars"] and line not in self.seen:
+                self.seen.add(line)
+                new.append(line)
+        return new
+
+    async def harvest(self, page):
+        snapshot = await page.evaluate(SNAPSHOT_JS, self.selector)
+        self.deltas.append(self._new_lines(snapshot["text"]))
+        height, self.items = snapshot["height"], snapshot["items"]
+        self.stop_reason = "max_steps"
+        for _ in range(self.settings["max_steps"]):
+            if self.items >= self.settings["max_items"]:
+                self.stop_reason = "max_items"
+                break
+            await page.evaluate(SCROLL_JS)
+            await wait_for_stable_dom(page, self.settings["step_timeout_ms"])
+            snapshot = await page.evaluate(SNAPSHOT_JS, self.selector)
+            new_lines = self._new_lines(snapshot["text"])
+            grown = snapshot["height"] > height
+            height, self.items = snapshot["height"], snapshot["items"]
+            if not new_lines and not grown:
+                self.stop_reason = "no_new_content"
+                break
+            self.deltas.append(new_lines)
+
+    async def before_retrieve_html(self, page, context=None, **kwargs):
+        """crawl4ai hook: scroll the page before its HTML is captured"""
+        with span("fetch.scroll"):
+            try:
+                await self.harvest(page)
+            except Exception as e:
+                # A page that can't be scrolled is still captured as it is
+                print(f"Scrolling stopped on {domain_of(self.url)}: {str(e).splitlines()[0]}")
+                self.stop_reason = "error"
+        return page
+
+    def merge(self, markdown: str) -> str:
+        """
+        The captured markdown plus the lines scrolling rendered that it no longer
+        holds (virtualised lists drop rows that scrolled out of view). A line counts
+        as captured when a markdown line, or table cell, has the same text once
+        markup and spacing are ignored; it is then not stored again.
+        """
+        # The first snapshot is the page as it was before scrolling, which the markdown already holds
+        captured = markdown_lines(markdown)
+        missing = []
+        for step in self.deltas[1:]:
+            for line in step:
+                normalized = normalize_line(line)
+                if normalized and normalized not in captured:
+                    captured.add(normalized)
+                    missing.append(line)
+        if not missing:
+            return markdown
+        return f"{markdown.rstrip()}\n\n{DELTA_HEADING}\n\n" + "\n".join(missing) + "\n"
+
+    @property
+    def steps(self) -> int:
+        return max(len(self.deltas) - 1, 0)
+
+    def record(self):
+        """Report the scroll steps taken to metrics"""
+        if not self.stop_reason:
+            return
+        domain = domain_of(self.url)
+        count("scroll_steps", self.steps, domain=domain, kind=self.stop_reason)
+        print(f"Scrolled {self.steps} steps on {domain} ({self.stop_reason}), "
+              f"{sum(len(step) for step in self.deltas[1:])} new lines, {self.items} items")
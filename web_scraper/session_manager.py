@@ -1,6 +1,79 @@
 import os
 import json
+import threading
+from datetime import datetime
 from .file_storage import FileStorage
+from .canonical import canonicalize_url, unique_urls
+
+# Checkpoint stages recorded per URL
+FETCHED = "fetched"
+EXTRACTED = "extracted"
+PAGINATED = "paginated"
+
+
+class SessionProgress:
+    """
+    Per-URL progress checkpoints of a session, stored in progress.json:
+
+        {"status": "running" | "queued" | "completed" | "failed",
+         "error": str or None,
+         "pages": {url: {"fetched": {...}, "extracted": {...}, "paginated": {...}}}}
+
+    Each checkpoint is written as soon as a page finishes a stage, so an
+    interrupted run can be resumed without repeating finished work.
+    "queued" means the run was handed off (to the queue workers or a provider
+    batch) and completes once its results are collected.
+    Pages are keyed by canonical URL, so a URL given with other tracking
+    parameters finds the same checkpoints.
+    """
+
+    def __init__(self, storage, session_path):
+        self.storage = storage
+        self.session_path = session_path
+        self.lock = threading.Lock()
+        self.data = storage.load_progress(session_path)
+        self.data.setdefault("status", "running")
+        self.data.setdefault("error", None)
+        # Checkpoints saved before URLs were canonicalized are merged under their canonical URL
+        pages = {}
+        for url, stages in self.data.get("pages", {}).items():
+            pages.setdefault(canonicalize_url(url), {}).update(stages)
+        self.data["pages"] = pages
+
+    def get(self, url, stage):
+        """Return the checkpoint for a URL and stage, or None"""
+        return self.data["pages"].get(canonicalize_url(url), {}).get(stage)
+
+    def record(self, url, stage, **info):
+        """Record that a URL finished a stage and persist immediately"""
+        with self.lock:
+            info["timestamp"] = datetime.now().isoformat()
+            self.data["pages"].setdefault(canonicalize_url(url), {})[stage] = info
+            self.storage.save_progress(self.session_path, self.data)
+
+    def set_status(self, status, error=None):
+        with self.lock:
+            self.data["status"] = status
+            self.data["error"] = error
+            self.storage.save_progress(self.session_path, self.data)
+
+    def reset(self, urls):
+        """Forget checkpoints for URLs that are about to be scraped afresh"""
+        with self.lock:
+            for url in urls:
+                self.data["pages"].pop(canonicalize_url(url), None)
+            self.data["status"] = "running"
+            self.data["error"] = None
+            self.storage.save_progress(self.session_path, self.data)
+
+    @property
+    def status(self):
+        return self.data["status"]
+
+    def pending_urls(self, urls, stage):
+        """URLs from `urls` that haven't reached `stage` yet"""
+        return [url for url in urls if self.get(url, stage) is None]
+
 
 class SessionManager:
     def __init__(self, storage=None):
@@ -60,4 +133,41 @@ class SessionManager:
         
         # Save updated config
         self.storage.save_mapping(session["session_path"], config)
-        return True 
\ No newline at end of file
+        return True
+
+    def get_progress(self, session_id):
+        """Load the progress checkpoints of a session (None if the session doesn't exist)"""
+        session = self.get_session(session_id)
+        if not session:
+            return None
+        return SessionProgress(self.storage, session["session_path"])
+
+    def session_urls(self, session_id):
+        """All URLs a session was asked to scrape: the initial URLs plus any page batches"""
+        session = self.get_session(session_id)
+        if not session:
+            return []
+        config = session["config"]
+        urls = list(config.get("urls", []))
+        for key, value in config.items():
+            if key.startswith("page_batch_") and isinstance(value, dict):
+                urls.extend(value.get("urls", []))
+        return unique_urls(urls)
+
+    def resume_session(self, session_id):
+        """
+        Resume an interrupted session: pages already fetched are not fetched
+        again and pages already extracted or paginated are loaded from their
+        saved output instead of calling the model again.
+        Returns the same summary as pipeline.run_session.
+        """
+        from .pipeline import run_session
+
+        session = self.get_session(session_id)
+        if not session:
+            raise ValueError(f"Session not found: {session_id}")
+        progress = SessionProgress(self.storage, session["session_path"])
+        urls = self.session_urls(session_id)
+        print(f"Resuming session {session['session_id']}: "
+              f"{len(progress.pending_urls(urls, EXTRACTED))} of {len(urls)} pages left to extract")
+        return run_session(session, urls, self, progress)
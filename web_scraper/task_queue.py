@@ -0,0 +1,242 @@
+# task_queue.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from .assets import QUEUE_SETTINGS
+from .file_storage import FileStorage
+
+# Task states
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"        # failed max_attempts times, or failed with retry=False
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key TEXT UNIQUE,
+    group_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks (status, available_at, priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_group ON tasks (group_id, status);
+"""
+
+
+class TaskQueue(ABC):
+    """
+    Durable work queue shared by every worker process.
+
+    A task is claimed under a lease: its worker must heartbeat() before the lease
+    expires, or the task goes back to pending for another worker (a crashed
+    container loses its tasks to the others, not forever). Failed tasks are
+    retried with exponential backoff up to max_attempts, then marked dead.
+    enqueue() with a dedupe_key that is already queued does nothing, so the same
+    work can't be queued twice.
+
+    Subclasses implement the storage; get_task_queue() picks one by name.
+    """
+
+    @abstractmethod
+    def enqueue(self, kind: str, payload: Dict, group_id: str, dedupe_key: Optional[str] = None,
+                priority: int = 0, max_attempts: Optional[int] = None) -> Optional[int]:
+        """Queue a task; returns its id, or None if a task with this dedupe_key exists"""
+
+    @abstractmethod
+    def claim(self, worker_id: str, kinds: Optional[List[str]] = None) -> Optional[Dict]:
+        """Lease the next available task (highest priority, then oldest) to a worker"""
+
+    @abstractmethod
+    def heartbeat(self, task_id: int, worker_id: str) -> bool:
+        """Extend a lease; False if the worker no longer holds it"""
+
+    @abstractmethod
+    def complete(self, task_id: int, worker_id: str, result: Optional[Dict] = None) -> bool:
+        """Mark a leased task done; False (result dropped) if the lease was lost meanwhile"""
+
+    @abstractmethod
+    def fail(self, task_id: int, worker_id: str, error: str, retry: bool = True) -> Optional[str]:
+        """Give a task back after an error; returns its new status (pending or dead), None if the lease was lost"""
+
+    @abstractmethod
+    def group_tasks(self, group_id: str) -> List[Dict]:
+        """Every task of a group, oldest first"""
+
+    @abstractmethod
+    def settled_groups(self, without_kind: str) -> List[str]:
+        """Groups with no pending or leased task and no task of `without_kind`"""
+
+    @abstractmethod
+    def counts(self, group_id: Optional[str] = None) -> Dict[str, int]:
+        """Number of tasks per status"""
+
+
+class SQLiteTaskQueue(TaskQueue):
+    """
+    TaskQueue in one SQLite file, by default <base_dir>/queue/tasks.sqlite (or
+    TASK_QUEUE_PATH), so containers mounting the same output/ volume share it.
+    Claims run in an IMMEDIATE transaction, which serialises them across
+    processes; the default rollback journal is kept because WAL needs shared
+    memory that not every shared volume provides.
+    """
+
+    def __init__(self, path: Optional[str] = None, storage: Optional[FileStorage] = None):
+        self.path = (path or os.getenv("TASK_QUEUE_PATH")
+                     or os.path.join((storage or FileStorage()).base_dir, "queue", "tasks.sqlite"))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        conn = sqlite3.connect(self.path, timeout=QUEUE_SETTINGS["busy_timeout"])
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """One write transaction, holding the database lock from its start"""
+        conn = sqlite3.connect(self.path, timeout=QUEUE_SETTINGS["busy_timeout"], isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            with self._lock:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row(row) -> Dict:
+        task = dict(row)
+        task["payload"] = json.loads(task["payload"])
+        task["result"] = json.loads(task["result"]) if task["result"] else None
+        return task
+
+    def enqueue(self, kind, payload, group_id, dedupe_key=None, priority=0, max_attempts=None):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO tasks (dedupe_key, group_id, kind, payload, status, priority, max_attempts, "
+                "available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (dedupe_key, group_id, kind, json.dumps(payload), PENDING, priority,
+                 max_attempts or QUEUE_SETTINGS["max_attempts"], now, now, now))
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def _expire_leases(self, conn, now: float):
+        """Tasks whose worker stopped heartbeating: back to pending, or dead if out of attempts"""
+        conn.execute("UPDATE tasks SET status = ?, lease_owner = NULL, error = 'lease expired', updated_at = ? "
+                     "WHERE status = ? AND lease_expires_at < ? AND attempts >= max_attempts",
+                     (DEAD, now, LEASED, now))
+        conn.execute("UPDATE tasks SET status = ?, lease_owner = NULL, error = 'lease expired', updated_at = ? "
+                     "WHERE status = ? AND lease_expires_at < ?", (PENDING, now, LEASED, now))
+
+    def claim(self, worker_id, kinds=None):
+        now = time.time()
+        with self._transaction() as conn:
+            self._expire_leases(conn, now)
+            query = "SELECT * FROM tasks WHERE status = ? AND available_at <= ?"
+            params: list = [PENDING, now]
+            if kinds:
+                query += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+                params += list(kinds)
+            row = conn.execute(query + " ORDER BY priority DESC, id LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE tasks SET status = ?, lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1, "
+                         "updated_at = ? WHERE id = ?",
+                         (LEASED, worker_id, now + QUEUE_SETTINGS["lease_seconds"], now, row["id"]))
+            task = self._row(row)
+        task.update(status=LEASED, lease_owner=worker_id, attempts=task["attempts"] + 1)
+        return task
+
+    def heartbeat(self, task_id, worker_id):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET lease_expires_at = ?, updated_at = ? "
+                                  "WHERE id = ? AND status = ? AND lease_owner = ?",
+                                  (now + QUEUE_SETTINGS["lease_seconds"], now, task_id, LEASED, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id, result=None):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET status = ?, result = ?, error = NULL, lease_owner = NULL, "
+                                  "updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                                  (DONE, json.dumps(result) if result is not None else None, now,
+                                   task_id, LEASED, worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, task_id, worker_id, error, retry=True):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM tasks WHERE id = ? AND status = ? AND lease_owner = ?",
+                               (task_id, LEASED, worker_id)).fetchone()
+            if row is None:
+                return None
+            if retry and row["attempts"] < row["max_attempts"]:
+                delay = min(QUEUE_SETTINGS["retry_base_delay"] * 2 ** (row["attempts"] - 1),
+                            QUEUE_SETTINGS["retry_max_delay"])
+                status, available_at = PENDING, now + delay
+            else:
+                status, available_at = DEAD, now
+            conn.execute("UPDATE tasks SET status = ?, error = ?, available_at = ?, lease_owner = NULL, updated_at = ? "
+                         "WHERE id = ?", (status, error[:2000], available_at, now, task_id))
+            return status
+
+    def group_tasks(self, group_id):
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT * FROM tasks WHERE group_id = ? ORDER BY id", (group_id,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def settled_groups(self, without_kind):
+        with self._transaction() as conn:
+            self._expire_leases(conn, time.time())
+            rows = conn.execute("SELECT group_id FROM tasks GROUP BY group_id "
+                                "HAVING SUM(status IN (?, ?)) = 0 AND SUM(kind = ?) = 0",
+                                (PENDING, LEASED, without_kind)).fetchall()
+        return [row["group_id"] for row in rows]
+
+    def counts(self, group_id=None):
+        with self._transaction() as conn:
+            self._expire_leases(conn, time.time())
+            if group_id is None:
+                rows = conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status").fetchall()
+            else:
+                rows = conn.execute("SELECT status, COUNT(*) AS n FROM tasks WHERE group_id = ? GROUP BY status",
+                                    (group_id,)).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+# Queue backends by name; another broker plugs in by subclassing TaskQueue and registering here
+QUEUE_BACKENDS = {
+    "sqlite": SQLiteTaskQueue,
+}
+
+
+def get_task_queue(name: Optional[str] = None) -> TaskQueue:
+    """The queue backend named in QUEUE_SETTINGS (or TASK_QUEUE_BACKEND in the environment)"""
+    name = name or os.getenv("TASK_QUEUE_BACKEND") or QUEUE_SETTINGS["backend"]
+    if name not in QUEUE_BACKENDS:
+        raise ValueError(f"Unknown task queue backend: {name}")
+    return QUEUE_BACKENDS[name]()
@@ -0,0 +1,235 @@
+# workers.py
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from .assets import WORKER_SETTINGS
+from .api_management import use_api_keys
+from .session_manager import SessionManager, SessionProgress, FETCHED, EXTRACTED, PAGINATED
+from .canonical import canonicalize_url, unique_urls
+from core.utils import load_json_file
+
+# Run states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+HANDED_OFF = "handed_off"    # pages queued for the queue workers or a provider batch; finishes with the session
+
+# Session config keys that finalize_run / BatchManager.collect update when a handed-off run completes
+SUMMARY_KEYS = ("scrape_completed", "scrape_timestamp", "total_cost", "total_input_tokens", "total_output_tokens",
+                "listings_table")
+
+
+class ScrapeCancelled(Exception):
+    """Raised inside a run at the next page boundary after cancel() was called"""
+
+
+class RunProgress(SessionProgress):
+    """
+    SessionProgress for a background run: every checkpoint is also visible to
+    the UI through the run, and once the run is cancelled the next page
+    lookup raises ScrapeCancelled, so the run stops between pages with all
+    finished pages checkpointed (and resumable).
+    """
+
+    def __init__(self, storage, session_path, cancel_event: threading.Event):
+        super().__init__(storage, session_path)
+        self.cancel_event = cancel_event
+
+    def get(self, url, stage):
+        if self.cancel_event.is_set():
+            raise ScrapeCancelled("Run cancelled")
+        return super().get(url, stage)
+
+
+class ScrapeRun:
+    """A scrape submitted to the WorkerPool: its state, per-URL progress and final summary"""
+
+    def __init__(self, session: Dict, urls: List[str], config: Dict, progress: RunProgress):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.session_id = session["session_id"]
+        self.session_path = session["session_path"]
+        self.urls = list(urls)
+        self.config = config
+        self.progress = progress
+        self.cancel_event = progress.cancel_event
+        self.stages = [FETCHED]
+        if config.get("fields"):
+            self.stages.append(EXTRACTED)
+        if config.get("use_pagination"):
+            self.stages.append(PAGINATED)
+        self.status = QUEUED
+        self.summary = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (COMPLETED, FAILED, CANCELLED)
+
+    def refresh(self):
+        """
+        Follow a handed-off run through its session: reload the progress written by
+        the queue workers or the batch collector, and finish the run once the
+        session is completed or failed.
+        """
+        if self.status != HANDED_OFF:
+            return
+        progress = SessionProgress(self.progress.storage, self.session_path)
+        with self.progress.lock:
+            self.progress.data = progress.data
+        if progress.status == "completed":
+            config = load_json_file(os.path.join(self.session_path, "scrape_config.json")) or {}
+            self.summary = {**self.summary, **{key: config[key] for key in SUMMARY_KEYS if key in config}}
+            self.status = COMPLETED
+        elif progress.status == "failed":
+            self.error = progress.data["error"]
+            self.status = FAILED
+        else:
+            return
+        self.finished_at = time.time()
+
+    def page_status(self) -> List[Dict]:
+        """One row per URL with the stages it has finished"""
+        with self.progress.lock:
+            pages = {url: dict(stages) for url, stages in self.progress.data["pages"].items()}
+        return [{"url": url, **{stage: stage in pages.get(canonicalize_url(url), {}) for stage in self.stages}}
+                for url in self.urls]
+
+    def fraction_done(self) -> float:
+        rows = self.page_status()
+        total = len(rows) * len(self.stages)
+        return sum(row[stage] for row in rows for stage in self.stages) / total if total else 0.0
+
+    def partial_listings(self) -> List[Dict]:
+        """Listings of the pages extracted so far, with the URL they came from"""
+        with self.progress.lock:
+            checkpoints = [(url, self.progress.data["pages"][canonicalize_url(url)][EXTRACTED]) for url in self.urls
+                           if EXTRACTED in self.progress.data["pages"].get(canonicalize_url(url), {})]
+        listings = []
+        for url, checkpoint in checkpoints:
+            parsed = load_json_file(checkpoint["output_path"])
+            if isinstance(parsed, dict):
+                listings.extend({**l, "url": url} for l in parsed.get("listings", []) if isinstance(l, dict))
+        return listings
+
+
+class WorkerPool:
+    """
+    Runs scrapes on background threads so the Streamlit script never blocks.
+    One pool is shared by every browser session of the app process (see
+    get_worker_pool in app.py); each user keeps only the run_id and polls it.
+    A session can have at most one active run at a time.
+    """
+
+    def __init__(self, max_workers: int = WORKER_SETTINGS["max_workers"],
+                 session_manager: Optional[SessionManager] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape-worker")
+        self.session_manager = session_manager or SessionManager()
+        self.lock = threading.Lock()
+        self.runs: Dict[str, ScrapeRun] = {}
+        if WORKER_SETTINGS.get("preload_imports"):
+            threading.Thread(target=self._preload, name="scrape-preload", daemon=True).start()
+
+    @staticmethod
+    def _preload():
+        """
+        Import the pipeline and its heavy dependencies off the UI thread, so the app
+        becomes ready without them and the first run doesn't wait for them either.
+        """
+        try:
+            from . import pipeline  # noqa: F401
+            import litellm  # noqa: F401
+            import crawl4ai  # noqa: F401
+        except Exception as e:
+            print(f"Preloading scrape dependencies failed: {e}")
+
+    def submit(self, session_id: str, urls: Optional[List[str]] = None, config: Optional[Dict] = None,
+               api_keys: Optional[Dict] = None, fresh: bool = True) -> ScrapeRun:
+        """
+        Queue a run for a session.
+        urls/config default to the session's own (what resume_session would do).
+        With fresh=True the URLs' checkpoints from earlier runs are dropped first;
+        with fresh=False (resume) checkpointed pages are skipped.
+        """
+        session = self.session_manager.get_session(session_id)
+        if not session:
+            raise ValueError(f"Session not found: {session_id}")
+        urls = unique_urls(urls) if urls is not None else self.session_manager.session_urls(session_id)
+        config = config or session["config"]
+
+        for run in self.active_runs():
+            run.refresh()
+        with self.lock:
+            if any(r.session_id == session["session_id"] and not r.done for r in self.runs.values()):
+                raise ValueError(f"Session {session['session_id']} already has a run in progress")
+            progress = RunProgress(self.session_manager.storage, session["session_path"], threading.Event())
+            if fresh:
+                progress.reset(urls)
+            run = ScrapeRun(session, urls, config, progress)
+            self.runs[run.run_id] = run
+            self._prune()
+
+        self.executor.submit(self._execute, run, session, api_keys)
+        print(f"Queued run {run.run_id} for {session['session_id']} ({len(urls)} URLs)")
+        return run
+
+    def _execute(self, run: ScrapeRun, session: Dict, api_keys: Optional[Dict]):
+        from .pipeline import run_session
+
+        if run.cancel_event.is_set():
+            run.status = CANCELLED
+            run.finished_at = time.time()
+            return
+        run.status = RUNNING
+        try:
+            with use_api_keys(api_keys):
+                run.summary = run_session(session, run.urls, self.session_manager, run.progress, config=run.config)
+            # Distributed and batch runs complete later, when their session does
+            run.status = HANDED_OFF if run.summary.get("status") == "queued" else COMPLETED
+        except ScrapeCancelled:
+            print(f"Run {run.run_id} cancelled")
+            run.status = CANCELLED
+        except Exception as e:
+            traceback.print_exc()
+            run.error = str(e)
+            run.status = FAILED
+        finally:
+            run.finished_at = time.time()
+
+    def get(self, run_id: Optional[str]) -> Optional[ScrapeRun]:
+        with self.lock:
+            run = self.runs.get(run_id) if run_id else None
+        if run is not None:
+            run.refresh()
+        return run
+
+    def cancel(self, run_id: str) -> bool:
+        """Ask a run to stop at its next page boundary"""
+        run = self.get(run_id)
+        if run is None or run.done or run.status == HANDED_OFF:
+            return False
+        run.cancel_event.set()
+        return True
+
+    def active_runs(self) -> List[ScrapeRun]:
+        with self.lock:
+            return [r for r in self.runs.values() if not r.done]
+
+    def _prune(self):
+        """Forget the oldest finished runs beyond WORKER_SETTINGS['finished_runs_kept'] (lock held)"""
+        finished = sorted((r for r in self.runs.values() if r.done), key=lambda r: r.finished_at or 0)
+        for run in finished[:max(len(finished) - WORKER_SETTINGS["finished_runs_kept"], 0)]:
+            del self.runs[run.run_id]
+
+    def shutdown(self):
+        for run in self.active_runs():
+            run.cancel_event.set()
+        self.executor.shutdown(wait=True)